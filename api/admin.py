@@ -1,15 +1,27 @@
 from django.contrib import admin
+from django.db.models import Q
+
+from .admin_scale import CachedValuesFilter, ScalableAdmin
 from .models import WalkingRoute, AccessIssue
 
+# Route ids a search term may expand to in the issue search.
+SEARCH_ROUTE_LIMIT = 1000
+
 
 @admin.register(WalkingRoute)
-class WalkingRouteAdmin(admin.ModelAdmin):
+class WalkingRouteAdmin(ScalableAdmin):
     """
     Read-only admin view for walking_routes.
     We don't let people add/delete here because it's managed by imports.
+    Name search uses the upper(name) trigram index from migration 0010.
     """
     list_display = ('id', 'name', 'source', 'surface', 'smoothness', 'is_accessible')
-    list_filter = ('source', 'surface', 'smoothness', 'is_accessible')
+    list_filter = (
+        ('source', CachedValuesFilter),
+        ('surface', CachedValuesFilter),
+        ('smoothness', CachedValuesFilter),
+        'is_accessible',
+    )
     search_fields = ('name',)
 
     def has_add_permission(self, request):
@@ -20,11 +32,32 @@ class WalkingRouteAdmin(admin.ModelAdmin):
 
 
 @admin.register(AccessIssue)
-class AccessIssueAdmin(admin.ModelAdmin):
+class AccessIssueAdmin(ScalableAdmin):
     """
     Full CRUD for user-reported accessibility issues.
     """
-    list_display = ('id', 'route', 'issue_type', 'created_at', 'lat', 'lng')
-    list_filter = ('issue_type', 'created_at')
+    list_display = ('id', 'route', 'issue_type', 'created_at')
+    list_filter = (('issue_type', CachedValuesFilter), 'created_at')
+    list_select_related = ('route',)
+    raw_id_fields = ('route',)  # a <select> of every route would never load
     search_fields = ('description', 'route__name')
+    search_help_text = "Description or route name; a number also matches issue and route ids."
     readonly_fields = ('created_at',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        The stock search joins walking_routes and ORs two ILIKEs, which
+        scans every issue. Here matching route ids are looked up first,
+        through the walking_routes name index, so each term is a BitmapOr
+        of the description trigram index and the route_id index.
+        """
+        for term in search_term.split():
+            route_ids = list(
+                WalkingRoute.objects.filter(name__icontains=term)
+                .values_list('pk', flat=True)[:SEARCH_ROUTE_LIMIT]
+            )
+            match = Q(description__icontains=term) | Q(route_id__in=route_ids)
+            if term.isdigit():
+                match |= Q(pk=int(term)) | Q(route_id=int(term))
+            queryset = queryset.filter(match)
+        return queryset, False
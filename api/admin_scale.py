@@ -0,0 +1,217 @@
+"""
+Admin changelists that stay usable on tables with millions of rows.
+
+Out of the box, every changelist page view runs an exact COUNT(*) of the
+filtered table and another of the whole table, a SELECT DISTINCT per value
+filter, and an OFFSET query that reads and throws away every earlier page.
+ScalableAdmin swaps each of those out:
+
+  - counts are the planner's row estimate (EXPLAIN), counted exactly only
+    when the estimate is small (EstimatedCountPaginator),
+  - in the default order, pages are fetched by keyset: ?after=<cursor>
+    holds the sort key of the last row shown, so even a deep page is one
+    index range scan. Sorting by a column falls back to numbered pages,
+  - CachedValuesFilter lists a column's values from a per-process cache,
+    refreshed with a loose index scan when the table's data version moves,
+  - the full, unfiltered count and facet counts are switched off.
+
+Migration 0010 adds the indexes these rely on.
+"""
+import json
+import threading
+import time
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .versions import data_version
+
+AFTER_VAR = "after"
+CURSOR_SEPARATOR = "~"
+
+# Estimates below this are replaced by an exact count, which is cheap there.
+EXACT_COUNT_BELOW = 10_000
+
+# Facet values are checked against data_versions at most this often.
+FACET_RECHECK_SECONDS = 30
+FACET_LIMIT = 200
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose count comes from the planner rather than COUNT(*)."""
+
+    estimated = False
+
+    def _estimate(self):
+        qs = self.object_list.order_by().select_related(None)
+        sql, params = qs.query.sql_with_params()
+        with connections[qs.db].cursor() as cur:
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @cached_property
+    def count(self):
+        estimate = self._estimate()
+        if estimate < EXACT_COUNT_BELOW:
+            return self.object_list.count()
+        self.estimated = True
+        return estimate
+
+
+# --- keyset pages ------------------------------------------------------------
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList that pages by keyset when the list is in its default order,
+    i.e. no ?o= column sort, and that order is on plain model fields.
+    """
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # The cursor isn't a filter, and a new filter, search or sort
+        # starts again from the top, so it is kept out of the params that
+        # every link and the search form are built from.
+        self.params.pop(AFTER_VAR, None)
+        self.filter_params.pop(AFTER_VAR, None)
+        return super().get_queryset(request, exclude_parameters)
+
+    def _keyset_fields(self, request):
+        """[(field, descending)] of the default order, or None."""
+        if ORDER_VAR in self.params:
+            return None
+        fields = []
+        for item in self.get_ordering(request, self.root_queryset):
+            if not isinstance(item, str):
+                return None
+            name = item.lstrip("-")
+            if name == "pk":
+                name = self.lookup_opts.pk.name
+            try:
+                field = self.lookup_opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.is_relation:
+                return None
+            fields.append((field, item.startswith("-")))
+        return fields or None
+
+    def _parse_cursor(self, cursor):
+        parts = cursor.split(CURSOR_SEPARATOR)
+        if len(parts) != len(self.keyset):
+            raise IncorrectLookupParameters
+        try:
+            return [field.to_python(part) for (field, _), part in zip(self.keyset, parts)]
+        except ValidationError:
+            raise IncorrectLookupParameters
+
+    def _cursor(self, obj):
+        return CURSOR_SEPARATOR.join(
+            str(field.value_from_object(obj)) for field, _ in self.keyset
+        )
+
+    def _after(self, values):
+        """Rows that sort after the given key, in the keyset order."""
+        beyond = Q()
+        equal = Q()
+        for (field, desc), value in zip(self.keyset, values):
+            beyond |= equal & Q(**{f"{field.name}__{'lt' if desc else 'gt'}": value})
+            equal &= Q(**{field.name: value})
+        # The redundant bound on the first field is what the index scan
+        # starts from; the OR above is only checked as a filter.
+        first, desc = self.keyset[0]
+        return Q(**{f"{first.name}__{'lte' if desc else 'gte'}": values[0]}) & beyond
+
+    def get_results(self, request):
+        self.keyset = self._keyset_fields(request)
+        if self.keyset is None:
+            return super().get_results(request)
+
+        cursor = request.GET.get(AFTER_VAR)
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self._after(self._parse_cursor(cursor)))
+        result_list = queryset[: self.list_per_page]
+        rows = list(result_list)
+        has_next = len(rows) == self.list_per_page and queryset.filter(
+            self._after([field.value_from_object(rows[-1]) for field, _ in self.keyset])
+        ).exists()
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = paginator.count
+        self.result_count_estimated = getattr(paginator, "estimated", False)
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = bool(cursor) or has_next
+        self.paginator = paginator
+        self.next_url = self.get_query_string({AFTER_VAR: self._cursor(rows[-1])}) if has_next else None
+        self.first_url = self.get_query_string() if cursor else None
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """ModelAdmin with estimated counts, keyset pages and no full count."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    change_list_template = "admin/scalable_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+# --- cached filter values ------------------------------------------------------
+
+# Walks a btree index one distinct value at a time: a handful of index
+# probes instead of a scan of the table.
+DISTINCT_SQL = """
+  WITH RECURSIVE v AS (
+    (SELECT {col} AS val FROM {table} WHERE {col} IS NOT NULL ORDER BY {col} LIMIT 1)
+    UNION ALL
+    SELECT (SELECT {col} FROM {table} WHERE {col} > v.val ORDER BY {col} LIMIT 1)
+    FROM v WHERE v.val IS NOT NULL
+  )
+  SELECT val FROM v WHERE val IS NOT NULL LIMIT %s;
+"""
+
+HAS_NULL_SQL = "SELECT EXISTS (SELECT 1 FROM {table} WHERE {col} IS NULL);"
+
+_facets = {}
+_facets_lock = threading.Lock()
+
+
+def facet_values(table, column):
+    """Distinct values of table.column, then None if it has NULLs; cached."""
+    key = (table, column)
+    version, values, checked_at = _facets.get(key, (None, None, 0.0))
+    if values is not None and time.monotonic() - checked_at < FACET_RECHECK_SECONDS:
+        return values
+    with _facets_lock:
+        current = data_version(table)
+        if current != version or values is None:
+            with connection.cursor() as cur:
+                cur.execute(DISTINCT_SQL.format(table=table, col=column), [FACET_LIMIT])
+                values = [r[0] for r in cur.fetchall()]
+                cur.execute(HAS_NULL_SQL.format(table=table, col=column))
+                if cur.fetchone()[0]:
+                    values.append(None)
+        _facets[key] = (current, values, time.monotonic())
+    return values
+
+
+class CachedValuesFilter(admin.AllValuesFieldListFilter):
+    """AllValuesFieldListFilter that reads its choices from facet_values()."""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.lookup_choices = facet_values(model._meta.db_table, field.column)
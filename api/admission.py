@@ -0,0 +1,275 @@
+"""
+Admission control for the API views.
+
+@admit(classify) wraps a view with:
+  - cost estimation: classify(request) checks the request parameters
+    (radius_m, limit, ...) and returns the endpoint class the request belongs
+    to, e.g. "light" or "heavy". It raises ValueError for requests that are
+    too expensive to run at all, which become a 400.
+  - coalescing: identical GET requests already in flight wait for the one
+    that is running and get a copy of its response, instead of each running
+    the same query. Requests only share with others routed to the same
+    kind of database (primary or replica), and a client that has just
+    written (api.db_routing's sticky cookie) never joins another's query.
+    A streamed response can't be shared: streaming views opt out with
+    admit(..., coalesce=False), and a request whose leader streamed anyway
+    runs on its own.
+  - concurrency slots: each class has a fixed number of slots per process
+    (settings.ADMISSION_CLASSES). A request that finds none free is shed
+    right away with 503 and Retry-After instead of queueing. A client that
+    already holds its share of a class's slots gets 429.
+  - statement timeout: _fetchall runs with SET LOCAL statement_timeout
+    set to the class's budget. A query cancelled by it becomes a 503.
+"""
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+import ipaddress
+import math
+import threading
+
+from django.conf import settings
+from django.db import OperationalError
+from django.http import HttpResponse
+from psycopg2 import errors as pg_errors
+
+from .db_routing import reads_primary, recently_wrote
+from .fastjson import FastJsonResponse
+
+# Read by views._fetchall; None means no per-statement limit.
+statement_timeout_ms = ContextVar("statement_timeout_ms", default=None)
+
+COALESCE_WAIT_SECONDS = 30
+
+
+class _EndpointClass:
+    def __init__(self, name, slots, timeout_ms=None, per_client=None, retry_after=1):
+        self.name = name
+        self.timeout_ms = timeout_ms
+        self.per_client = per_client
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(slots)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, client):
+        """Returns None on success, or the status code to shed with."""
+        with self._lock:
+            held = self._clients.get(client, 0)
+            if self.per_client is not None and held >= self.per_client:
+                return 429
+            if not self._slots.acquire(blocking=False):
+                return 503
+            self._clients[client] = held + 1
+        return None
+
+    def release(self, client):
+        with self._lock:
+            held = self._clients.get(client, 1) - 1
+            if held:
+                self._clients[client] = held
+            else:
+                self._clients.pop(client, None)
+            self._slots.release()
+
+
+_classes = {}
+_classes_lock = threading.Lock()
+
+
+def _endpoint_class(name):
+    with _classes_lock:
+        if name not in _classes:
+            _classes[name] = _EndpointClass(name, **settings.ADMISSION_CLASSES[name])
+        return _classes[name]
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.streamed = False
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _proxy_networks(proxies):
+    return tuple(ipaddress.ip_network(p, strict=False) for p in proxies)
+
+
+def _trusted_proxy(address):
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in net for net in _proxy_networks(tuple(settings.ADMISSION_TRUSTED_PROXIES)))
+
+
+def _client_key(request):
+    # Only a trusted proxy's headers say who the client is; a request that
+    # reaches the app directly could put anything in them. nginx sets
+    # X-Real-IP, replacing any the client sent, and appends the address it
+    # saw to X-Forwarded-For, whose earlier entries come from the client.
+    remote = request.META.get("REMOTE_ADDR", "")
+    if not _trusted_proxy(remote):
+        return remote
+    real_ip = request.META.get("HTTP_X_REAL_IP")
+    if real_ip:
+        return real_ip.strip()
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    if forwarded:
+        return forwarded.split(",")[-1].strip()
+    return remote
+
+
+def _shed(status, retry_after, message):
+    response = FastJsonResponse({"error": message}, status=status)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def _copy(response):
+    """The response for a waiter: same body, status and headers (Retry-After
+    and all), but not the leader's cookies."""
+    copy = HttpResponse(content=response.content, status=response.status_code)
+    for header, value in response.items():
+        copy[header] = value
+    return copy
+
+
+def _release_when_streamed(content, release):
+    try:
+        yield from content
+    finally:
+        release()
+
+
+async def _release_when_streamed_async(content, release):
+    try:
+        async for part in content:
+            yield part
+    finally:
+        release()
+
+
+def _run(view, request, args, kwargs, cls):
+    client = _client_key(request)
+    refused = cls.try_acquire(client)
+    if refused == 429:
+        return _shed(429, cls.retry_after, f"too many concurrent {cls.name} requests from this client")
+    if refused == 503:
+        return _shed(503, cls.retry_after, f"server busy ({cls.name} requests)")
+
+    token = statement_timeout_ms.set(cls.timeout_ms)
+    release_now = True
+    try:
+        try:
+            response = view(request, *args, **kwargs)
+        except OperationalError as e:
+            if isinstance(e.__cause__, pg_errors.QueryCanceled):
+                return _shed(503, cls.retry_after, f"query exceeded {cls.timeout_ms} ms")
+            raise
+        if response.streaming:
+            # The work happens while the body streams; hold the slot until then.
+            wrap = _release_when_streamed_async if response.is_async else _release_when_streamed
+            response.streaming_content = wrap(response.streaming_content, lambda: cls.release(client))
+            release_now = False
+        return response
+    finally:
+        statement_timeout_ms.reset(token)
+        if release_now:
+            cls.release(client)
+
+
+def admit(classify, coalesce=True):
+    """
+    coalesce=False is for views that stream their response: a stream can
+    only be read once, so there is nothing to hand to identical requests.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                cls = _endpoint_class(classify(request))
+            except ValueError as e:
+                return FastJsonResponse({"error": str(e)}, status=400)
+
+            if not coalesce or request.method != "GET" or recently_wrote(request):
+                return _run(view, request, args, kwargs, cls)
+
+            key = (view.__module__, view.__name__, reads_primary(), args, tuple(sorted(kwargs.items())),
+                   tuple(sorted((k, tuple(v)) for k, v in request.GET.lists())))
+            with _inflight_lock:
+                flight = _inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = _inflight[key] = _Flight()
+
+            if not leader:
+                if not flight.done.wait(COALESCE_WAIT_SECONDS):
+                    return _shed(503, cls.retry_after, "identical request timed out")
+                if flight.streamed:
+                    # The leader streamed after all; run this one for itself.
+                    return _run(view, request, args, kwargs, cls)
+                if flight.response is None:
+                    return _shed(503, cls.retry_after, "identical request failed")
+                return _copy(flight.response)
+
+            try:
+                response = _run(view, request, args, kwargs, cls)
+                if response.streaming:
+                    flight.streamed = True
+                else:
+                    flight.response = response
+                return response
+            finally:
+                with _inflight_lock:
+                    del _inflight[key]
+                flight.done.set()
+        return wrapper
+    return decorator
+
+
+# --- classifiers -----------------------------------------------------------
+
+def fixed(name):
+    return lambda request: name
+
+
+def _parameter(request, param, default, parse):
+    """The parsed parameter, or None when it doesn't parse (the view then
+    reports it). NaN and infinities would slip past every comparison, so
+    they are refused here."""
+    try:
+        value = parse(request.GET.get(param, default))
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(value):
+        raise ValueError(f"{param} must be a finite number")
+    return value
+
+
+def by_radius(default, max_radius, heavy_above):
+    """light/heavy by radius_m; more than max_radius is refused."""
+    def classify(request):
+        radius = _parameter(request, "radius_m", default, float)
+        if radius is None:
+            return "light"  # let the view report the bad parameter
+        if radius > max_radius:
+            raise ValueError(f"radius_m must be at most {max_radius:g}")
+        return "heavy" if radius > heavy_above else "light"
+    return classify
+
+
+def by_limit(param, default, max_limit, heavy_above):
+    """light/heavy by a row limit parameter; more than max_limit is refused."""
+    def classify(request):
+        limit = _parameter(request, param, default, int)
+        if limit is None:
+            return "light"
+        if limit > max_limit:
+            raise ValueError(f"{param} must be at most {max_limit}")
+        return "heavy" if limit > heavy_above else "light"
+    return classify
@@ -0,0 +1,203 @@
+"""
+Park amenities and the in-memory bitset index over them.
+
+The DCC parks data has one column per facility (Skateboard, MUGA, Toilets,
+...). The ingest mapping keeps the ones a park has in parks.amenities
+(migration 0011) as the keys of AMENITIES.
+
+AmenityIndex holds one Python int per amenity, used as a bitset over the
+parks in id order: bit i is set when the i-th park has that amenity. A
+filter on several amenities is an AND of a few ints and a facet count is a
+popcount, so neither needs the database; 20,000 parks cost 2.5 kB per
+amenity. It is built on first use (warm.preload builds it up front), rebuilt
+by ingest after a parks load, and, like warm.NameIndex, reloaded when
+data_versions moves, which every import does.
+"""
+from array import array
+from collections import Counter
+import threading
+import time
+
+from django.db import DatabaseError, connection
+
+# Amenity key -> DCC property.
+AMENITIES = {
+    "all_weather_pitches": "All_Weather_Pitches",
+    "astro_pitches": "Astro_Pitches",
+    "athletics": "Athletics",
+    "basketball_court": "Basketball_Court",
+    "basketball_practice_area": "Basketball_Practice_Area",
+    "bowling_green": "Bowling_Green",
+    "changing_rooms": "Changing_Rooms",
+    "croquet_lawn": "Croquet_Lawn",
+    "five_a_side": "Football_5_a_Side",
+    "gaa": "GAA",
+    "golf_pitch_and_putt": "Golf_Pitch_and_Putt",
+    "hard_landscape": "Hard_Landscape",
+    "leisure_walks": "Leisure_Walks",
+    "model_car_racing": "Model_Car_Racing",
+    "muga": "MUGA",
+    "outdoor_boules": "Outdoor_Boules",
+    "pavilion": "Pavillion",
+    "playground": "Playground",
+    "rugby": "Rugby",
+    "seven_a_side": "Seven_a_Side",
+    "shelter": "Shelter",
+    "showers": "Showers",
+    "skateboard": "Skateboard",
+    "soccer": "Soccer_Football",
+    "table_tennis": "Table_Tennis",
+    "tennis": "Tennis",
+    "toilets": "Toilets",
+}
+
+# Values that mean the park doesn't have it. Anything else ("yes", a count,
+# a note) means it does.
+ABSENT = {"", "no", "none", "0", "proposed"}
+
+INDEX_RECHECK_SECONDS = 5
+
+INDEX_SQL = "SELECT id, amenities FROM parks ORDER BY id;"
+
+FACETS_SQL = """
+  SELECT a.name, count(*)
+  FROM parks, unnest(parks.amenities) AS a(name)
+  WHERE parks.id = ANY(%s)
+  GROUP BY a.name;
+"""
+
+
+def park_amenities(props):
+    """Sorted amenity keys present in a feature's properties."""
+    return sorted(
+        key for key, prop in AMENITIES.items()
+        if props.get(prop) is not None and str(props[prop]).strip().lower() not in ABSENT
+    )
+
+
+def parse_amenities(value):
+    """Amenity keys from a comma-separated ?amenities= value."""
+    names = sorted({n.strip().lower() for n in (value or "").split(",") if n.strip()})
+    unknown = [n for n in names if n not in AMENITIES]
+    if unknown:
+        raise ValueError(f"unknown amenities {', '.join(unknown)}; known: {', '.join(AMENITIES)}")
+    return names
+
+
+def _bitset(positions, size):
+    mask = bytearray((size + 7) // 8)
+    for position in positions:
+        mask[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(mask, "little")
+
+
+class AmenityIndex:
+    """Per-amenity bitsets over park ids. Methods return None when unusable."""
+
+    def __init__(self):
+        # (version, ids by position, position by id, {amenity: bitset}),
+        # swapped in one assignment so readers see old or new, never half.
+        self.state = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        from .versions import data_version
+        return data_version("parks")
+
+    def load(self):
+        with connection.cursor() as cur:
+            version = self._current_version()
+            cur.execute(INDEX_SQL)
+            rows = cur.fetchall()
+        ids = array("q", (pk for pk, _ in rows))
+        members = {name: [] for name in AMENITIES}
+        for position, (_, amenities) in enumerate(rows):
+            for name in amenities or ():
+                if name in members:
+                    members[name].append(position)
+        bits = {name: _bitset(p, len(ids)) for name, p in members.items()}
+        positions = {pk: position for position, pk in enumerate(ids)}
+        self.state, self.checked_at = (version, ids, positions, bits), time.monotonic()
+        return len(ids)
+
+    def snapshot(self):
+        """The current state, loaded or reloaded as needed, or None."""
+        if self.state is None:
+            return self._first_load()
+        if time.monotonic() - self.checked_at > INDEX_RECHECK_SECONDS:
+            try:
+                with self._lock:
+                    if self._current_version() != self.state[0]:
+                        self.load()
+                    else:
+                        self.checked_at = time.monotonic()
+            except DatabaseError:
+                return None
+        return self.state
+
+    def _first_load(self):
+        # After a failure, wait INDEX_RECHECK_SECONDS before trying again so
+        # a down database doesn't cost every request a full scan attempt.
+        if self.checked_at and time.monotonic() - self.checked_at <= INDEX_RECHECK_SECONDS:
+            return None
+        try:
+            with self._lock:
+                if self.state is None:
+                    self.load()
+        except DatabaseError:
+            self.checked_at = time.monotonic()
+            return None
+        return self.state
+
+    def match(self, names):
+        """(state, bitset of parks having every amenity in names)."""
+        state = self.snapshot()
+        if state is None:
+            return None
+        _, ids, _, bits = state
+        matched = (1 << len(ids)) - 1
+        for name in names:
+            matched &= bits[name]
+        return state, matched
+
+    @staticmethod
+    def ids(state, matched):
+        """Park ids whose bit is set, in id order."""
+        ids = state[1]
+        out = []
+        for byte_index, byte in enumerate(matched.to_bytes((len(ids) + 7) // 8, "little")):
+            while byte:
+                low = byte & -byte
+                out.append(ids[(byte_index << 3) + low.bit_length() - 1])
+                byte ^= low
+        return out
+
+    @staticmethod
+    def counts(state, pks):
+        """{amenity: how many of pks have it}, for amenities at least one has."""
+        positions, bits = state[2], state[3]
+        subset = _bitset((positions[pk] for pk in pks if pk in positions), len(positions))
+        counts = {name: (subset & b).bit_count() for name, b in bits.items()}
+        return {name: n for name, n in counts.items() if n}
+
+
+index = AmenityIndex()
+
+
+def facet_counts(rows):
+    """
+    {amenity: count} over result rows (dicts with an id). Without the
+    bitsets, counted from the rows' amenities, or from parks when the rows
+    don't carry them (the preloaded name search rows don't).
+    """
+    state = index.snapshot()
+    if state is not None:
+        return index.counts(state, [r["id"] for r in rows])
+    if all("amenities" in r for r in rows):
+        counts = Counter(name for r in rows for name in r["amenities"] or ())
+    else:
+        with connection.cursor() as cur:
+            cur.execute(FACETS_SQL, [[r["id"] for r in rows]])
+            counts = dict(cur.fetchall())
+    return {name: counts[name] for name in AMENITIES if counts.get(name)}
@@ -0,0 +1,133 @@
+"""
+Retention for the monthly access_issues partitions (migrations 0009 and 0017).
+
+maintain() makes sure the coming months have partitions and moves any rows
+that ended up in access_issues_default into a partition for their month,
+without firing the row triggers, since the rows themselves don't change.
+
+archive() takes every month older than the retention window out of the
+live table:
+
+  1. detaches the partition, so queries and triggers stop seeing it,
+  2. writes it to <root>/access_issues_YYYY_MM.csv.gz (COPY csv with a
+     header; COPY ... FROM restores it into a table of the same shape),
+  3. takes its rows back out of access_issue_clusters,
+     route_issue_summary and the hex_cells open issue counts, which DETACH
+     doesn't do, and bumps the access_issues data version,
+  4. drops it, unless keep_tables is set.
+
+Each month is handled in its own transaction, so an interrupted run leaves
+every month either fully live or fully archived. The file is written as
+<name>.csv.gz.tmp and renamed after the commit; a run killed between the
+commit and the rename leaves the month's rows in that .tmp file.
+"""
+from datetime import date
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+
+MONTHS_AHEAD = 3
+KEEP_MONTHS = 24
+
+PARTITION_RE = re.compile(r"^access_issues_(\d{4})_(\d{2})$")
+
+PARTITIONS_SQL = """
+  SELECT c.relname
+  FROM pg_inherits i
+  JOIN pg_class c ON c.oid = i.inhrelid
+  WHERE i.inhparent = 'access_issues'::regclass
+  ORDER BY c.relname;
+"""
+
+
+def partitions():
+    """[(name, first day of its month)] of the monthly partitions, oldest first."""
+    with connection.cursor() as cur:
+        cur.execute(PARTITIONS_SQL)
+        names = [r[0] for r in cur.fetchall()]
+    out = []
+    for name in names:
+        m = PARTITION_RE.match(name)
+        if m:
+            out.append((name, date(int(m.group(1)), int(m.group(2)), 1)))
+    return out
+
+
+def _months_before(day, months):
+    index = day.year * 12 + day.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def maintain(months_ahead=MONTHS_AHEAD):
+    """Create missing partitions; returns how many were created."""
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute("SELECT DISTINCT date_trunc('month', created_at) FROM access_issues_default;")
+        created = 0
+        for (month,) in cur.fetchall():
+            cur.execute("SELECT access_issues_ensure_partition(%s);", [month])
+            created += cur.fetchone()[0]
+        cur.execute("""
+          SELECT access_issues_ensure_partitions(
+            now()::timestamp, now()::timestamp + make_interval(months => %s)
+          );
+        """, [months_ahead])
+        created += cur.fetchone()[0]
+    return created
+
+
+def _archive_partition(name, path, keep_tables):
+    tmp = path + ".tmp"
+    try:
+        with transaction.atomic(), connection.cursor() as cur:
+            cur.execute(f"ALTER TABLE access_issues DETACH PARTITION {name};")
+            with gzip.open(tmp, "wb") as f:
+                cur.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", f)
+            cur.execute(f"""
+              SELECT access_issue_clusters_bump(geom, issue_type, -1),
+                     route_issue_summary_bump(route_id, issue_type, created_at, -1)
+              FROM {name};
+            """)
+            rows = cur.rowcount
+            cur.execute(f"""
+              INSERT INTO hex_cells_dirty
+              SELECT c.size, c.i, c.j, 'access_issues' FROM {name} x, hex_cells_of(x.geom) c
+              ON CONFLICT DO NOTHING;
+            """)
+            cur.execute("SELECT hex_cells_refresh();")
+            cur.execute("""
+              UPDATE data_versions SET version = version + 1, changed_at = now()
+              WHERE table_name = 'access_issues';
+            """)
+            if not keep_tables:
+                cur.execute(f"DROP TABLE {name};")
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    # Renamed only once the month is out of the live table, so a rolled back
+    # month never leaves an archive beside it. After the commit the .tmp
+    # file may be the only copy of the rows, so nothing removes it here.
+    os.replace(tmp, path)
+    return rows
+
+
+def archive(keep_months=KEEP_MONTHS, root=None, keep_tables=False, dry_run=False, today=None):
+    """
+    Archive every partition that ends before the last keep_months months.
+    Returns [(partition, path, rows)]; rows is None on a dry run.
+    """
+    root = str(root or settings.ACCESS_ISSUE_ARCHIVE_ROOT)
+    cutoff = _months_before((today or date.today()).replace(day=1), keep_months)
+    os.makedirs(root, exist_ok=True)
+
+    done = []
+    for name, month in partitions():
+        if month >= cutoff:
+            continue
+        path = os.path.join(root, f"{name}.csv.gz")
+        rows = None if dry_run else _archive_partition(name, path, keep_tables)
+        done.append((name, path, rows))
+    return done
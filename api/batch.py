@@ -0,0 +1,87 @@
+"""
+Helpers for set-based batch jobs (batch KNN, grid analysis).
+
+Work is split into fixed-size chunks and each chunk runs as one SQL statement.
+Chunks run on a small pool of worker threads. Django keeps one DB connection
+per thread and psycopg2 releases the GIL while Postgres works, so N threads
+keep N backends busy. Each worker opens its connection once and closes it
+when it exits. Only a bounded number of chunks is in flight at once, so the
+input can be a stream of any length.
+"""
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
+import os
+import queue
+import threading
+
+from django.db import connections
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def default_workers():
+    return min(8, os.cpu_count() or 1)
+
+
+def chunked(iterable, size=DEFAULT_CHUNK_SIZE):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _worker(fn, tasks):
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            future, chunk = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(chunk))
+            except BaseException as e:
+                future.set_exception(e)
+    finally:
+        # Worker threads own their connections; don't leak them.
+        connections.close_all()
+
+
+def parallel_map(fn, chunks, workers=None):
+    """
+    Like map(fn, chunks), but runs up to `workers` chunks at once.
+    Results come back in input order. At most 2 * workers chunks are held
+    in memory at any time.
+    """
+    workers = workers or default_workers()
+    if workers <= 1:
+        yield from (fn(chunk) for chunk in chunks)
+        return
+
+    tasks = queue.SimpleQueue()
+    threads = [threading.Thread(target=_worker, args=(fn, tasks), daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    pending = deque()
+    try:
+        for chunk in chunks:
+            future = Future()
+            tasks.put((future, chunk))
+            pending.append(future)
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Also reached when the consumer stops early (a client disconnect):
+        # drop the chunks not started yet and wait for the rest.
+        for future in pending:
+            future.cancel()
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
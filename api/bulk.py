@@ -0,0 +1,268 @@
+"""
+Bulk playground writes ("apply these 800 edits from the council register").
+
+A batch is a list of create/update/delete operations, as JSON
+
+    {"operations": [
+      {"op": "create", "name": "Mount Street", "lat": 53.337, "lng": -6.244},
+      {"op": "update", "id": 12, "name": "Merrion Square"},
+      {"op": "delete", "id": 13}
+    ]}
+
+(a bare list works too) or as GeoJSONSeq, one feature per line with op, id,
+name and source in its properties and a Point geometry where one is needed.
+Without an op, an item with an id is an update and one without is a create.
+
+Every item is checked before anything is written, and one bad item rejects
+the whole batch. A valid batch is applied in one transaction with at most
+three statements, one per op, each taking its rows as arrays through
+unnest(). The statement triggers would bump the playgrounds data version
+and refresh the hexagon cells after each of them; both are held back and
+done once for the batch, so caches keyed on the data version are
+invalidated once. The row-level NOTIFYs for the live stream still go out
+per playground.
+"""
+from collections import namedtuple
+import json
+
+from django.db import connection, transaction
+
+from .admission import statement_timeout_ms
+from .hexcells import deferred_refresh
+
+MAX_OPERATIONS = 5000
+MAX_ID = 2**31 - 1
+
+OPS = ("create", "update", "delete")
+
+Operation = namedtuple("Operation", "index op id name source lng lat error")
+
+# The ids are drawn up front so each new row can be matched back to its
+# item; RETURNING alone says nothing about which input row it came from.
+CREATE_SQL = """
+  WITH incoming AS (
+    SELECT o.ord, nextval(pg_get_serial_sequence('playgrounds', 'id'))::int AS id,
+           o.name, o.source, o.lng, o.lat
+    FROM unnest(%s::int[], %s::text[], %s::text[], %s::float8[], %s::float8[])
+         AS o(ord, name, source, lng, lat)
+  ), inserted AS (
+    INSERT INTO playgrounds (id, name, source, geom)
+    SELECT id, name, source, ST_SetSRID(ST_MakePoint(lng, lat), 4326) FROM incoming
+    RETURNING id, name, source, geom
+  )
+  SELECT n.ord, p.id, p.name, p.source, ST_AsGeoJSON(p.geom) AS geom
+  FROM inserted p JOIN incoming n USING (id);
+"""
+
+UPDATE_SQL = """
+  UPDATE playgrounds p
+  SET name   = COALESCE(o.name, p.name),
+      source = COALESCE(o.source, p.source),
+      geom   = CASE WHEN o.lng IS NULL THEN p.geom
+                    ELSE ST_SetSRID(ST_MakePoint(o.lng, o.lat), 4326) END
+  FROM unnest(%s::int[], %s::int[], %s::text[], %s::text[], %s::float8[], %s::float8[])
+       AS o(ord, id, name, source, lng, lat)
+  WHERE p.id = o.id
+  RETURNING o.ord, p.id, p.name, p.source, ST_AsGeoJSON(p.geom) AS geom;
+"""
+
+DELETE_SQL = """
+  DELETE FROM playgrounds p
+  USING unnest(%s::int[], %s::int[]) AS o(ord, id)
+  WHERE p.id = o.id
+  RETURNING o.ord, p.id;
+"""
+
+BUMP_SQL = """
+  UPDATE data_versions SET version = version + 1, changed_at = now()
+  WHERE table_name = 'playgrounds';
+"""
+
+
+def _integer(value):
+    """value as an int if it is one or a string of digits, else None."""
+    if type(value) is int:
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    return None
+
+
+def _number(value):
+    """value as a float; bools and non-numeric strings raise ValueError."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{value!r} is not a number")
+    return float(value)
+
+
+def _operation(index, fields, point):
+    """Operation for one item, with error set when it can't be applied."""
+    op = fields.get("op") or ("create" if fields.get("id") is None else "update")
+
+    def invalid(error):
+        return Operation(index, op, fields.get("id"), None, None, None, None, error)
+
+    if op not in OPS:
+        return invalid(f"op must be one of {', '.join(OPS)}")
+    pk = None
+    if op == "create":
+        if fields.get("id") is not None:
+            return invalid("create takes no id")
+    else:
+        pk = _integer(fields.get("id"))
+        if pk is None:
+            return invalid("integer id required")
+        if not 0 < pk <= MAX_ID:
+            return invalid("id out of range")
+    name, source = fields.get("name"), fields.get("source")
+    if not isinstance(name, (str, type(None))) or not isinstance(source, (str, type(None))):
+        return invalid("name and source must be strings")
+
+    lng = lat = None
+    if op != "delete" and point is not None:
+        lng, lat = point
+        if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+            return invalid("lng/lat out of range")
+    if op == "create":
+        if lng is None:
+            return invalid("lat and lng required")
+        name, source = name or "Playground", source or "Manual"
+    elif op == "update" and lng is None and name is None and source is None:
+        return invalid("nothing to update: give name, source or lat/lng")
+    return Operation(index, op, pk, name, source, lng, lat, None)
+
+
+def _from_json(items):
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            yield Operation(index, None, None, None, None, None, None, "operation must be an object")
+            continue
+        try:
+            point = None
+            if item.get("lat") is not None or item.get("lng") is not None:
+                point = _number(item.get("lng")), _number(item.get("lat"))
+        except Exception as e:
+            yield _operation(index, item, None)._replace(error=f"lat,lng must both be numbers: {e}")
+            continue
+        yield _operation(index, item, point)
+
+
+def _from_geojsonseq(lines):
+    index = 0
+    for text in lines:
+        text = text.strip().lstrip("\x1e")
+        if not text:
+            continue
+        try:
+            feat = json.loads(text)
+            props = dict(feat.get("properties") or {})
+            props.setdefault("id", feat.get("id"))
+            geom = feat.get("geometry")
+            point = None
+            if geom is not None:
+                if geom.get("type") != "Point":
+                    raise ValueError("geometry must be a Point")
+                coords = geom.get("coordinates")
+                if not isinstance(coords, list) or len(coords) < 2:
+                    raise ValueError("a Point needs [lng, lat] coordinates")
+                point = _number(coords[0]), _number(coords[1])
+        except Exception as e:
+            yield Operation(index, None, None, None, None, None, None, f"feature required: {e}")
+        else:
+            yield _operation(index, props, point)
+        index += 1
+
+
+def parse_operations(body, fmt=None):
+    """
+    List of Operations from a request body, in input order. Items that
+    can't be applied have `error` set. fmt is "json", "geojsonseq", or None
+    to guess from the body. Raises ValueError when the body isn't a batch.
+    """
+    if fmt is None:
+        fmt = "geojsonseq"
+        if not body.lstrip().startswith("\x1e"):
+            try:
+                doc = json.loads(body)
+            except ValueError:
+                doc = None
+            if isinstance(doc, list) or (isinstance(doc, dict) and "operations" in doc):
+                fmt = "json"
+
+    if fmt == "json":
+        doc = json.loads(body)
+        items = doc.get("operations") if isinstance(doc, dict) else doc
+        if not isinstance(items, list):
+            raise ValueError('body must be a list of operations or {"operations": [...]}')
+        ops = list(_from_json(items))
+    elif fmt == "geojsonseq":
+        ops = list(_from_geojsonseq(body.splitlines()))
+    else:
+        raise ValueError(f"unknown operation format: {fmt}")
+
+    if not ops:
+        raise ValueError("no operations")
+    if len(ops) > MAX_OPERATIONS:
+        raise ValueError(f"at most {MAX_OPERATIONS} operations per batch")
+
+    # Two operations on one playground would depend on statement order.
+    seen = set()
+    for i, o in enumerate(ops):
+        if o.error is None and o.id is not None:
+            if o.id in seen:
+                ops[i] = o._replace(error="id appears more than once in the batch")
+            seen.add(o.id)
+    return ops
+
+
+def apply_operations(ops):
+    """
+    Apply a batch with no errors in one transaction. Returns one result per
+    operation, in input order:
+      {"index", "op", "status": "created"|"updated"|"deleted", "id", ...}
+    or status "not_found" for an update or delete of an id that isn't there.
+    """
+    by_op = {op: [o for o in ops if o.op == op] for op in OPS}
+    results = {}
+    with transaction.atomic(), connection.cursor() as cur:
+        timeout_ms = statement_timeout_ms.get()
+        if timeout_ms is not None:
+            cur.execute("SELECT set_config('statement_timeout', %s, true);", [str(timeout_ms)])
+        cur.execute("SELECT set_config('greenspace.skip_version_bump', 'on', true);")
+        with deferred_refresh(cur):
+            if by_op["delete"]:
+                cur.execute(DELETE_SQL, [
+                    [o.index for o in by_op["delete"]],
+                    [o.id for o in by_op["delete"]],
+                ])
+                for ord_, pk in cur.fetchall():
+                    results[ord_] = {"status": "deleted", "id": pk}
+            if by_op["update"]:
+                cur.execute(UPDATE_SQL, [
+                    [o.index for o in by_op["update"]],
+                    [o.id for o in by_op["update"]],
+                    [o.name for o in by_op["update"]],
+                    [o.source for o in by_op["update"]],
+                    [o.lng for o in by_op["update"]],
+                    [o.lat for o in by_op["update"]],
+                ])
+                for ord_, pk, name, source, geom in cur.fetchall():
+                    results[ord_] = {"status": "updated", "id": pk, "name": name, "source": source, "geom": geom}
+            if by_op["create"]:
+                cur.execute(CREATE_SQL, [
+                    [o.index for o in by_op["create"]],
+                    [o.name for o in by_op["create"]],
+                    [o.source for o in by_op["create"]],
+                    [o.lng for o in by_op["create"]],
+                    [o.lat for o in by_op["create"]],
+                ])
+                for ord_, pk, name, source, geom in cur.fetchall():
+                    results[ord_] = {"status": "created", "id": pk, "name": name, "source": source, "geom": geom}
+        cur.execute("SELECT set_config('greenspace.skip_version_bump', 'off', true);")
+        if results:
+            cur.execute(BUMP_SQL)
+
+    return [
+        {"index": o.index, "op": o.op, **results.get(o.index, {"status": "not_found", "id": o.id})}
+        for o in ops
+    ]
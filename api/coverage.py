@@ -0,0 +1,209 @@
+"""
+Playground / park coverage gap analysis.
+
+A square grid (Irish Transverse Mercator, EPSG:2157, so cell sizes are in
+metres) is laid over the extent of the parks and playgrounds. For every cell
+centre we measure the distance to the nearest playground and to the nearest
+park with batched KNN lookups. Cells where either distance exceeds the
+walking threshold are returned as a GeoJSON FeatureCollection.
+
+Grid rows are processed in bands in parallel (see api.batch). Each worker
+thread has its own database connection, so the bands run at the same time
+in separate Postgres backend processes; the threads themselves only wait on
+their queries. Results are cached in coverage_gap_cache until the
+parks/playgrounds data version changes.
+
+Computing a grid takes seconds, so only `python manage.py coverage_gaps`
+does it. /api/coverage/gaps serves the grids in API_GRIDS from the cache,
+the last result when the data has moved on since, and 202 for a grid that
+hasn't been computed yet.
+"""
+import json
+import math
+
+from django.db import connection
+
+from .batch import chunked, parallel_map
+from .versions import data_version
+
+GRID_SRID = 2157
+MIN_CELL_M = 50
+MAX_CELLS = 250_000
+ROWS_PER_CHUNK = 8
+
+# (cell_m, max_m) pairs /api/coverage/gaps computes.
+API_GRIDS = ((250, 400), (250, 800), (500, 800), (500, 1200))
+
+# <-> on EPSG:4326 ranks by degrees, which stretches east-west distances at
+# Dublin's latitude. Taking the true minimum over a few KNN candidates keeps
+# the answer right without giving up the index.
+KNN_CANDIDATES = 5
+
+EXTENT_SQL = """
+  SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e)
+  FROM (
+    SELECT ST_Extent(ST_Transform(geom, %s)) AS e
+    FROM (
+      SELECT geom FROM parks
+      UNION ALL
+      SELECT geom FROM playgrounds
+    ) g
+  ) x;
+"""
+
+BAND_SQL = """
+  WITH cells AS (
+    SELECT gx, gy,
+           ST_MakeEnvelope(
+             %(x0)s + gx * %(cell)s, %(y0)s + gy * %(cell)s,
+             %(x0)s + (gx + 1) * %(cell)s, %(y0)s + (gy + 1) * %(cell)s,
+             %(srid)s
+           ) AS box
+    FROM generate_series(0, %(nx)s - 1) AS gx,
+         generate_series(%(gy0)s, %(gy1)s) AS gy
+  ),
+  pts AS (
+    SELECT gx, gy, box, ST_Transform(ST_Centroid(box), 4326) AS pt
+    FROM cells
+  ),
+  dist AS (
+    SELECT gx, gy, box,
+           (SELECT min(ST_Distance(p.geom::geography, pts.pt::geography))
+            FROM (SELECT geom FROM playgrounds
+                  ORDER BY geom <-> pts.pt LIMIT %(knn)s) p) AS playground_m,
+           (SELECT min(ST_Distance(k.geom::geography, pts.pt::geography))
+            FROM (SELECT geom FROM parks
+                  ORDER BY geom <-> pts.pt LIMIT %(knn)s) k) AS park_m
+    FROM pts
+  )
+  SELECT gx, gy, playground_m, park_m,
+         ST_AsGeoJSON(ST_Transform(box, 4326), 6) AS geom
+  FROM dist
+  WHERE playground_m IS NULL OR playground_m > %(max_m)s
+     OR park_m IS NULL OR park_m > %(max_m)s;
+"""
+
+LOOKUP_SQL = """
+  SELECT result FROM coverage_gap_cache
+  WHERE cache_key = %s AND data_version = %s;
+"""
+
+LATEST_SQL = """
+  SELECT data_version, result FROM coverage_gap_cache WHERE cache_key = %s;
+"""
+
+STORE_SQL = """
+  INSERT INTO coverage_gap_cache (cache_key, data_version, result, computed_at)
+  VALUES (%s, %s, %s, now())
+  ON CONFLICT (cache_key) DO UPDATE
+    SET data_version = EXCLUDED.data_version,
+        result = EXCLUDED.result,
+        computed_at = EXCLUDED.computed_at;
+"""
+
+
+def _cache_key(cell_m, max_m):
+    return f"cell_m={cell_m:g};max_m={max_m:g}"
+
+
+def _current_version():
+    return data_version("parks", "playgrounds")
+
+
+def _load(result):
+    return json.loads(result) if isinstance(result, str) else result
+
+
+def _band(params, rows):
+    with connection.cursor() as cur:
+        cur.execute(BAND_SQL, {**params, "gy0": rows[0], "gy1": rows[-1]})
+        return cur.fetchall()
+
+
+def compute_gaps(cell_m, max_m, workers=None):
+    """Evaluate the whole grid and return the under-served cells as GeoJSON."""
+    if not (math.isfinite(cell_m) and math.isfinite(max_m)):
+        raise ValueError("cell_m and max_m must be finite numbers")
+    if cell_m < MIN_CELL_M:
+        raise ValueError(f"cell_m must be at least {MIN_CELL_M}")
+    if max_m <= 0:
+        raise ValueError("max_m must be positive")
+
+    with connection.cursor() as cur:
+        cur.execute(EXTENT_SQL, [GRID_SRID])
+        x0, y0, x1, y1 = cur.fetchone()
+    if x0 is None:
+        return {"type": "FeatureCollection", "features": [], "grid": None}
+
+    nx = max(1, math.ceil((x1 - x0) / cell_m))
+    ny = max(1, math.ceil((y1 - y0) / cell_m))
+    if nx * ny > MAX_CELLS:
+        raise ValueError(
+            f"grid of {nx}x{ny} cells exceeds {MAX_CELLS}; use a larger cell_m"
+        )
+
+    params = {
+        "x0": x0, "y0": y0, "cell": cell_m, "nx": nx,
+        "srid": GRID_SRID, "knn": KNN_CANDIDATES, "max_m": max_m,
+    }
+    features = []
+    bands = parallel_map(
+        lambda rows: _band(params, rows),
+        chunked(range(ny), ROWS_PER_CHUNK),
+        workers=workers,
+    )
+    for band in bands:
+        for gx, gy, playground_m, park_m, geom in band:
+            features.append({
+                "type": "Feature",
+                "geometry": json.loads(geom),
+                "properties": {
+                    "cell": [gx, gy],
+                    "playground_m": None if playground_m is None else round(playground_m),
+                    "park_m": None if park_m is None else round(park_m),
+                    "no_playground": playground_m is None or playground_m > max_m,
+                    "no_park": park_m is None or park_m > max_m,
+                },
+            })
+
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "grid": {
+            "srid": GRID_SRID, "cell_m": cell_m, "max_m": max_m,
+            "nx": nx, "ny": ny, "cells": nx * ny,
+        },
+    }
+
+
+def cached_gaps(cell_m, max_m):
+    """
+    The last computed result for a grid, whatever data version it was
+    computed from: (result, its data_version, current data_version), or
+    None when the grid has never been computed. Never computes.
+    """
+    with connection.cursor() as cur:
+        cur.execute(LATEST_SQL, [_cache_key(cell_m, max_m)])
+        row = cur.fetchone()
+    if row is None:
+        return None
+    return _load(row[1]), row[0], _current_version()
+
+
+def coverage_gaps(cell_m, max_m, workers=None, refresh=False):
+    """
+    Cached compute_gaps(). Returns (result, data_version, from_cache).
+    """
+    key = _cache_key(cell_m, max_m)
+    version = _current_version()
+    if not refresh:
+        with connection.cursor() as cur:
+            cur.execute(LOOKUP_SQL, [key, version])
+            row = cur.fetchone()
+        if row:
+            return _load(row[0]), version, True
+
+    result = compute_gaps(cell_m, max_m, workers=workers)
+    with connection.cursor() as cur:
+        cur.execute(STORE_SQL, [key, version, json.dumps(result)])
+    return result, version, False
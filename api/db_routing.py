@@ -0,0 +1,126 @@
+"""
+Read-replica routing.
+
+Replicas are the DATABASES aliases named replica1, replica2, ... (built in
+settings from POSTGRES_REPLICA_HOSTS). Reads in GET/HEAD requests go to them
+round-robin. Everything else uses "default":
+  - writes (POST/PATCH/DELETE requests),
+  - any request from a client that wrote within REPLICA_STICKY_SECONDS
+    (read-your-writes, tracked with a cookie),
+  - code running outside a request (management commands, shell),
+  - requests arriving while every replica lags by more than
+    REPLICA_MAX_LAG_SECONDS or is unreachable.
+
+Raw SQL picks its connection with read_alias() (see views._fetchall).
+ReplicaRouter does the same for the ORM, e.g. the admin.
+"""
+from contextvars import ContextVar
+import itertools
+import logging
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+STICKY_COOKIE = "gs_primary_until"
+LAG_CHECK_SECONDS = 2
+
+LAG_SQL = """
+  SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+  END;
+"""
+
+# True outside requests, so commands and shells always see the primary.
+_use_primary = ContextVar("use_primary", default=True)
+_round_robin = itertools.count()
+_lag_cache = {}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+def _replica_lag(alias):
+    checked_at, lag = _lag_cache.get(alias, (0.0, None))
+    now = time.monotonic()
+    if now - checked_at < LAG_CHECK_SECONDS:
+        return lag
+    try:
+        with connections[alias].cursor() as cur:
+            cur.execute(LAG_SQL)
+            lag = float(cur.fetchone()[0])
+    except DatabaseError:
+        logger.warning("replica %s unavailable", alias, exc_info=True)
+        connections[alias].close()
+        lag = float("inf")
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def read_alias():
+    """Database alias to run a read-only statement on."""
+    if _use_primary.get():
+        return PRIMARY
+    max_lag = settings.REPLICA_MAX_LAG_SECONDS
+    healthy = [a for a in replica_aliases() if _replica_lag(a) <= max_lag]
+    if not healthy:
+        return PRIMARY
+    return healthy[next(_round_robin) % len(healthy)]
+
+
+def reads_primary():
+    """Whether reads in the current request go to the primary."""
+    return _use_primary.get()
+
+
+def recently_wrote(request):
+    """Whether the client wrote within REPLICA_STICKY_SECONDS (sticky cookie)."""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadReplicaMiddleware:
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in self.SAFE_METHODS
+        token = _use_primary.set(
+            not replica_aliases() or not safe or recently_wrote(request)
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+
+        if not safe and response.status_code < 400 and replica_aliases():
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + sticky),
+                max_age=sticky, httponly=True, samesite="Lax",
+            )
+        return response
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
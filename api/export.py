@@ -0,0 +1,421 @@
+"""
+Static snapshot export.
+
+Prerenders the read-mostly datasets into SNAPSHOT_ROOT so that nginx can serve
+anonymous map browsing without reaching Django:
+
+  manifest.json                          current file for every layer (no-cache)
+  parks/<v>/parks.geojson                simplified park polygons
+  footways/<v>/footways.geojson          simplified walking routes
+  playgrounds/<v>/playgrounds.geojson
+  search/<v>/parks.json, playgrounds.json
+                                         name search indexes, same shape as
+                                         /api/parks/search and /api/playgrounds/search
+  tiles/<v>/{z}/{x}/{y}.pbf              Mapbox vector tiles (parks, footways, playgrounds)
+
+<v> is derived from the data versions of the tables a layer reads from (see
+api.versions). A layer whose tables have not changed since the last export is
+not rebuilt. Every file gets a .gz sibling for nginx gzip_static, and a .br
+sibling when the optional brotli package is installed.
+
+Tiles are re-exported incrementally. Each tiles directory keeps index.json
+with a fingerprint and bounding box of every feature in it. The next export
+hard-links the previous directory, compares fingerprints, and re-renders only
+the tiles that a changed, added or removed feature's box touches.
+
+Every write, through the API or not, bumps data_versions, so watch() (run as
+`export_static --watch`) keeps the snapshots within a few seconds of the
+database; a pass where nothing changed costs one version query per layer.
+"""
+import gzip
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection
+
+from .batch import chunked, parallel_map
+from .versions import data_version
+
+try:
+    import brotli
+except ImportError:  # optional: .br variants are skipped without it
+    brotli = None
+
+# Bump when the layout or content of exported files changes.
+EXPORT_FORMAT = 1
+
+MANIFEST = "manifest.json"
+KEEP_VERSIONS = 2
+TILE_MIN_ZOOM = 11
+TILE_MAX_ZOOM = 15
+TILE_INDEX = "index.json"
+# Degrees a feature's box is widened by before finding its tiles, so a
+# feature lying exactly on a tile edge also re-renders the tile beside it.
+TILE_EDGE_MARGIN = 1e-7
+WATCH_INTERVAL_SECONDS = 5
+
+LAYER_TABLES = {
+    "parks": ("parks",),
+    "footways": ("walking_routes",),
+    "playgrounds": ("playgrounds",),
+    "search": ("parks", "playgrounds"),
+    "tiles": ("parks", "walking_routes", "playgrounds"),
+}
+
+PARKS_SQL = """
+  SELECT id, name, category, area_ha,
+         ST_AsGeoJSON(ST_SimplifyPreserveTopology(geom, 0.0003), 6) AS geom
+  FROM parks ORDER BY id;
+"""
+
+FOOTWAYS_SQL = """
+  SELECT id, name, surface, smoothness, is_accessible,
+         ST_AsGeoJSON(ST_Simplify(geom, 0.0002), 6) AS geom
+  FROM walking_routes ORDER BY id;
+"""
+
+PLAYGROUNDS_SQL = """
+  SELECT id, name, source, ST_AsGeoJSON(geom, 6) AS geom
+  FROM playgrounds ORDER BY id;
+"""
+
+PARKS_SEARCH_SQL = """
+  SELECT id, name,
+         ST_AsGeoJSON(ST_SimplifyPreserveTopology(geom, 0.0003)) AS geom
+  FROM parks WHERE name IS NOT NULL ORDER BY name;
+"""
+
+PLAYGROUNDS_SEARCH_SQL = """
+  SELECT id, name, ST_AsGeoJSON(geom) AS geom
+  FROM playgrounds WHERE name IS NOT NULL ORDER BY name;
+"""
+
+EXTENT_SQL = """
+  SELECT ST_XMin(e), ST_YMin(e), ST_XMax(e), ST_YMax(e)
+  FROM (
+    SELECT ST_Extent(geom) AS e FROM (
+      SELECT geom FROM parks
+      UNION ALL SELECT geom FROM walking_routes
+      UNION ALL SELECT geom FROM playgrounds
+    ) g
+  ) x;
+"""
+
+# The columns each table puts into the tiles, beside the geometry.
+TILE_TABLES = {
+    "parks": "name, category",
+    "walking_routes": "name, is_accessible",
+    "playgrounds": "name",
+}
+
+FINGERPRINT_SQL = """
+  SELECT id, md5(ROW({columns}, ST_AsEWKB(geom))::text),
+         ST_XMin(geom), ST_YMin(geom), ST_XMax(geom), ST_YMax(geom)
+  FROM {table} WHERE geom IS NOT NULL;
+"""
+
+TILE_SQL = """
+  WITH b AS (
+    SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS env,
+           ST_Transform(ST_TileEnvelope(%(z)s, %(x)s, %(y)s), 4326) AS env4326
+  ),
+  parks AS (
+    SELECT p.id, p.name, p.category,
+           ST_AsMVTGeom(ST_Transform(p.geom, 3857), b.env) AS geom
+    FROM parks p, b WHERE p.geom && b.env4326
+  ),
+  footways AS (
+    SELECT r.id, r.name, r.is_accessible,
+           ST_AsMVTGeom(ST_Transform(r.geom, 3857), b.env) AS geom
+    FROM walking_routes r, b WHERE r.geom && b.env4326
+  ),
+  playgrounds AS (
+    SELECT g.id, g.name,
+           ST_AsMVTGeom(ST_Transform(g.geom, 3857), b.env) AS geom
+    FROM playgrounds g, b WHERE g.geom && b.env4326
+  )
+  SELECT COALESCE((SELECT ST_AsMVT(parks, 'parks') FROM parks WHERE geom IS NOT NULL), ''::bytea)
+      || COALESCE((SELECT ST_AsMVT(footways, 'footways') FROM footways WHERE geom IS NOT NULL), ''::bytea)
+      || COALESCE((SELECT ST_AsMVT(playgrounds, 'playgrounds') FROM playgrounds WHERE geom IS NOT NULL), ''::bytea);
+"""
+
+
+def _rows(sql, params=None):
+    with connection.cursor() as cur:
+        cur.execute(sql, params or [])
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+
+def _feature_collection(rows):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": r["id"],
+                "geometry": json.loads(r.pop("geom")) if r.get("geom") else None,
+                "properties": r,
+            }
+            for r in rows
+        ],
+    }
+
+
+def _remove(path):
+    """Remove path and its precompressed variants."""
+    for suffix in ("", ".gz", ".br"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _write(path, data):
+    """Write data plus its precompressed variants."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # New files, not rewrites: tiles may be hard links into the previous export.
+    _remove(path)
+    with open(path, "wb") as f:
+        f.write(data)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data))
+
+
+def _write_json(path, obj):
+    _write(path, json.dumps(obj, separators=(",", ":"), default=str))
+
+
+def _tile_range(min_lng, min_lat, max_lng, max_lat, z):
+    def tile(lng, lat):
+        lat = max(min(lat, 85.05112878), -85.05112878)
+        n = 2 ** z
+        x = int((lng + 180.0) / 360.0 * n)
+        y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+        return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+    x0, y0 = tile(min_lng, max_lat)
+    x1, y1 = tile(max_lng, min_lat)
+    return [(z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def _render_tiles(tiles):
+    """[(tile, mvt)]; mvt is empty for a tile with nothing in it."""
+    out = []
+    with connection.cursor() as cur:
+        for z, x, y in tiles:
+            cur.execute(TILE_SQL, {"z": z, "x": x, "y": y})
+            out.append(((z, x, y), bytes(cur.fetchone()[0] or b"")))
+    return out
+
+
+def _fingerprints():
+    """{table: {id: [md5 of the tiled columns and geometry, x0, y0, x1, y1]}}"""
+    out = {}
+    with connection.cursor() as cur:
+        for table, columns in TILE_TABLES.items():
+            cur.execute(FINGERPRINT_SQL.format(table=table, columns=columns))
+            out[table] = {str(pk): [digest, *box] for pk, digest, *box in cur.fetchall()}
+    return out
+
+
+def _read_tile_index(tiles_dir, min_zoom, max_zoom):
+    if tiles_dir is None:
+        return None
+    try:
+        with open(os.path.join(tiles_dir, TILE_INDEX), encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get("zooms") == [min_zoom, max_zoom] else None
+
+
+def _changed_boxes(before, after):
+    """Bounding boxes, old and new, of every feature that differs."""
+    for table in TILE_TABLES:
+        old, new = before.get(table, {}), after[table]
+        for pk in old.keys() | new.keys():
+            a, b = old.get(pk), new.get(pk)
+            if a is None or b is None or a[0] != b[0]:
+                yield from (f[1:] for f in (a, b) if f is not None)
+
+
+def _tiles_touching(boxes, min_zoom, max_zoom):
+    tiles = set()
+    m = TILE_EDGE_MARGIN
+    for x0, y0, x1, y1 in boxes:
+        for z in range(min_zoom, max_zoom + 1):
+            tiles.update(_tile_range(x0 - m, y0 - m, x1 + m, y1 + m, z))
+    return sorted(tiles)
+
+
+def _build_tiles(out_dir, min_zoom, max_zoom, workers, previous):
+    # Taken before rendering: a write during the render shows up as a
+    # difference next time, at worst re-rendering a tile that was current.
+    features = _fingerprints()
+    index = _read_tile_index(previous, min_zoom, max_zoom)
+    if index is None:
+        with connection.cursor() as cur:
+            cur.execute(EXTENT_SQL)
+            extent = cur.fetchone()
+        tiles = [] if extent[0] is None else [
+            t for z in range(min_zoom, max_zoom + 1) for t in _tile_range(*extent, z)
+        ]
+        count = 0
+    else:
+        shutil.copytree(previous, out_dir, copy_function=os.link, dirs_exist_ok=True)
+        tiles = _tiles_touching(_changed_boxes(index["features"], features), min_zoom, max_zoom)
+        count = index["tiles"]
+
+    for rendered in parallel_map(_render_tiles, chunked(tiles, 64), workers=workers):
+        for (z, x, y), mvt in rendered:
+            path = os.path.join(out_dir, str(z), str(x), f"{y}.pbf")
+            existed = os.path.exists(path)
+            if mvt:
+                _write(path, mvt)
+                count += not existed
+            elif existed:
+                _remove(path)
+                count -= 1
+
+    # Plain JSON only: the index is for the next export, not for clients.
+    index_path = os.path.join(out_dir, TILE_INDEX)
+    _remove(index_path)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"zooms": [min_zoom, max_zoom], "tiles": count, "features": features}, f, separators=(",", ":"))
+    return [f"{{z}}/{{x}}/{{y}}.pbf ({count} tiles, z{min_zoom}-{max_zoom}, {len(tiles)} rendered)"]
+
+
+def _build_layer(layer, out_dir, min_zoom, max_zoom, workers, previous=None):
+    if layer == "parks":
+        _write_json(os.path.join(out_dir, "parks.geojson"), _feature_collection(_rows(PARKS_SQL)))
+        return ["parks.geojson"]
+    if layer == "footways":
+        _write_json(os.path.join(out_dir, "footways.geojson"), _feature_collection(_rows(FOOTWAYS_SQL)))
+        return ["footways.geojson"]
+    if layer == "playgrounds":
+        _write_json(os.path.join(out_dir, "playgrounds.geojson"), _feature_collection(_rows(PLAYGROUNDS_SQL)))
+        return ["playgrounds.geojson"]
+    if layer == "search":
+        _write_json(os.path.join(out_dir, "parks.json"), _rows(PARKS_SEARCH_SQL))
+        _write_json(os.path.join(out_dir, "playgrounds.json"), _rows(PLAYGROUNDS_SEARCH_SQL))
+        return ["parks.json", "playgrounds.json"]
+    if layer == "tiles":
+        return _build_tiles(out_dir, min_zoom, max_zoom, workers, previous)
+    raise ValueError(f"unknown layer: {layer}")
+
+
+def _layer_version(layer, min_zoom, max_zoom):
+    key = f"{EXPORT_FORMAT}|{data_version(*LAYER_TABLES[layer])}"
+    if layer == "tiles":
+        key += f"|z{min_zoom}-{max_zoom}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def _prune(layer_root, current):
+    """
+    Keep the current version plus the newest older ones (clients holding the
+    previous manifest can still finish), drop the rest.
+    """
+    older = sorted(
+        (d for d in os.listdir(layer_root) if not d.startswith(".") and d != current),
+        key=lambda d: os.path.getmtime(os.path.join(layer_root, d)),
+        reverse=True,
+    )
+    for old in older[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(layer_root, old), ignore_errors=True)
+
+
+def read_manifest(root=None):
+    root = root or settings.SNAPSHOT_ROOT
+    try:
+        with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"layers": {}}
+
+
+def export_snapshot(root=None, layers=None, force=False,
+                    min_zoom=TILE_MIN_ZOOM, max_zoom=TILE_MAX_ZOOM, workers=None):
+    """
+    Export every layer whose source data changed since the last export.
+    Returns {layer: (version, rebuilt)}.
+    """
+    root = str(root or settings.SNAPSHOT_ROOT)
+    os.makedirs(root, exist_ok=True)
+    manifest = read_manifest(root)
+    summary = {}
+
+    for layer in layers or LAYER_TABLES:
+        version = _layer_version(layer, min_zoom, max_zoom)
+        layer_root = os.path.join(root, layer)
+        final_dir = os.path.join(layer_root, version)
+        rebuilt = force or not os.path.isdir(final_dir)
+
+        if rebuilt:
+            os.makedirs(layer_root, exist_ok=True)
+            previous = None
+            if not force and layer in manifest["layers"]:
+                previous = os.path.join(root, manifest["layers"][layer]["path"])
+                previous = previous if os.path.isdir(previous) else None
+            tmp_dir = tempfile.mkdtemp(prefix=".", dir=layer_root)
+            try:
+                files = _build_layer(layer, tmp_dir, min_zoom, max_zoom, workers, previous)
+                shutil.rmtree(final_dir, ignore_errors=True)
+                os.replace(tmp_dir, final_dir)
+                os.chmod(final_dir, 0o755)
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+        else:
+            files = manifest["layers"].get(layer, {}).get("files", [])
+
+        manifest["layers"][layer] = {
+            "version": version,
+            "path": f"{layer}/{version}/",
+            "files": files,
+        }
+        summary[layer] = (version, rebuilt)
+
+    manifest["generated_at"] = datetime.now(timezone.utc).isoformat()
+    manifest["brotli"] = brotli is not None
+    tmp_manifest = os.path.join(root, f".{MANIFEST}.tmp")
+    _write_json(tmp_manifest, manifest)
+    for suffix in ("", ".gz", ".br"):
+        if os.path.exists(tmp_manifest + suffix):
+            os.replace(tmp_manifest + suffix, os.path.join(root, MANIFEST + suffix))
+
+    for layer, entry in manifest["layers"].items():
+        layer_root = os.path.join(root, layer)
+        if os.path.isdir(layer_root):
+            _prune(layer_root, entry["version"])
+
+    return summary
+
+
+def watch(interval=WATCH_INTERVAL_SECONDS, **kwargs):
+    """
+    Run export_snapshot() every `interval` seconds, for ever. Yields each
+    pass's summary, or the DatabaseError that stopped it (the next pass
+    reconnects).
+    """
+    while True:
+        close_old_connections()
+        try:
+            yield export_snapshot(**kwargs)
+        except DatabaseError as e:
+            connection.close()
+            yield e
+        time.sleep(interval)
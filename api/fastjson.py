@@ -0,0 +1,47 @@
+"""
+JSON responses for the API views.
+
+Uses orjson when it is installed (it is in requirements.txt) and falls back to
+the stdlib encoder otherwise. Both write what our raw SQL hands back the way
+JsonResponse did: datetimes (created_at, last_reported_at) and Decimals
+(numeric columns such as area_ha) as DjangoJSONEncoder formats them, with
+milliseconds and "Z" for UTC, and dicts from json/jsonb columns as they are.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+_django_default = DjangoJSONEncoder().default
+
+
+def _default(obj):
+    if isinstance(obj, (bytes, memoryview)):
+        return bytes(obj).decode("utf-8", "replace")
+    return _django_default(obj)
+
+
+if orjson is not None:
+    # orjson's own datetime format keeps microseconds and writes +00:00;
+    # passed through, datetimes reach _default like every other type.
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(data):
+        return orjson.dumps(data, default=_default, option=_OPTIONS)
+else:
+    def dumps(data):
+        return json.dumps(data, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class FastJsonResponse(HttpResponse):
+    """Drop-in for JsonResponse(data, status=...) using dumps() above."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data), **kwargs)
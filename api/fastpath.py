@@ -0,0 +1,91 @@
+"""
+Lean dispatch for the public read API.
+
+The anonymous spatial GET views only need a DB connection and a JSON encoder.
+For them, server/asgi.py uses LeanASGIHandler instead of the full Django
+stack, which means:
+  - routing is one dict lookup on the exact path, built once from api.urls,
+  - the middleware chain is settings.API_LEAN_MIDDLEWARE (host validation,
+    security headers and replica routing) instead of sessions, CSRF, auth,
+    messages and clickjacking.
+
+Everything else, including any path with URL parameters, still goes through
+the full stack.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.http import Http404
+from django.utils.module_loading import import_string
+
+from . import urls, views
+
+PUBLIC_READ_VIEWS = {
+    views.health,
+    views.ready,
+    views.parks_within,
+    views.playgrounds_nearest,
+    views.routes_intersecting_park,
+    views.routes_within,
+    views.park_containing_point,
+    views.parks_search,
+    views.playgrounds_search,
+    views.accessible_routes_within,
+    views.worst_routes,
+    views.access_issues_near,
+    views.access_issue_clusters,
+    views.hex_cells,
+}
+
+LEAN_METHODS = ("GET", "HEAD")
+
+
+def _compile_routes(prefix="/api/"):
+    routes = {}
+    for pattern in urls.urlpatterns:
+        route = str(pattern.pattern)
+        if pattern.callback in PUBLIC_READ_VIEWS and "<" not in route:
+            routes[prefix + route] = pattern.callback
+    return routes
+
+
+LEAN_ROUTES = _compile_routes()
+
+
+def is_lean(scope):
+    return (
+        scope["type"] == "http"
+        and scope["method"] in LEAN_METHODS
+        and scope["path"] in LEAN_ROUTES
+    )
+
+
+class AllowedHostsMiddleware:
+    """
+    Checks the Host header against ALLOWED_HOSTS. The full stack gets that
+    from CommonMiddleware; a DisallowedHost here becomes a 400 the same way.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.get_host()
+        return self.get_response(request)
+
+
+class LeanASGIHandler(ASGIHandler):
+    def load_middleware(self, is_async=False):
+        handler = convert_exception_to_response(self._dispatch)
+        for path in reversed(settings.API_LEAN_MIDDLEWARE):
+            handler = convert_exception_to_response(import_string(path)(handler))
+        self._lean_chain = handler
+        # The views and lean middleware are sync: one hop into a thread.
+        self._middleware_chain = sync_to_async(handler, thread_sensitive=True)
+
+    def _dispatch(self, request):
+        view = LEAN_ROUTES.get(request.path_info)
+        if view is None:
+            raise Http404(request.path_info)
+        return view(request)
@@ -0,0 +1,259 @@
+"""
+Geometry preprocessing for imports.
+
+Features are staged in batches in a temporary table and cleaned there with
+set-based SQL before anything reaches parks, playgrounds or walking_routes:
+
+  1. parse GeoJSON or WKB into 2D WGS84: geometries PostGIS can't read are
+     dropped
+  2. coerce to the layer's kind: polygons become their boundary for
+     footways, anything but a point becomes a point on its surface for
+     playgrounds
+  3. drop repeated vertices, which also removes zero-length segments
+  4. repair invalid geometries with ST_MakeValid
+  5. keep only the parts of the layer's dimension, minus degenerate ones
+     (zero-length lines, zero-area polygons)
+  6. normalise lines and polygons to Multi types (lines are merged first),
+     cache the bounding box in the geometry and compute the geodesic
+     area or length
+
+Every stage counts what it changed into a QualityReport, so a run can be
+checked before the data is trusted.
+"""
+from collections import Counter, namedtuple
+import json
+
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+
+from .batch import chunked
+from .hexcells import deferred_refresh
+
+BATCH_SIZE = 1000
+STAGING = "geoprep_staging"
+
+# A binary geometry with its SRID, e.g. from a GeoPackage (see api.ingest).
+WKB = namedtuple("WKB", "data srid")
+
+# derived: target column -> expression over the staging row, where
+# `measure` is the geodesic area (polygons) or length (lines) in metres.
+Layer = namedtuple("Layer", "table kind columns derived")
+
+LAYERS = {
+    "parks": Layer(
+        "parks", "polygon", ("name", "category", "area_ha", "amenities"),
+        {"area_ha": "COALESCE(area_ha, measure / 10000)", "area_m2": "measure"},
+    ),
+    "playgrounds": Layer("playgrounds", "point", ("name", "source"), {}),
+    "walking_routes": Layer(
+        "walking_routes", "line", ("name", "source", "surface", "smoothness", "is_accessible"),
+        {"length_m": "measure"},
+    ),
+}
+
+# ST_CollectionExtract type, and the test a part has to pass to be kept.
+PARTS = {
+    "line": (2, "ST_Length(d.geom) > 0"),
+    "polygon": (3, "ST_Area(d.geom) > 0"),
+}
+
+PARSE_SQL = f"""
+  UPDATE {STAGING}
+     SET geom = ST_Force2D(CASE WHEN wkb IS NOT NULL THEN geoprep_from_wkb(wkb, srid)
+                                ELSE geoprep_from_geojson(doc) END);
+  UPDATE {STAGING}
+     SET dropped = CASE WHEN doc IS NULL AND wkb IS NULL THEN 'no geometry' ELSE 'unparseable' END
+   WHERE geom IS NULL;
+"""
+
+COERCE_SQL = {
+    "point": f"""
+      UPDATE {STAGING} SET geom = ST_PointOnSurface(geom), coerced = TRUE
+       WHERE dropped IS NULL AND GeometryType(geom) <> 'POINT';
+    """,
+    "line": f"""
+      UPDATE {STAGING} SET geom = ST_Boundary(geom), coerced = TRUE
+       WHERE dropped IS NULL AND GeometryType(geom) IN ('POLYGON', 'MULTIPOLYGON');
+    """,
+    "polygon": None,
+}
+
+DEDUPE_SQL = f"""
+  UPDATE {STAGING} s
+     SET (geom, vertices_removed) = (
+           SELECT g, ST_NPoints(s.geom) - ST_NPoints(g)
+           FROM ST_RemoveRepeatedPoints(s.geom) g
+         )
+   WHERE dropped IS NULL;
+"""
+
+REPAIR_SQL = f"""
+  UPDATE {STAGING} SET geom = ST_MakeValid(geom), repaired = TRUE
+   WHERE dropped IS NULL AND NOT ST_IsValid(geom);
+"""
+
+PARTS_SQL = """
+  UPDATE {s} s
+     SET (geom, parts_dropped, dropped) = (
+           SELECT kept.g,
+                  x.n - COALESCE(ST_NumGeometries(kept.g), 0),
+                  CASE WHEN x.n = 0 THEN 'wrong geometry type'
+                       WHEN kept.g IS NULL THEN 'degenerate' END
+           FROM (SELECT ST_CollectionExtract(s.geom, {dim}) AS e) ex
+           CROSS JOIN LATERAL (
+             SELECT CASE WHEN ST_IsEmpty(ex.e) THEN 0 ELSE ST_NumGeometries(ex.e) END AS n
+           ) x
+           CROSS JOIN LATERAL (
+             SELECT ST_Collect(d.geom) AS g FROM ST_Dump(ex.e) d WHERE {keep}
+           ) kept
+         )
+   WHERE dropped IS NULL;
+"""
+
+FINISH_SQL = {
+    "point": None,
+    "line": f"""
+      UPDATE {STAGING}
+         SET geom = PostGIS_AddBBox(ST_Multi(ST_LineMerge(geom))),
+             measure = ST_Length(geography(geom))
+       WHERE dropped IS NULL;
+    """,
+    "polygon": f"""
+      UPDATE {STAGING}
+         SET geom = PostGIS_AddBBox(ST_Multi(geom)),
+             measure = ST_Area(geography(geom))
+       WHERE dropped IS NULL;
+    """,
+}
+
+COUNTS_SQL = f"""
+  SELECT count(*),
+         count(*) FILTER (WHERE dropped IS NULL),
+         count(*) FILTER (WHERE repaired),
+         count(*) FILTER (WHERE coerced),
+         COALESCE(sum(vertices_removed), 0),
+         COALESCE(sum(parts_dropped), 0)
+  FROM {STAGING};
+"""
+
+DROPPED_SQL = f"""
+  SELECT dropped, count(*) FROM {STAGING} WHERE dropped IS NOT NULL GROUP BY dropped;
+"""
+
+
+class QualityReport:
+    """Per-layer counts of what preprocessing did during one import run."""
+
+    FIELDS = ("read", "written", "repaired", "coerced", "vertices_removed", "parts_dropped")
+
+    def __init__(self):
+        self.layers = {}
+
+    def _layer(self, table):
+        if table not in self.layers:
+            self.layers[table] = {**dict.fromkeys(self.FIELDS, 0), "dropped": Counter()}
+        return self.layers[table]
+
+    def add(self, table, counts, dropped):
+        layer = self._layer(table)
+        for field, n in zip(self.FIELDS, counts):
+            layer[field] += int(n)
+        layer["dropped"].update({reason: int(n) for reason, n in dropped})
+
+    def as_dict(self):
+        return {
+            table: {**counts, "dropped": dict(counts["dropped"])}
+            for table, counts in self.layers.items()
+        }
+
+    def lines(self):
+        for table, c in self.layers.items():
+            dropped = ", ".join(f"{n} {reason}" for reason, n in sorted(c["dropped"].items())) or "none"
+            yield (
+                f"{table}: {c['written']}/{c['read']} written, {c['repaired']} repaired, "
+                f"{c['coerced']} coerced, {c['vertices_removed']} duplicate vertices and "
+                f"{c['parts_dropped']} degenerate parts removed; dropped: {dropped}"
+            )
+
+
+def _steps(layer):
+    steps = [PARSE_SQL, COERCE_SQL[layer.kind]]
+    if layer.kind in PARTS:
+        dim, keep = PARTS[layer.kind]
+        steps += [DEDUPE_SQL, REPAIR_SQL, PARTS_SQL.format(s=STAGING, dim=dim, keep=keep)]
+    steps.append(FINISH_SQL[layer.kind])
+    return [sql for sql in steps if sql]
+
+
+def _create_staging(cur, layer):
+    cur.execute(f"""
+      CREATE TEMP TABLE {STAGING} ON COMMIT DROP AS
+        SELECT {", ".join(layer.columns)} FROM {layer.table} WITH NO DATA;
+      ALTER TABLE {STAGING}
+        ADD COLUMN ord              INT,
+        ADD COLUMN doc              TEXT,
+        ADD COLUMN wkb              BYTEA,
+        ADD COLUMN srid             INT,
+        ADD COLUMN geom             geometry,
+        ADD COLUMN coerced          BOOLEAN NOT NULL DEFAULT FALSE,
+        ADD COLUMN repaired         BOOLEAN NOT NULL DEFAULT FALSE,
+        ADD COLUMN vertices_removed INT,
+        ADD COLUMN parts_dropped    INT,
+        ADD COLUMN measure          DOUBLE PRECISION,
+        ADD COLUMN dropped          TEXT;
+    """)
+
+
+def _insert_sql(layer):
+    columns = list(layer.columns) + [c for c in layer.derived if c not in layer.columns]
+    values = [layer.derived.get(c, c) for c in columns]
+    return f"""
+      INSERT INTO {layer.table} ({", ".join(columns)}, geom)
+      SELECT {", ".join(values)}, geom
+      FROM {STAGING}
+      WHERE dropped IS NULL
+      ORDER BY ord;
+    """
+
+
+def _staging_row(ord_, attrs, geometry):
+    if isinstance(geometry, WKB):
+        return (ord_, *attrs, None, bytes(geometry.data), geometry.srid)
+    if geometry is not None and not isinstance(geometry, str):
+        geometry = json.dumps(geometry)
+    return (ord_, *attrs, geometry, None, None)
+
+
+def load(table, features, batch_size=BATCH_SIZE, report=None, replace=False):
+    """
+    Clean features and append them to table, in one transaction.
+
+    features yields (attrs, geometry): attrs in LAYERS[table].columns order,
+    geometry a GeoJSON geometry (dict or string), a WKB, or None. With
+    replace, the table is emptied first in the same transaction. The hexagon
+    cells the load touches are recomputed once, at the end. Returns the
+    QualityReport, which is `report` if one was passed.
+    """
+    layer = LAYERS[table]
+    report = report if report is not None else QualityReport()
+    steps = _steps(layer)
+    insert_sql = _insert_sql(layer)
+    staging_insert = f"INSERT INTO {STAGING} (ord, {', '.join(layer.columns)}, doc, wkb, srid) VALUES %s"
+
+    with transaction.atomic(), connection.cursor() as cur, deferred_refresh(cur):
+        if replace:
+            # access_issues reference walking_routes, so replacing routes drops them too.
+            cur.execute(f"TRUNCATE {layer.table} RESTART IDENTITY CASCADE;")
+        _create_staging(cur, layer)
+        for batch in chunked(enumerate(features), batch_size):
+            rows = [_staging_row(ord_, attrs, geometry) for ord_, (attrs, geometry) in batch]
+            execute_values(cur.cursor, staging_insert, rows, page_size=batch_size)
+            for sql in steps:
+                cur.execute(sql)
+            cur.execute(COUNTS_SQL)
+            counts = cur.fetchone()
+            cur.execute(DROPPED_SQL)
+            report.add(layer.table, counts, cur.fetchall())
+            cur.execute(insert_sql)
+            cur.execute(f"TRUNCATE {STAGING};")
+    return report
@@ -0,0 +1,45 @@
+"""
+Hexagonal density aggregates (migrations 0012, 0016 and 0018).
+
+hex_cells holds park area, footway length, accessible footway length,
+playground count and open issue count per hexagon, at three cell sizes.
+The hexagons are laid out, assigned and measured in EPSG:3857; the geom
+column holds them transformed to EPSG:4326 for serving.
+Triggers keep the cells touched by every write up to date. Bulk loads
+wrap themselves in deferred_refresh(), so the touched cells are queued
+and recomputed once at the end instead of after every batch. A refresh
+locks the cells it recomputes, so concurrent writers to one cell take turns.
+"""
+from contextlib import contextmanager
+
+from django.db import connection
+
+# ST_HexagonGrid edge lengths in EPSG:3857 units. At Dublin's latitude a
+# unit is about 0.6 m, so these are roughly 300 m, 1.2 km and 4.8 km.
+HEX_SIZES = (500, 2000, 8000)
+
+# Smallest zoom each size is served from; the largest cells below that.
+HEX_MIN_ZOOM = {2000: 11, 500: 13}
+
+
+def size_for_zoom(zoom):
+    for size in sorted(HEX_MIN_ZOOM):
+        if zoom >= HEX_MIN_ZOOM[size]:
+            return size
+    return max(HEX_SIZES)
+
+
+@contextmanager
+def deferred_refresh(cur):
+    """Queue hexagon updates for the rest of the block, then refresh them."""
+    cur.execute("SELECT set_config('greenspace.hex_deferred', 'on', true);")
+    yield
+    cur.execute("SELECT set_config('greenspace.hex_deferred', 'off', true);")
+    cur.execute("SELECT hex_cells_refresh();")
+
+
+def rebuild():
+    """Recompute every cell; returns how many there are."""
+    with connection.cursor() as cur:
+        cur.execute("SELECT hex_cells_rebuild();")
+        return cur.fetchone()[0]
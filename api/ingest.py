@@ -0,0 +1,265 @@
+"""
+Ingestion engine: the one way data gets into parks, playgrounds and
+walking_routes.
+
+    source adapter -> field mapping (MAPPINGS) -> geoprep.load
+
+Source adapters yield (properties, geometry) one feature at a time, and
+geoprep.load stages, cleans and inserts them in fixed-size batches, so
+memory stays flat however large the file is:
+
+  geojson     GeoJSON FeatureCollection, streamed with ijson
+  geojsonseq  newline-delimited GeoJSON (RFC 8142; the RS prefix is optional)
+  gpkg        GeoPackage, or a plain SQLite table with WKB geometries
+"""
+from collections import namedtuple
+import json
+import os
+from pathlib import Path
+import sqlite3
+import struct
+
+import ijson
+
+from . import geoprep
+from .amenities import index as amenity_index, park_amenities
+
+# A target column: the first of `keys` with a value in the feature's
+# properties, passed through convert, else default. derive(properties)
+# computes the value instead.
+Field = namedtuple("Field", "keys default convert derive", defaults=((), None, None, None))
+
+GOOD_SURFACES = {"paved", "asphalt", "concrete"}
+GOOD_SMOOTHNESS = {"excellent", "very_good", "good"}
+TRUE_STRINGS = {"true", "t", "yes", "1"}
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def route_accessibility(props):
+    """
+    An explicit is_accessible property wins. Otherwise a paved, smooth route
+    is accessible, one with any other known surface or smoothness is not,
+    and one with neither is unknown (None).
+    """
+    explicit = props.get("is_accessible")
+    if isinstance(explicit, bool):
+        return explicit
+    if isinstance(explicit, str) and explicit:
+        return explicit.lower() in TRUE_STRINGS
+    surface = props.get("surface")
+    smoothness = props.get("smoothness")
+    if surface in GOOD_SURFACES and smoothness in GOOD_SMOOTHNESS:
+        return True
+    if surface is not None or smoothness is not None:
+        return False
+    return None
+
+
+MAPPINGS = {
+    "parks": {
+        "name": Field(("name", "Name", "NAME"), "Park"),
+        "category": Field(("category", "Category", "CATEGORY", "Typology", "TYPE")),
+        "area_ha": Field(("area_ha", "Area_Ha", "AREA_HA"), convert=_float),
+        "amenities": Field(derive=park_amenities),
+    },
+    "playgrounds": {
+        "name": Field(("name", "Name", "NAME"), "Playground"),
+        "source": Field(default="OSM"),
+    },
+    "walking_routes": {
+        "name": Field(("name", "Name", "NAME", "highway"), "Footway"),
+        "source": Field(default="OSM"),
+        "surface": Field(("surface",)),
+        "smoothness": Field(("smoothness",)),
+        "is_accessible": Field(derive=route_accessibility),
+    },
+}
+
+EXTENSIONS = {
+    ".geojson": "geojson",
+    ".json": "geojson",
+    ".geojsonl": "geojsonseq",
+    ".geojsons": "geojsonseq",
+    ".geojsonseq": "geojsonseq",
+    ".ndjson": "geojsonseq",
+    ".jsonl": "geojsonseq",
+    ".gpkg": "gpkg",
+    ".sqlite": "gpkg",
+    ".db": "gpkg",
+}
+
+# Envelope size in bytes by the envelope indicator in a GeoPackage geometry header.
+GPKG_ENVELOPE_BYTES = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+GEOMETRY_COLUMN_NAMES = ("geom", "geometry", "the_geom", "wkb_geometry")
+
+
+# --- sources ---------------------------------------------------------------
+
+def _feature(obj):
+    if obj.get("type") == "Feature":
+        return obj.get("properties") or {}, obj.get("geometry")
+    return {}, obj  # a bare geometry
+
+
+def geojson_features(path):
+    with open(path, "rb") as f:
+        for obj in ijson.items(f, "features.item", use_float=True):
+            yield _feature(obj)
+
+
+def geojsonseq_features(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip().lstrip("\x1e")
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                yield {}, line  # geoprep reports it as unparseable
+                continue
+            yield _feature(obj)
+
+
+def gpkg_geometry(blob, srid):
+    """geoprep.WKB for a GeoPackage geometry blob, or for plain WKB in srid."""
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        return blob  # not binary; GeoJSON text at best
+    blob = bytes(blob)
+    if blob[:2] != b"GP":
+        return geoprep.WKB(blob, srid)
+    flags = blob[3]
+    if flags & 0x10:
+        return None  # empty geometry
+    order = "<" if flags & 0x01 else ">"
+    envelope = GPKG_ENVELOPE_BYTES.get((flags >> 1) & 0x07)
+    if envelope is None:
+        return geoprep.WKB(b"", srid)  # geoprep reports it as unparseable
+    (header_srid,) = struct.unpack(order + "i", blob[4:8])
+    return geoprep.WKB(blob[8 + envelope:], header_srid)
+
+
+def _gpkg_layer(conn, path, table):
+    """(table, geometry column, srs_id) to read."""
+    try:
+        layers = conn.execute(
+            "SELECT table_name, column_name, srs_id FROM gpkg_geometry_columns;"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        layers = []  # plain SQLite
+
+    if layers:
+        if table is None:
+            if len(layers) > 1:
+                names = ", ".join(l[0] for l in layers)
+                raise ValueError(f"{path} has several feature tables ({names}); choose one with --table")
+            return layers[0]
+        for layer in layers:
+            if layer[0] == table:
+                return layer
+        raise ValueError(f"{path} has no feature table {table}")
+
+    if table is None:
+        raise ValueError(f"{path} is not a GeoPackage; name the table to read with --table")
+    columns = [c[1] for c in conn.execute(f'PRAGMA table_info("{table}");')]
+    for column in columns:
+        if column.lower() in GEOMETRY_COLUMN_NAMES:
+            return table, column, 4326
+    raise ValueError(f"{table} in {path} has no geometry column ({', '.join(GEOMETRY_COLUMN_NAMES)})")
+
+
+def _epsg_codes(conn):
+    """GeoPackage srs_id -> EPSG code, where the file says which one it is."""
+    try:
+        rows = conn.execute(
+            "SELECT srs_id, organization, organization_coordsys_id FROM gpkg_spatial_ref_sys;"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {srs_id: code for srs_id, org, code in rows if (org or "").upper() == "EPSG"}
+
+
+def gpkg_features(path, table=None):
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        table, geom_column, srs_id = _gpkg_layer(conn, path, table)
+        epsg = _epsg_codes(conn)
+        cur = conn.execute(f'SELECT * FROM "{table}";')
+        names = [d[0] for d in cur.description]
+        for row in cur:
+            props = dict(zip(names, row))
+            geometry = gpkg_geometry(props.pop(geom_column), srs_id)
+            if isinstance(geometry, geoprep.WKB):
+                geometry = geometry._replace(srid=epsg.get(geometry.srid, geometry.srid))
+            yield props, geometry
+    finally:
+        conn.close()
+
+
+# --- engine ----------------------------------------------------------------
+
+def detect_format(path):
+    fmt = EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+    if fmt is None:
+        raise ValueError(f"can't tell the format of {path}; pass one of {', '.join(sorted(set(EXTENSIONS.values())))}")
+    return fmt
+
+
+def read_features(path, fmt=None, table=None):
+    fmt = fmt or detect_format(path)
+    if fmt == "geojson":
+        return geojson_features(path)
+    if fmt == "geojsonseq":
+        return geojsonseq_features(path)
+    if fmt == "gpkg":
+        return gpkg_features(path, table)
+    raise ValueError(f"unknown format: {fmt}")
+
+
+def _value(field, props):
+    if field.derive is not None:
+        return field.derive(props)
+    for key in field.keys:
+        value = props.get(key)
+        if value not in (None, ""):
+            return field.convert(value) if field.convert else value
+    return field.default
+
+
+def map_features(layer, features, overrides=None):
+    """(attrs, geometry) in geoprep.LAYERS[layer].columns order."""
+    mapping = MAPPINGS[layer]
+    columns = geoprep.LAYERS[layer].columns
+    overrides = overrides or {}
+    for props, geometry in features:
+        attrs = tuple(
+            overrides[c] if c in overrides else _value(mapping[c], props)
+            for c in columns
+        )
+        yield attrs, geometry
+
+
+def ingest(layer, path, fmt=None, table=None, source=None, replace=False,
+           batch_size=geoprep.BATCH_SIZE, report=None):
+    """
+    Load one file into a layer (parks, playgrounds or walking_routes) and
+    return the geoprep.QualityReport. source, if given, is stored as every
+    row's source. With replace, the layer is emptied first, in the same
+    transaction as the load. Loading parks rebuilds the amenity bitsets.
+    """
+    if layer not in MAPPINGS:
+        raise ValueError(f"unknown layer: {layer}")
+    overrides = {"source": source} if source and "source" in MAPPINGS[layer] else None
+    features = map_features(layer, read_features(path, fmt, table), overrides)
+    report = geoprep.load(layer, features, batch_size=batch_size, report=report, replace=replace)
+    if layer == "parks":
+        amenity_index.load()
+    return report
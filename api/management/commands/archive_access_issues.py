@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from api.archive import KEEP_MONTHS, MONTHS_AHEAD, archive, maintain
+
+
+class Command(BaseCommand):
+    help = "Create upcoming access_issues partitions and archive months past the retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-months", type=int, default=KEEP_MONTHS,
+                            help="Months kept live, counting the current one")
+        parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD,
+                            help="Create partitions this many months ahead")
+        parser.add_argument("--root", help="Archive directory (default: settings.ACCESS_ISSUE_ARCHIVE_ROOT)")
+        parser.add_argument("--keep-tables", action="store_true",
+                            help="Leave archived partitions as detached tables instead of dropping them")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only list the partitions that would be archived")
+
+    def handle(self, *args, **opts):
+        if not opts["dry_run"]:
+            created = maintain(opts["months_ahead"])
+            self.stdout.write(f"{created} partition(s) created")
+
+        done = archive(
+            keep_months=opts["keep_months"],
+            root=opts["root"],
+            keep_tables=opts["keep_tables"],
+            dry_run=opts["dry_run"],
+        )
+        for name, path, rows in done:
+            if rows is None:
+                self.stdout.write(f"{name}: would archive to {path}")
+            else:
+                self.stdout.write(f"{name}: {rows} rows archived to {path}")
+        self.stdout.write(self.style.SUCCESS(f"{len(done)} partition(s) {'to archive' if opts['dry_run'] else 'archived'}"))
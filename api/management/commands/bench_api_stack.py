@@ -0,0 +1,85 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _scope(path, query):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": query.encode("latin-1"),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 8000),
+    }
+
+
+async def _one(app, path, query):
+    sent = asyncio.Event()
+    status = {}
+
+    async def receive():
+        if not sent.is_set():
+            sent.set()
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # never disconnect
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(_scope(path, query), receive, send)
+    return status.get("code")
+
+
+async def _run(app, path, query, requests, concurrency):
+    remaining = requests
+    codes = {}
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            code = await _one(app, path, query)
+            codes[code] = codes.get(code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, codes
+
+
+class Command(BaseCommand):
+    help = "Compare per-request overhead of the full Django stack and the lean API stack"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="/api/health",
+                            help="A public read endpoint, with query string if needed")
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        from api.fastpath import LEAN_ROUTES
+        from server.asgi import django_application, lean_application
+
+        url = urlsplit(opts["url"])
+        if url.path not in LEAN_ROUTES:
+            raise CommandError(f"{url.path} is not served by the lean stack")
+
+        for label, app in (("full", django_application), ("lean", lean_application)):
+            asyncio.run(_run(app, url.path, url.query, opts["warmup"], opts["concurrency"]))
+            elapsed, codes = asyncio.run(
+                _run(app, url.path, url.query, opts["requests"], opts["concurrency"])
+            )
+            self.stdout.write(
+                f"{label}: {opts['requests'] / elapsed:8.0f} req/s  "
+                f"{elapsed / opts['requests'] * 1e6:7.1f} us/request  status={codes}"
+            )
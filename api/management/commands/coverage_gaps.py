@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.batch import default_workers
+from api.coverage import API_GRIDS, coverage_gaps
+
+
+class Command(BaseCommand):
+    help = "Find grid cells with no playground or park within walking distance"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cell-m", type=float, default=250)
+        parser.add_argument("--max-m", type=float, default=800)
+        parser.add_argument("--api-grids", action="store_true",
+                            help="Compute every grid /api/coverage/gaps serves (coverage.API_GRIDS)")
+        parser.add_argument("--workers", type=int, default=default_workers())
+        parser.add_argument("--refresh", action="store_true",
+                            help="Recompute even if a cached result matches the data version")
+        parser.add_argument("--output", help="Also write the GeoJSON to this file")
+
+    def handle(self, *args, **opts):
+        if opts["api_grids"] and opts["output"]:
+            raise CommandError("--output takes a single grid, not --api-grids")
+        grids = API_GRIDS if opts["api_grids"] else [(opts["cell_m"], opts["max_m"])]
+        for cell_m, max_m in grids:
+            try:
+                result, version, cached = coverage_gaps(
+                    cell_m, max_m,
+                    workers=opts["workers"], refresh=opts["refresh"],
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            if opts["output"]:
+                with open(opts["output"], "w", encoding="utf-8") as f:
+                    json.dump(result, f)
+
+            grid = result.get("grid") or {}
+            self.stdout.write(self.style.SUCCESS(
+                f"cell_m={cell_m:g} max_m={max_m:g}: "
+                f"{len(result['features'])} under-served of {grid.get('cells', 0)} cells "
+                f"(data version {version}{', cached' if cached else ''})"
+            ))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from api.batch import default_workers
+from api.export import (
+    LAYER_TABLES, TILE_MAX_ZOOM, TILE_MIN_ZOOM, WATCH_INTERVAL_SECONDS, export_snapshot, watch,
+)
+
+
+class Command(BaseCommand):
+    help = "Prerender tiles, simplified layers and search indexes for nginx to serve"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--layer", action="append", choices=sorted(LAYER_TABLES),
+                            help="Only export these layers (repeatable)")
+        parser.add_argument("--force", action="store_true",
+                            help="Rebuild layers even if their data version is unchanged")
+        parser.add_argument("--min-zoom", type=int, default=TILE_MIN_ZOOM)
+        parser.add_argument("--max-zoom", type=int, default=TILE_MAX_ZOOM)
+        parser.add_argument("--workers", type=int, default=default_workers())
+        parser.add_argument("--root", help="Export directory (default: settings.SNAPSHOT_ROOT)")
+        parser.add_argument("--watch", action="store_true",
+                            help="Keep running and re-export layers whenever their data version moves")
+        parser.add_argument("--interval", type=float, default=WATCH_INTERVAL_SECONDS,
+                            help="Seconds between version checks with --watch")
+
+    def handle(self, *args, **opts):
+        kwargs = dict(
+            root=opts["root"],
+            layers=opts["layer"],
+            min_zoom=opts["min_zoom"],
+            max_zoom=opts["max_zoom"],
+            workers=opts["workers"],
+        )
+        if opts["watch"]:
+            # --force only applies to the first pass.
+            self._report(export_snapshot(force=opts["force"], **kwargs), quiet=False)
+            for summary in watch(opts["interval"], **kwargs):
+                if isinstance(summary, Exception):
+                    self.stderr.write(f"export failed, retrying: {summary}")
+                else:
+                    self._report(summary, quiet=True)
+            return
+
+        self._report(export_snapshot(force=opts["force"], **kwargs), quiet=False)
+        self.stdout.write(self.style.SUCCESS("Snapshot export complete"))
+
+    def _report(self, summary, quiet):
+        for layer, (version, rebuilt) in summary.items():
+            if rebuilt or not quiet:
+                state = "exported" if rebuilt else "unchanged"
+                self.stdout.write(f"{layer}: {version} ({state})")
@@ -0,0 +1,45 @@
+import json
+import sqlite3
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from api import geoprep
+from api.ingest import EXTENSIONS, MAPPINGS, ingest
+
+
+class Command(BaseCommand):
+    help = "Load a GeoJSON, GeoJSONSeq or GeoPackage file into parks, playgrounds or walking_routes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("layer", choices=sorted(MAPPINGS))
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=sorted(set(EXTENSIONS.values())),
+                            help="Source format (default: from the file extension)")
+        parser.add_argument("--table", help="GeoPackage/SQLite table to read")
+        parser.add_argument("--source", help="Value for the source column (playgrounds, walking_routes)")
+        parser.add_argument("--replace", action="store_true",
+                            help="Empty the layer first. Replacing walking_routes also deletes access issues")
+        parser.add_argument("--batch-size", type=int, default=geoprep.BATCH_SIZE)
+        parser.add_argument("--report", help="Also write the geometry quality report to this JSON file")
+        parser.add_argument("--no-export", action="store_true",
+                            help="Don't refresh the static snapshot after importing")
+
+    def handle(self, *args, **opts):
+        try:
+            report = ingest(
+                opts["layer"], opts["path"],
+                fmt=opts["format"], table=opts["table"], source=opts["source"],
+                replace=opts["replace"], batch_size=opts["batch_size"],
+            )
+        except (OSError, ValueError, sqlite3.DatabaseError) as e:
+            raise CommandError(str(e))
+
+        for line in report.lines():
+            self.stdout.write(line)
+        if opts["report"]:
+            with open(opts["report"], "w", encoding="utf-8") as f:
+                json.dump(report.as_dict(), f, indent=2)
+
+        if not opts["no_export"]:
+            call_command("export_static", stdout=self.stdout)
@@ -0,0 +1,55 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.batch import DEFAULT_CHUNK_SIZE, default_workers
+from api.nearest import CSV_HEADER, csv_rows, nearest_playgrounds, parse_origins
+
+
+class Command(BaseCommand):
+    help = "Nearest-k playgrounds for every origin in a CSV or GeoJSONSeq file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("origins", help="Input file, or - for stdin")
+        parser.add_argument("-k", type=int, default=1)
+        parser.add_argument("--input-format", choices=["csv", "geojsonseq"], default=None)
+        parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+        parser.add_argument("--output", default="-")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--workers", type=int, default=default_workers())
+
+    def handle(self, *args, **opts):
+        src = sys.stdin if opts["origins"] == "-" else open(opts["origins"], "r", encoding="utf-8", newline="")
+        dst = sys.stdout if opts["output"] == "-" else open(opts["output"], "w", encoding="utf-8", newline="")
+        try:
+            try:
+                origins = parse_origins(src, opts["input_format"])
+            except ValueError as e:
+                raise CommandError(str(e))
+            results = nearest_playgrounds(
+                origins,
+                k=opts["k"],
+                chunk_size=opts["chunk_size"],
+                workers=opts["workers"],
+            )
+
+            count = 0
+            if opts["format"] == "csv":
+                writer = csv.writer(dst)
+                writer.writerow(CSV_HEADER)
+                for r in results:
+                    writer.writerows(csv_rows([r]))
+                    count += 1
+            else:
+                for r in results:
+                    dst.write(json.dumps(r, default=str) + "\n")
+                    count += 1
+        finally:
+            if src is not sys.stdin:
+                src.close()
+            if dst is not sys.stdout:
+                dst.close()
+
+        self.stderr.write(self.style.SUCCESS(f"Resolved {count} origins"))
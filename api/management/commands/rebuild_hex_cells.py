@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.hexcells import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute every hexagon aggregate from the base tables (normally kept up to date by triggers)"
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            cells = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{cells} hexagon cell(s) recomputed"))
@@ -0,0 +1,115 @@
+from django.db import migrations
+
+# Per-zoom grid aggregates of access_issues, kept in step with the raw table by
+# triggers so that /api/access/issues/clusters never has to scan access_issues.
+#
+# Cells follow the web-mercator tile scheme: at zoom z a tile is split into
+# 4x4 cells (64px at 256px tiles), x grows east and y grows south.
+
+CLUSTER_MIN_ZOOM = 0
+CLUSTER_MAX_ZOOM = 18
+
+FORWARD_SQL = f"""
+CREATE TABLE IF NOT EXISTS access_issue_clusters (
+    zoom        SMALLINT         NOT NULL,
+    cell_x      INTEGER          NOT NULL,
+    cell_y      INTEGER          NOT NULL,
+    issue_type  TEXT             NOT NULL,
+    n           INTEGER          NOT NULL DEFAULT 0,
+    sum_lng     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_lat     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (zoom, cell_x, cell_y, issue_type)
+);
+
+CREATE OR REPLACE FUNCTION access_issue_clusters_bump(
+    p_geom geometry, p_issue_type TEXT, p_sign INTEGER
+) RETURNS void AS $$
+DECLARE
+    z     INTEGER;
+    cell  DOUBLE PRECISION;
+    m     geometry;
+    cx    INTEGER;
+    cy    INTEGER;
+    itype TEXT := COALESCE(p_issue_type, 'issue');
+BEGIN
+    IF p_geom IS NULL OR ST_IsEmpty(p_geom) THEN
+        RETURN;
+    END IF;
+    m := ST_Transform(p_geom, 3857);
+    FOR z IN {CLUSTER_MIN_ZOOM}..{CLUSTER_MAX_ZOOM} LOOP
+        cell := 40075016.685578488 / power(2, z) / 4;
+        cx := floor((ST_X(m) + 20037508.342789244) / cell)::INTEGER;
+        cy := floor((20037508.342789244 - ST_Y(m)) / cell)::INTEGER;
+
+        INSERT INTO access_issue_clusters AS c
+            (zoom, cell_x, cell_y, issue_type, n, sum_lng, sum_lat)
+        VALUES
+            (z, cx, cy, itype, p_sign, p_sign * ST_X(p_geom), p_sign * ST_Y(p_geom))
+        ON CONFLICT (zoom, cell_x, cell_y, issue_type) DO UPDATE
+            SET n       = c.n + EXCLUDED.n,
+                sum_lng = c.sum_lng + EXCLUDED.sum_lng,
+                sum_lat = c.sum_lat + EXCLUDED.sum_lat;
+
+        IF p_sign < 0 THEN
+            DELETE FROM access_issue_clusters
+            WHERE zoom = z AND cell_x = cx AND cell_y = cy
+              AND issue_type = itype AND n <= 0;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION access_issue_clusters_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM access_issue_clusters_bump(OLD.geom, OLD.issue_type, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM access_issue_clusters_bump(NEW.geom, NEW.issue_type, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION access_issue_clusters_reset() RETURNS trigger AS $$
+BEGIN
+    TRUNCATE access_issue_clusters;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS access_issue_clusters_sync ON access_issues;
+CREATE TRIGGER access_issue_clusters_sync
+    AFTER INSERT OR DELETE OR UPDATE OF geom, issue_type ON access_issues
+    FOR EACH ROW EXECUTE FUNCTION access_issue_clusters_sync();
+
+-- TRUNCATE skips row triggers (load_data truncates access_issues on reload).
+DROP TRIGGER IF EXISTS access_issue_clusters_reset ON access_issues;
+CREATE TRIGGER access_issue_clusters_reset
+    AFTER TRUNCATE ON access_issues
+    FOR EACH STATEMENT EXECUTE FUNCTION access_issue_clusters_reset();
+
+-- Backfill from whatever is already in the table.
+TRUNCATE access_issue_clusters;
+SELECT access_issue_clusters_bump(geom, issue_type, 1) FROM access_issues;
+"""
+
+REVERSE_SQL = """
+DROP TRIGGER IF EXISTS access_issue_clusters_reset ON access_issues;
+DROP TRIGGER IF EXISTS access_issue_clusters_sync ON access_issues;
+DROP FUNCTION IF EXISTS access_issue_clusters_reset();
+DROP FUNCTION IF EXISTS access_issue_clusters_sync();
+DROP FUNCTION IF EXISTS access_issue_clusters_bump(geometry, TEXT, INTEGER);
+DROP TABLE IF EXISTS access_issue_clusters;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,160 @@
+from django.db import migrations
+
+# Denormalised per-route issue summary. Triggers on access_issues keep it
+# current, so "problem routes" and the per-route score are plain reads.
+
+FORWARD_SQL = """
+CREATE TABLE IF NOT EXISTS route_issue_summary (
+    route_id            INTEGER PRIMARY KEY,
+    open_issues         INTEGER          NOT NULL DEFAULT 0,
+    by_type             JSONB            NOT NULL DEFAULT '{}'::jsonb,
+    last_reported_at    TIMESTAMPTZ,
+    accessibility_score DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS route_issue_summary_worst_idx
+    ON route_issue_summary (accessibility_score, open_issues DESC);
+
+CREATE INDEX IF NOT EXISTS access_issues_route_created_idx
+    ON access_issues (route_id, created_at DESC);
+
+-- 0-100: accessible routes start at 100, unknown at 60, inaccessible at 40,
+-- and every open issue pulls the score down.
+CREATE OR REPLACE FUNCTION route_accessibility_score(
+    p_is_accessible BOOLEAN, p_open_issues INTEGER
+) RETURNS DOUBLE PRECISION AS $$
+    SELECT round((
+        CASE WHEN p_is_accessible THEN 100
+             WHEN NOT p_is_accessible THEN 40
+             ELSE 60 END
+        / (1 + 0.25 * GREATEST(p_open_issues, 0)))::numeric, 1)::double precision;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION route_issue_summary_bump(
+    p_route_id INTEGER, p_issue_type TEXT, p_created_at TIMESTAMPTZ, p_sign INTEGER
+) RETURNS void AS $$
+DECLARE
+    itype TEXT := COALESCE(p_issue_type, 'issue');
+BEGIN
+    IF p_route_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO route_issue_summary AS s
+        (route_id, open_issues, by_type, last_reported_at)
+    VALUES
+        (p_route_id, p_sign, jsonb_build_object(itype, p_sign),
+         CASE WHEN p_sign > 0 THEN p_created_at END)
+    ON CONFLICT (route_id) DO UPDATE
+        SET open_issues = s.open_issues + p_sign,
+            by_type = jsonb_set(
+                s.by_type, ARRAY[itype],
+                to_jsonb(COALESCE((s.by_type ->> itype)::INTEGER, 0) + p_sign)),
+            last_reported_at = CASE
+                WHEN p_sign > 0 THEN GREATEST(s.last_reported_at, p_created_at)
+                ELSE s.last_reported_at END;
+
+    UPDATE route_issue_summary s
+    SET by_type = CASE
+            WHEN (s.by_type ->> itype)::INTEGER <= 0 THEN s.by_type - itype
+            ELSE s.by_type END,
+        last_reported_at = CASE
+            WHEN p_sign < 0 AND p_created_at >= s.last_reported_at THEN
+                (SELECT max(i.created_at) FROM access_issues i
+                 WHERE i.route_id = p_route_id)
+            ELSE s.last_reported_at END,
+        accessibility_score = route_accessibility_score(r.is_accessible, s.open_issues)
+    FROM walking_routes r
+    WHERE s.route_id = p_route_id AND r.id = p_route_id;
+
+    DELETE FROM route_issue_summary
+    WHERE route_id = p_route_id AND open_issues <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION route_issue_summary_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM route_issue_summary_bump(OLD.route_id, OLD.issue_type, OLD.created_at, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM route_issue_summary_bump(NEW.route_id, NEW.issue_type, NEW.created_at, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION route_issue_summary_reset() RETURNS trigger AS $$
+BEGIN
+    TRUNCATE route_issue_summary;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION route_issue_summary_rescore() RETURNS trigger AS $$
+BEGIN
+    UPDATE route_issue_summary
+    SET accessibility_score = route_accessibility_score(NEW.is_accessible, open_issues)
+    WHERE route_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS route_issue_summary_sync ON access_issues;
+CREATE TRIGGER route_issue_summary_sync
+    AFTER INSERT OR DELETE OR UPDATE OF route_id, issue_type ON access_issues
+    FOR EACH ROW EXECUTE FUNCTION route_issue_summary_sync();
+
+DROP TRIGGER IF EXISTS route_issue_summary_reset ON access_issues;
+CREATE TRIGGER route_issue_summary_reset
+    AFTER TRUNCATE ON access_issues
+    FOR EACH STATEMENT EXECUTE FUNCTION route_issue_summary_reset();
+
+DROP TRIGGER IF EXISTS route_issue_summary_rescore ON walking_routes;
+CREATE TRIGGER route_issue_summary_rescore
+    AFTER UPDATE OF is_accessible ON walking_routes
+    FOR EACH ROW EXECUTE FUNCTION route_issue_summary_rescore();
+
+-- Backfill in one pass rather than through the row-level bump.
+TRUNCATE route_issue_summary;
+INSERT INTO route_issue_summary
+    (route_id, open_issues, by_type, last_reported_at, accessibility_score)
+SELECT t.route_id,
+       SUM(t.n),
+       jsonb_object_agg(t.issue_type, t.n),
+       max(t.last_at),
+       route_accessibility_score(r.is_accessible, SUM(t.n)::INTEGER)
+FROM (
+    SELECT route_id, COALESCE(issue_type, 'issue') AS issue_type,
+           COUNT(*)::INTEGER AS n, max(created_at) AS last_at
+    FROM access_issues
+    WHERE route_id IS NOT NULL
+    GROUP BY 1, 2
+) t
+JOIN walking_routes r ON r.id = t.route_id
+GROUP BY t.route_id, r.is_accessible;
+"""
+
+REVERSE_SQL = """
+DROP TRIGGER IF EXISTS route_issue_summary_rescore ON walking_routes;
+DROP TRIGGER IF EXISTS route_issue_summary_reset ON access_issues;
+DROP TRIGGER IF EXISTS route_issue_summary_sync ON access_issues;
+DROP FUNCTION IF EXISTS route_issue_summary_rescore();
+DROP FUNCTION IF EXISTS route_issue_summary_reset();
+DROP FUNCTION IF EXISTS route_issue_summary_sync();
+DROP FUNCTION IF EXISTS route_issue_summary_bump(INTEGER, TEXT, TIMESTAMPTZ, INTEGER);
+DROP FUNCTION IF EXISTS route_accessibility_score(BOOLEAN, INTEGER);
+DROP INDEX IF EXISTS access_issues_route_created_idx;
+DROP TABLE IF EXISTS route_issue_summary;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_access_issue_clusters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# data_versions: one counter per spatial table, bumped once per writing
+# statement. Anything derived from those tables (caches, exports) records the
+# versions it was built from and is stale as soon as they move.
+#
+# coverage_gap_cache: results of the playground/park coverage grid analysis,
+# keyed by its parameters and tagged with the data version they came from.
+
+VERSIONED_TABLES = ("parks", "playgrounds", "walking_routes", "access_issues")
+
+FORWARD_SQL = """
+CREATE TABLE IF NOT EXISTS data_versions (
+    table_name  TEXT PRIMARY KEY,
+    version     BIGINT      NOT NULL DEFAULT 0,
+    changed_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO data_versions (table_name)
+SELECT unnest(ARRAY[%s])
+ON CONFLICT (table_name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_versions AS d (table_name, version, changed_at)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (table_name) DO UPDATE
+        SET version = d.version + 1, changed_at = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TABLE IF NOT EXISTS coverage_gap_cache (
+    cache_key    TEXT PRIMARY KEY,
+    data_version TEXT        NOT NULL,
+    result       JSONB       NOT NULL,
+    computed_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+""" % ", ".join(f"'{t}'" for t in VERSIONED_TABLES)
+
+FORWARD_SQL += "".join(f"""
+DROP TRIGGER IF EXISTS {t}_data_version ON {t};
+CREATE TRIGGER {t}_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {t}
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+""" for t in VERSIONED_TABLES)
+
+REVERSE_SQL = "".join(
+    f"DROP TRIGGER IF EXISTS {t}_data_version ON {t};\n" for t in VERSIONED_TABLES
+) + """
+DROP FUNCTION IF EXISTS bump_data_version();
+DROP TABLE IF EXISTS coverage_gap_cache;
+DROP TABLE IF EXISTS data_versions;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_route_issue_summary'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
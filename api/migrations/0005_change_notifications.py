@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# Row-level NOTIFY on the tables the map shows live. NOTIFY is transactional,
+# so listeners (api.stream) only hear about committed changes, whichever code
+# path wrote them. Payloads must stay under Postgres' 8000 byte limit, so a
+# long description is dropped rather than failing the write.
+
+CHANNEL = "greenspace_changes"
+LIVE_TABLES = ("playgrounds", "access_issues")
+
+FORWARD_SQL = f"""
+CREATE OR REPLACE FUNCTION notify_change() RETURNS trigger AS $$
+DECLARE
+    rec     RECORD;
+    payload JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+
+    payload := (to_jsonb(rec) - 'geom') || jsonb_build_object(
+        'layer', TG_TABLE_NAME,
+        'op', lower(TG_OP),
+        'lng', ST_X(rec.geom),
+        'lat', ST_Y(rec.geom)
+    );
+    IF TG_OP = 'UPDATE' THEN
+        payload := payload || jsonb_build_object(
+            'old_lng', ST_X(OLD.geom),
+            'old_lat', ST_Y(OLD.geom)
+        );
+    END IF;
+    IF octet_length(payload::text) > 7900 THEN
+        payload := payload - 'description';
+    END IF;
+
+    PERFORM pg_notify('{CHANNEL}', payload::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+""" + "".join(f"""
+DROP TRIGGER IF EXISTS {t}_notify_change ON {t};
+CREATE TRIGGER {t}_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON {t}
+    FOR EACH ROW EXECUTE FUNCTION notify_change();
+""" for t in LIVE_TABLES)
+
+REVERSE_SQL = "".join(
+    f"DROP TRIGGER IF EXISTS {t}_notify_change ON {t};\n" for t in LIVE_TABLES
+) + "DROP FUNCTION IF EXISTS notify_change();\n"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_data_versions_coverage_cache'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
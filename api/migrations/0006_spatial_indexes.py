@@ -0,0 +1,52 @@
+from django.db import migrations
+
+# Indexes the read statements in api/views.py rely on. The plan tests in
+# api/tests/test_plans.py fail when one of them stops being used.
+#
+# The radius queries filter on geography(geom) (spelled geom::geography in
+# some views, which is the same expression), and a plain GiST index on geom
+# cannot serve those, so each table also gets an expression index on its
+# geography. Name search uses ILIKE '%q%', which needs trigram indexes.
+
+SPATIAL_TABLES = ("parks", "playgrounds", "walking_routes", "access_issues")
+NAME_SEARCH_TABLES = ("parks", "playgrounds")
+
+FORWARD_SQL = "CREATE EXTENSION IF NOT EXISTS pg_trgm;\n"
+
+FORWARD_SQL += "".join(f"""
+CREATE INDEX IF NOT EXISTS {t}_geom_idx ON {t} USING GIST (geom);
+CREATE INDEX IF NOT EXISTS {t}_geog_idx ON {t} USING GIST (geography(geom));
+""" for t in SPATIAL_TABLES)
+
+FORWARD_SQL += "".join(f"""
+CREATE INDEX IF NOT EXISTS {t}_name_trgm_idx ON {t} USING GIN (name gin_trgm_ops);
+""" for t in NAME_SEARCH_TABLES)
+
+FORWARD_SQL += """
+CREATE INDEX IF NOT EXISTS access_issues_created_idx ON access_issues (created_at DESC);
+
+ANALYZE parks;
+ANALYZE playgrounds;
+ANALYZE walking_routes;
+ANALYZE access_issues;
+"""
+
+REVERSE_SQL = "".join(f"""
+DROP INDEX IF EXISTS {t}_geom_idx;
+DROP INDEX IF EXISTS {t}_geog_idx;
+""" for t in SPATIAL_TABLES) + "".join(f"""
+DROP INDEX IF EXISTS {t}_name_trgm_idx;
+""" for t in NAME_SEARCH_TABLES) + """
+DROP INDEX IF EXISTS access_issues_created_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_change_notifications'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
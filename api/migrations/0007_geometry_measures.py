@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Support for the import preprocessing stage (api/geoprep.py):
+#
+#   - walking_routes.geom becomes MultiLineString. The importer already
+#     produced multi-part lines (ST_LineMerge of a multi-part footway), which
+#     a LineString column rejected; every layer is now stored as one type.
+#   - parks.area_m2 and walking_routes.length_m hold the geodesic area and
+#     length, computed once at import instead of per query.
+#   - geoprep_from_geojson() parses a GeoJSON geometry and returns NULL for
+#     one PostGIS can't read, so a bad feature is reported, not fatal.
+
+FORWARD_SQL = """
+ALTER TABLE walking_routes
+    ALTER COLUMN geom TYPE geometry(MultiLineString, 4326) USING ST_Multi(geom);
+
+ALTER TABLE parks ADD COLUMN IF NOT EXISTS area_m2 DOUBLE PRECISION;
+ALTER TABLE walking_routes ADD COLUMN IF NOT EXISTS length_m DOUBLE PRECISION;
+
+UPDATE parks SET area_m2 = ST_Area(geography(geom)) WHERE geom IS NOT NULL;
+UPDATE walking_routes SET length_m = ST_Length(geography(geom)) WHERE geom IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION geoprep_from_geojson(doc TEXT) RETURNS geometry AS $$
+BEGIN
+    RETURN ST_SetSRID(ST_GeomFromGeoJSON(doc), 4326);
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+"""
+
+REVERSE_SQL = """
+DROP FUNCTION IF EXISTS geoprep_from_geojson(TEXT);
+ALTER TABLE walking_routes DROP COLUMN IF EXISTS length_m;
+ALTER TABLE parks DROP COLUMN IF EXISTS area_m2;
+ALTER TABLE walking_routes
+    ALTER COLUMN geom TYPE geometry(LineString, 4326) USING ST_GeometryN(geom, 1);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_spatial_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
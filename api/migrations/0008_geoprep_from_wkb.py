@@ -0,0 +1,33 @@
+from django.db import migrations
+
+# WKB counterpart of geoprep_from_geojson() (migration 0007), for sources
+# that carry binary geometries in their own CRS, e.g. GeoPackage. An SRID
+# of 0 or less means "undefined" and is taken to be WGS84.
+
+FORWARD_SQL = """
+CREATE OR REPLACE FUNCTION geoprep_from_wkb(wkb BYTEA, srid INT) RETURNS geometry AS $$
+BEGIN
+    RETURN ST_Transform(
+        ST_SetSRID(ST_GeomFromWKB(wkb), CASE WHEN srid > 0 THEN srid ELSE 4326 END),
+        4326
+    );
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+"""
+
+REVERSE_SQL = """
+DROP FUNCTION IF EXISTS geoprep_from_wkb(BYTEA, INT);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_geometry_measures'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,204 @@
+from django.db import migrations
+
+# access_issues becomes a table partitioned by month on created_at:
+# access_issues_YYYY_MM, plus access_issues_default for anything outside
+# them. Queries that filter on created_at only touch the months they need,
+# and old months can be archived by detaching them (api/archive.py).
+#
+#   - Indexes are created on the parent, so every partition, present and
+#     future, gets its own spatial and time indexes.
+#   - The primary key has to include the partition key: (id, created_at).
+#     ids still come from the same sequence.
+#   - Row triggers from 0002, 0003 and 0005 are re-created on the parent and
+#     cloned to each partition. Inside a partition TG_TABLE_NAME is the
+#     partition's name, so notify_change() now takes the layer name as an
+#     argument.
+#   - Existing rows are copied before the triggers exist; the aggregates
+#     already count them.
+#
+# access_issues_ensure_partition(month) creates a month's partition,
+# moving any rows for it out of the default partition first.
+# `python manage.py archive_access_issues` calls it ahead of time.
+
+MONTHS_AHEAD = 3
+
+INDEXES_AND_TRIGGERS = """
+CREATE INDEX IF NOT EXISTS access_issues_geom_idx ON access_issues USING GIST (geom);
+CREATE INDEX IF NOT EXISTS access_issues_geog_idx ON access_issues USING GIST (geography(geom));
+CREATE INDEX IF NOT EXISTS access_issues_created_idx ON access_issues (created_at DESC);
+CREATE INDEX IF NOT EXISTS access_issues_route_created_idx ON access_issues (route_id, created_at DESC);
+
+CREATE TRIGGER access_issue_clusters_sync
+    AFTER INSERT OR DELETE OR UPDATE OF geom, issue_type ON access_issues
+    FOR EACH ROW EXECUTE FUNCTION access_issue_clusters_sync();
+CREATE TRIGGER access_issue_clusters_reset
+    AFTER TRUNCATE ON access_issues
+    FOR EACH STATEMENT EXECUTE FUNCTION access_issue_clusters_reset();
+
+CREATE TRIGGER route_issue_summary_sync
+    AFTER INSERT OR DELETE OR UPDATE OF route_id, issue_type ON access_issues
+    FOR EACH ROW EXECUTE FUNCTION route_issue_summary_sync();
+CREATE TRIGGER route_issue_summary_reset
+    AFTER TRUNCATE ON access_issues
+    FOR EACH STATEMENT EXECUTE FUNCTION route_issue_summary_reset();
+
+CREATE TRIGGER access_issues_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON access_issues
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+CREATE TRIGGER access_issues_notify_change
+    AFTER INSERT OR UPDATE OR DELETE ON access_issues
+    FOR EACH ROW EXECUTE FUNCTION notify_change('access_issues');
+"""
+
+# Same as 0005, except that the layer name can be passed as an argument.
+NOTIFY_CHANGE_SQL = """
+CREATE OR REPLACE FUNCTION notify_change() RETURNS trigger AS $$
+DECLARE
+    rec     RECORD;
+    payload JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+
+    payload := (to_jsonb(rec) - 'geom') || jsonb_build_object(
+        'layer', COALESCE(TG_ARGV[0], TG_TABLE_NAME),
+        'op', lower(TG_OP),
+        'lng', ST_X(rec.geom),
+        'lat', ST_Y(rec.geom)
+    );
+    IF TG_OP = 'UPDATE' THEN
+        payload := payload || jsonb_build_object(
+            'old_lng', ST_X(OLD.geom),
+            'old_lat', ST_Y(OLD.geom)
+        );
+    END IF;
+    IF octet_length(payload::text) > 7900 THEN
+        payload := payload - 'description';
+    END IF;
+
+    PERFORM pg_notify('greenspace_changes', payload::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+FORWARD_SQL = NOTIFY_CHANGE_SQL + f"""
+ALTER SEQUENCE access_issues_id_seq OWNED BY NONE;
+ALTER TABLE access_issues RENAME TO access_issues_unpartitioned;
+
+CREATE TABLE access_issues (
+    id          INTEGER   NOT NULL DEFAULT nextval('access_issues_id_seq'),
+    route_id    INTEGER   REFERENCES walking_routes(id) ON DELETE CASCADE,
+    issue_type  TEXT,
+    description TEXT,
+    created_at  TIMESTAMP NOT NULL DEFAULT now(),
+    geom        geometry(Point, 4326),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE access_issues_id_seq OWNED BY access_issues.id;
+
+CREATE TABLE access_issues_default PARTITION OF access_issues DEFAULT;
+
+CREATE OR REPLACE FUNCTION access_issues_partition_name(p_month TIMESTAMP) RETURNS TEXT AS $$
+    SELECT 'access_issues_' || to_char(date_trunc('month', p_month), 'YYYY_MM');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION access_issues_ensure_partition(p_month TIMESTAMP) RETURNS BOOLEAN AS $$
+DECLARE
+    start_at TIMESTAMP := date_trunc('month', p_month);
+    end_at   TIMESTAMP := date_trunc('month', p_month) + interval '1 month';
+    part     TEXT      := access_issues_partition_name(p_month);
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    -- Rows for this month in the default partition would stop the new
+    -- partition from being attached; move them over.
+    CREATE TEMP TABLE access_issues_moving ON COMMIT DROP AS
+        SELECT * FROM access_issues_default
+        WHERE created_at >= start_at AND created_at < end_at;
+    DELETE FROM access_issues_default
+        WHERE created_at >= start_at AND created_at < end_at;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF access_issues FOR VALUES FROM (%L) TO (%L)',
+        part, start_at, end_at
+    );
+
+    INSERT INTO access_issues SELECT * FROM access_issues_moving;
+    DROP TABLE access_issues_moving;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION access_issues_ensure_partitions(
+    p_from TIMESTAMP, p_to TIMESTAMP
+) RETURNS INTEGER AS $$
+DECLARE
+    v_month TIMESTAMP := date_trunc('month', p_from);
+    created INTEGER   := 0;
+BEGIN
+    WHILE v_month <= p_to LOOP
+        IF access_issues_ensure_partition(v_month) THEN
+            created := created + 1;
+        END IF;
+        v_month := v_month + interval '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT access_issues_ensure_partitions(
+    COALESCE((SELECT min(created_at) FROM access_issues_unpartitioned), now()::TIMESTAMP),
+    now()::TIMESTAMP + interval '{MONTHS_AHEAD} months'
+);
+
+INSERT INTO access_issues (id, route_id, issue_type, description, created_at, geom)
+SELECT id, route_id, issue_type, description, COALESCE(created_at, now()), geom
+FROM access_issues_unpartitioned;
+
+DROP TABLE access_issues_unpartitioned;
+""" + INDEXES_AND_TRIGGERS + """
+ANALYZE access_issues;
+"""
+
+REVERSE_SQL = """
+ALTER SEQUENCE access_issues_id_seq OWNED BY NONE;
+
+CREATE TABLE access_issues_unpartitioned (
+    id          INTEGER   PRIMARY KEY DEFAULT nextval('access_issues_id_seq'),
+    route_id    INTEGER   REFERENCES walking_routes(id) ON DELETE CASCADE,
+    issue_type  TEXT,
+    description TEXT,
+    created_at  TIMESTAMP DEFAULT now(),
+    geom        geometry(Point, 4326)
+);
+
+INSERT INTO access_issues_unpartitioned (id, route_id, issue_type, description, created_at, geom)
+SELECT id, route_id, issue_type, description, created_at, geom FROM access_issues;
+
+DROP TABLE access_issues;
+ALTER TABLE access_issues_unpartitioned RENAME TO access_issues;
+ALTER SEQUENCE access_issues_id_seq OWNED BY access_issues.id;
+
+DROP FUNCTION IF EXISTS access_issues_ensure_partitions(TIMESTAMP, TIMESTAMP);
+DROP FUNCTION IF EXISTS access_issues_ensure_partition(TIMESTAMP);
+DROP FUNCTION IF EXISTS access_issues_partition_name(TIMESTAMP);
+""" + INDEXES_AND_TRIGGERS
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_geoprep_from_wkb'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Indexes behind the admin changelists (api/admin_scale.py, api/admin.py).
+#
+#   - Search: Django's icontains is UPPER(col) LIKE UPPER('%q%'), so the
+#     trigram indexes are on upper(col); a plain name trigram index (0006)
+#     doesn't match that expression.
+#   - Filters: CachedValuesFilter walks a btree index for distinct values.
+#   - Pages: the issue list is keyset-paged on (created_at, id) descending.
+
+FACET_COLUMNS = (
+    ("walking_routes", "source"),
+    ("walking_routes", "surface"),
+    ("walking_routes", "smoothness"),
+    ("access_issues", "issue_type"),
+)
+
+FORWARD_SQL = """
+CREATE INDEX IF NOT EXISTS walking_routes_name_upper_trgm_idx
+    ON walking_routes USING GIN (upper(name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS access_issues_description_upper_trgm_idx
+    ON access_issues USING GIN (upper(description) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS access_issues_created_id_idx
+    ON access_issues (created_at DESC, id DESC);
+""" + "".join(f"""
+CREATE INDEX IF NOT EXISTS {t}_{c}_idx ON {t} ({c});
+""" for t, c in FACET_COLUMNS) + """
+ANALYZE walking_routes;
+ANALYZE access_issues;
+"""
+
+REVERSE_SQL = """
+DROP INDEX IF EXISTS walking_routes_name_upper_trgm_idx;
+DROP INDEX IF EXISTS access_issues_description_upper_trgm_idx;
+DROP INDEX IF EXISTS access_issues_created_id_idx;
+""" + "".join(f"""
+DROP INDEX IF EXISTS {t}_{c}_idx;
+""" for t, c in FACET_COLUMNS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_partition_access_issues'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# The DCC facility columns a park has (Skateboard, MUGA, Toilets, ...), as
+# the amenity keys in api/amenities.py. Filled by the ingest mapping; parks
+# imported before this migration have none until they are re-imported with
+# `python manage.py ingest parks data/dcc_parks.geojson --replace`.
+#
+# Reads normally filter through the in-memory bitsets (api/amenities.py);
+# the GIN index serves amenities @> ... whenever those aren't loaded.
+
+FORWARD_SQL = """
+ALTER TABLE parks ADD COLUMN IF NOT EXISTS amenities TEXT[] NOT NULL DEFAULT '{}';
+CREATE INDEX IF NOT EXISTS parks_amenities_idx ON parks USING GIN (amenities);
+"""
+
+REVERSE_SQL = """
+DROP INDEX IF EXISTS parks_amenities_idx;
+ALTER TABLE parks DROP COLUMN IF EXISTS amenities;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,223 @@
+from django.db import migrations
+
+# Hexagonal density aggregates for overview maps (/api/hexagons).
+#
+# Cells come from ST_HexagonGrid in web mercator (EPSG:3857) with the origin
+# at 0,0, so a cell is identified by (size, i, j) and ST_Hexagon rebuilds its
+# shape. Each cell holds, for what lies inside it:
+#
+#   park_area_m2         park area; a park split across cells is shared out
+#                        in proportion to the part in each
+#   route_length_m       footway length, shared out the same way
+#   accessible_length_m  the part of that on is_accessible routes
+#   playgrounds          playground count
+#   open_issues          live (not archived) access issue count
+#
+# Statement triggers with transition tables put the cells touched by a write
+# into hex_cells_dirty, and hex_cells_refresh() recomputes exactly those
+# cells from the base tables. The triggers refresh straight away, unless
+# greenspace.hex_deferred is 'on' in the transaction: the ingest engine sets
+# it and refreshes once at the end, so each cell is recomputed once per
+# import rather than once per batch.
+
+HEX_SIZES = (500, 2000, 8000)
+HEX_TABLES = ("parks", "playgrounds", "walking_routes", "access_issues")
+
+SIZES = ", ".join(str(s) for s in HEX_SIZES)
+
+FORWARD_SQL = f"""
+CREATE TABLE IF NOT EXISTS hex_cells (
+    size                INTEGER          NOT NULL,
+    i                   INTEGER          NOT NULL,
+    j                   INTEGER          NOT NULL,
+    park_area_m2        DOUBLE PRECISION NOT NULL DEFAULT 0,
+    route_length_m      DOUBLE PRECISION NOT NULL DEFAULT 0,
+    accessible_length_m DOUBLE PRECISION NOT NULL DEFAULT 0,
+    playgrounds         INTEGER          NOT NULL DEFAULT 0,
+    open_issues         INTEGER          NOT NULL DEFAULT 0,
+    geom                geometry(Polygon, 4326) NOT NULL,
+    PRIMARY KEY (size, i, j)
+);
+
+CREATE TABLE IF NOT EXISTS hex_cells_dirty (
+    size  INTEGER NOT NULL,
+    i     INTEGER NOT NULL,
+    j     INTEGER NOT NULL,
+    layer TEXT    NOT NULL,
+    PRIMARY KEY (size, i, j, layer)
+);
+
+-- Every cell, at every size, that a geometry touches.
+CREATE OR REPLACE FUNCTION hex_cells_of(g geometry)
+RETURNS TABLE (size INTEGER, i INTEGER, j INTEGER) AS $$
+    SELECT s.size, h.i, h.j
+    FROM (SELECT ST_Transform(g, 3857) AS m) t,
+         unnest(ARRAY[{SIZES}]) AS s(size),
+         ST_HexagonGrid(s.size, t.m) h
+    WHERE g IS NOT NULL AND NOT ST_IsEmpty(g) AND ST_Intersects(h.geom, t.m);
+$$ LANGUAGE sql STABLE;
+
+-- Recomputes the queued cells. Only the measures of the layers queued for
+-- a cell are recomputed, so a new playground doesn't re-measure every
+-- footway in its cell; the rest are kept.
+CREATE OR REPLACE FUNCTION hex_cells_refresh() RETURNS INTEGER AS $$
+DECLARE
+    refreshed INTEGER;
+BEGIN
+    WITH taken AS (
+        DELETE FROM hex_cells_dirty RETURNING size, i, j, layer
+    ), cells AS (
+        SELECT size, i, j,
+               bool_or(layer = 'parks')          AS parks,
+               bool_or(layer = 'walking_routes') AS routes,
+               bool_or(layer = 'playgrounds')    AS playgrounds,
+               bool_or(layer = 'access_issues')  AS issues,
+               ST_Transform(ST_Hexagon(size, i, j, ST_SetSRID(ST_MakePoint(0, 0), 3857)), 4326) AS geom
+        FROM taken
+        GROUP BY size, i, j
+    ), measured AS (
+        SELECT c.size, c.i, c.j, c.geom,
+               CASE WHEN c.parks THEN COALESCE((
+                   SELECT SUM(COALESCE(x.area_m2, ST_Area(geography(x.geom)))
+                              * ST_Area(ST_Intersection(x.geom, c.geom)) / NULLIF(ST_Area(x.geom), 0))
+                   FROM parks x WHERE ST_Intersects(x.geom, c.geom)
+               ), 0) ELSE COALESCE(h.park_area_m2, 0) END AS park_area_m2,
+               CASE WHEN c.routes THEN COALESCE((
+                   SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                              * ST_Length(ST_Intersection(x.geom, c.geom)) / NULLIF(ST_Length(x.geom), 0))
+                   FROM walking_routes x WHERE ST_Intersects(x.geom, c.geom)
+               ), 0) ELSE COALESCE(h.route_length_m, 0) END AS route_length_m,
+               CASE WHEN c.routes THEN COALESCE((
+                   SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                              * ST_Length(ST_Intersection(x.geom, c.geom)) / NULLIF(ST_Length(x.geom), 0))
+                   FROM walking_routes x WHERE ST_Intersects(x.geom, c.geom) AND x.is_accessible
+               ), 0) ELSE COALESCE(h.accessible_length_m, 0) END AS accessible_length_m,
+               CASE WHEN c.playgrounds THEN (
+                   SELECT count(*) FROM playgrounds x WHERE ST_Intersects(x.geom, c.geom)
+               ) ELSE COALESCE(h.playgrounds, 0) END AS playgrounds,
+               CASE WHEN c.issues THEN (
+                   SELECT count(*) FROM access_issues x WHERE ST_Intersects(x.geom, c.geom)
+               ) ELSE COALESCE(h.open_issues, 0) END AS open_issues
+        FROM cells c
+        LEFT JOIN hex_cells h ON h.size = c.size AND h.i = c.i AND h.j = c.j
+    ), emptied AS (
+        DELETE FROM hex_cells h USING measured m
+        WHERE h.size = m.size AND h.i = m.i AND h.j = m.j
+          AND m.park_area_m2 = 0 AND m.route_length_m = 0
+          AND m.playgrounds = 0 AND m.open_issues = 0
+    ), upserted AS (
+        INSERT INTO hex_cells AS h
+            (size, i, j, park_area_m2, route_length_m, accessible_length_m, playgrounds, open_issues, geom)
+        SELECT size, i, j, park_area_m2, route_length_m, accessible_length_m, playgrounds, open_issues, geom
+        FROM measured
+        WHERE park_area_m2 > 0 OR route_length_m > 0 OR playgrounds > 0 OR open_issues > 0
+        ON CONFLICT (size, i, j) DO UPDATE
+            SET park_area_m2        = EXCLUDED.park_area_m2,
+                route_length_m      = EXCLUDED.route_length_m,
+                accessible_length_m = EXCLUDED.accessible_length_m,
+                playgrounds         = EXCLUDED.playgrounds,
+                open_issues         = EXCLUDED.open_issues
+    )
+    SELECT count(*) INTO refreshed FROM measured;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION hex_cells_refresh_unless_deferred() RETURNS void AS $$
+BEGIN
+    IF current_setting('greenspace.hex_deferred', true) IS DISTINCT FROM 'on' THEN
+        PERFORM hex_cells_refresh();
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement triggers. TG_ARGV[0] is the layer (the table name, which on a
+-- partitioned table is not what TG_TABLE_NAME says); the transition
+-- tables are hex_new and hex_old.
+CREATE OR REPLACE FUNCTION hex_cells_queue() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO hex_cells_dirty
+        SELECT c.size, c.i, c.j, TG_ARGV[0] FROM hex_new n, hex_cells_of(n.geom) c
+        ON CONFLICT DO NOTHING;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO hex_cells_dirty
+        SELECT c.size, c.i, c.j, TG_ARGV[0] FROM hex_old o, hex_cells_of(o.geom) c
+        ON CONFLICT DO NOTHING;
+    END IF;
+    PERFORM hex_cells_refresh_unless_deferred();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRUNCATE has no transition table: every existing cell may have changed.
+CREATE OR REPLACE FUNCTION hex_cells_queue_all() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO hex_cells_dirty
+    SELECT size, i, j, TG_ARGV[0] FROM hex_cells
+    ON CONFLICT DO NOTHING;
+    PERFORM hex_cells_refresh_unless_deferred();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute every cell from scratch, e.g. after restoring a dump.
+CREATE OR REPLACE FUNCTION hex_cells_rebuild() RETURNS INTEGER AS $$
+BEGIN
+    TRUNCATE hex_cells_dirty;
+""" + "".join(f"""    INSERT INTO hex_cells_dirty SELECT size, i, j, '{t}' FROM hex_cells ON CONFLICT DO NOTHING;
+    INSERT INTO hex_cells_dirty SELECT c.size, c.i, c.j, '{t}' FROM {t} x, hex_cells_of(x.geom) c ON CONFLICT DO NOTHING;
+""" for t in HEX_TABLES) + """    RETURN hex_cells_refresh();
+END;
+$$ LANGUAGE plpgsql;
+""" + "".join(f"""
+DROP TRIGGER IF EXISTS {t}_hex_insert ON {t};
+CREATE TRIGGER {t}_hex_insert
+    AFTER INSERT ON {t} REFERENCING NEW TABLE AS hex_new
+    FOR EACH STATEMENT EXECUTE FUNCTION hex_cells_queue('{t}');
+DROP TRIGGER IF EXISTS {t}_hex_update ON {t};
+CREATE TRIGGER {t}_hex_update
+    AFTER UPDATE ON {t} REFERENCING OLD TABLE AS hex_old NEW TABLE AS hex_new
+    FOR EACH STATEMENT EXECUTE FUNCTION hex_cells_queue('{t}');
+DROP TRIGGER IF EXISTS {t}_hex_delete ON {t};
+CREATE TRIGGER {t}_hex_delete
+    AFTER DELETE ON {t} REFERENCING OLD TABLE AS hex_old
+    FOR EACH STATEMENT EXECUTE FUNCTION hex_cells_queue('{t}');
+DROP TRIGGER IF EXISTS {t}_hex_truncate ON {t};
+CREATE TRIGGER {t}_hex_truncate
+    AFTER TRUNCATE ON {t}
+    FOR EACH STATEMENT EXECUTE FUNCTION hex_cells_queue_all('{t}');
+""" for t in HEX_TABLES) + "".join(f"""
+CREATE INDEX IF NOT EXISTS hex_cells_{s}_geom_idx ON hex_cells USING GIST (geom) WHERE size = {s};
+""" for s in HEX_SIZES) + """
+SELECT hex_cells_rebuild();
+ANALYZE hex_cells;
+"""
+
+REVERSE_SQL = "".join(f"""
+DROP TRIGGER IF EXISTS {t}_hex_insert ON {t};
+DROP TRIGGER IF EXISTS {t}_hex_update ON {t};
+DROP TRIGGER IF EXISTS {t}_hex_delete ON {t};
+DROP TRIGGER IF EXISTS {t}_hex_truncate ON {t};
+""" for t in HEX_TABLES) + """
+DROP FUNCTION IF EXISTS hex_cells_rebuild();
+DROP FUNCTION IF EXISTS hex_cells_queue_all();
+DROP FUNCTION IF EXISTS hex_cells_queue();
+DROP FUNCTION IF EXISTS hex_cells_refresh_unless_deferred();
+DROP FUNCTION IF EXISTS hex_cells_refresh();
+DROP FUNCTION IF EXISTS hex_cells_of(geometry);
+DROP TABLE IF EXISTS hex_cells_dirty;
+DROP TABLE IF EXISTS hex_cells;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_park_amenities'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Lets a transaction hold back the per-statement data version bump (0004).
+# api/bulk.py sets greenspace.skip_version_bump for the statements of a
+# playground batch and bumps the version once itself, so everything keyed on
+# the version is invalidated once per batch rather than once per statement.
+
+FORWARD_SQL = """
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('greenspace.skip_version_bump', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO data_versions AS d (table_name, version, changed_at)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (table_name) DO UPDATE
+        SET version = d.version + 1, changed_at = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+REVERSE_SQL = """
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_versions AS d (table_name, version, changed_at)
+    VALUES (TG_TABLE_NAME, 1, now())
+    ON CONFLICT (table_name) DO UPDATE
+        SET version = d.version + 1, changed_at = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_hex_cells'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
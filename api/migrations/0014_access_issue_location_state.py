@@ -0,0 +1,27 @@
+from django.db import migrations
+
+# The access_issues table has had no lat/lng columns since migration 0009
+# rebuilt it around the PostGIS geom column; only the model state still
+# listed them. State only: there is nothing to drop in the database.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_bulk_version_bump'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='accessissue',
+                    name='lat',
+                ),
+                migrations.RemoveField(
+                    model_name='accessissue',
+                    name='lng',
+                ),
+            ],
+        ),
+    ]
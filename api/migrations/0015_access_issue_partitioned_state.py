@@ -0,0 +1,19 @@
+from django.db import migrations
+
+# access_issues is partitioned and maintained by raw SQL since migration
+# 0009 (composite primary key, naive UTC created_at), so Django stops
+# managing it. State only.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_access_issue_location_state'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='accessissue',
+            options={'managed': False, 'ordering': ['-created_at']},
+        ),
+    ]
@@ -0,0 +1,181 @@
+from django.db import migrations
+
+# hex_cells_refresh() from 0012 measured a cell, kept the layers it wasn't
+# asked to recompute from the hex_cells row as its snapshot saw it, then
+# wrote every column back and decided whether the cell was empty from those
+# values. Two refreshes of one cell in concurrent transactions could so put
+# back a measure the other had just changed, or delete a cell the other had
+# just filled.
+#
+# This version gives every queued cell a row and locks them all before
+# measuring, updates only the queued layers' columns in place, and deletes
+# the cells whose updated rows are empty.
+
+FORWARD_SQL = """
+CREATE OR REPLACE FUNCTION hex_cells_refresh() RETURNS INTEGER AS $$
+DECLARE
+    c_size        INTEGER[];
+    c_i           INTEGER[];
+    c_j           INTEGER[];
+    c_parks       BOOLEAN[];
+    c_routes      BOOLEAN[];
+    c_playgrounds BOOLEAN[];
+    c_issues      BOOLEAN[];
+    refreshed     INTEGER;
+BEGIN
+    -- The queue is taken in one statement, so rows other transactions
+    -- commit meanwhile stay queued for their own refresh.
+    WITH taken AS (
+        DELETE FROM hex_cells_dirty RETURNING size, i, j, layer
+    ), cells AS (
+        SELECT size, i, j,
+               bool_or(layer = 'parks')          AS parks,
+               bool_or(layer = 'walking_routes') AS routes,
+               bool_or(layer = 'playgrounds')    AS playgrounds,
+               bool_or(layer = 'access_issues')  AS issues
+        FROM taken
+        GROUP BY size, i, j
+    )
+    SELECT array_agg(size), array_agg(i), array_agg(j),
+           array_agg(parks), array_agg(routes), array_agg(playgrounds), array_agg(issues)
+    INTO c_size, c_i, c_j, c_parks, c_routes, c_playgrounds, c_issues
+    FROM cells;
+
+    IF c_size IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- Every queued cell gets a row, and every row is locked, in key order,
+    -- before anything is measured: a concurrent refresh of the same cells
+    -- waits here for this one to commit, and the statements below then
+    -- start from what it wrote rather than from an older copy.
+    INSERT INTO hex_cells (size, i, j, geom)
+    SELECT q.size, q.i, q.j,
+           ST_Transform(ST_Hexagon(q.size, q.i, q.j, ST_SetSRID(ST_MakePoint(0, 0), 3857)), 4326)
+    FROM unnest(c_size, c_i, c_j) AS q(size, i, j)
+    ORDER BY q.size, q.i, q.j
+    ON CONFLICT (size, i, j) DO NOTHING;
+
+    PERFORM 1
+    FROM hex_cells h, unnest(c_size, c_i, c_j) AS q(size, i, j)
+    WHERE h.size = q.size AND h.i = q.i AND h.j = q.j
+    ORDER BY h.size, h.i, h.j
+    FOR UPDATE OF h;
+
+    -- Only the measures of the layers queued for a cell are recomputed, so
+    -- a new playground doesn't re-measure every footway in its cell; the
+    -- rest keep the values now in the row.
+    UPDATE hex_cells h
+    SET park_area_m2 = CASE WHEN c.parks THEN COALESCE((
+            SELECT SUM(COALESCE(x.area_m2, ST_Area(geography(x.geom)))
+                       * ST_Area(ST_Intersection(x.geom, h.geom)) / NULLIF(ST_Area(x.geom), 0))
+            FROM parks x WHERE ST_Intersects(x.geom, h.geom)
+        ), 0) ELSE h.park_area_m2 END,
+        route_length_m = CASE WHEN c.routes THEN COALESCE((
+            SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                       * ST_Length(ST_Intersection(x.geom, h.geom)) / NULLIF(ST_Length(x.geom), 0))
+            FROM walking_routes x WHERE ST_Intersects(x.geom, h.geom)
+        ), 0) ELSE h.route_length_m END,
+        accessible_length_m = CASE WHEN c.routes THEN COALESCE((
+            SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                       * ST_Length(ST_Intersection(x.geom, h.geom)) / NULLIF(ST_Length(x.geom), 0))
+            FROM walking_routes x WHERE ST_Intersects(x.geom, h.geom) AND x.is_accessible
+        ), 0) ELSE h.accessible_length_m END,
+        playgrounds = CASE WHEN c.playgrounds THEN (
+            SELECT count(*) FROM playgrounds x WHERE ST_Intersects(x.geom, h.geom)
+        ) ELSE h.playgrounds END,
+        open_issues = CASE WHEN c.issues THEN (
+            SELECT count(*) FROM access_issues x WHERE ST_Intersects(x.geom, h.geom)
+        ) ELSE h.open_issues END
+    FROM unnest(c_size, c_i, c_j, c_parks, c_routes, c_playgrounds, c_issues)
+         AS c(size, i, j, parks, routes, playgrounds, issues)
+    WHERE h.size = c.size AND h.i = c.i AND h.j = c.j;
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+
+    -- Decided on the updated rows, which hold every layer's current value.
+    DELETE FROM hex_cells h
+    USING unnest(c_size, c_i, c_j) AS q(size, i, j)
+    WHERE h.size = q.size AND h.i = q.i AND h.j = q.j
+      AND h.park_area_m2 = 0 AND h.route_length_m = 0
+      AND h.playgrounds = 0 AND h.open_issues = 0;
+
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+REVERSE_SQL = """
+CREATE OR REPLACE FUNCTION hex_cells_refresh() RETURNS INTEGER AS $$
+DECLARE
+    refreshed INTEGER;
+BEGIN
+    WITH taken AS (
+        DELETE FROM hex_cells_dirty RETURNING size, i, j, layer
+    ), cells AS (
+        SELECT size, i, j,
+               bool_or(layer = 'parks')          AS parks,
+               bool_or(layer = 'walking_routes') AS routes,
+               bool_or(layer = 'playgrounds')    AS playgrounds,
+               bool_or(layer = 'access_issues')  AS issues,
+               ST_Transform(ST_Hexagon(size, i, j, ST_SetSRID(ST_MakePoint(0, 0), 3857)), 4326) AS geom
+        FROM taken
+        GROUP BY size, i, j
+    ), measured AS (
+        SELECT c.size, c.i, c.j, c.geom,
+               CASE WHEN c.parks THEN COALESCE((
+                   SELECT SUM(COALESCE(x.area_m2, ST_Area(geography(x.geom)))
+                              * ST_Area(ST_Intersection(x.geom, c.geom)) / NULLIF(ST_Area(x.geom), 0))
+                   FROM parks x WHERE ST_Intersects(x.geom, c.geom)
+               ), 0) ELSE COALESCE(h.park_area_m2, 0) END AS park_area_m2,
+               CASE WHEN c.routes THEN COALESCE((
+                   SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                              * ST_Length(ST_Intersection(x.geom, c.geom)) / NULLIF(ST_Length(x.geom), 0))
+                   FROM walking_routes x WHERE ST_Intersects(x.geom, c.geom)
+               ), 0) ELSE COALESCE(h.route_length_m, 0) END AS route_length_m,
+               CASE WHEN c.routes THEN COALESCE((
+                   SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                              * ST_Length(ST_Intersection(x.geom, c.geom)) / NULLIF(ST_Length(x.geom), 0))
+                   FROM walking_routes x WHERE ST_Intersects(x.geom, c.geom) AND x.is_accessible
+               ), 0) ELSE COALESCE(h.accessible_length_m, 0) END AS accessible_length_m,
+               CASE WHEN c.playgrounds THEN (
+                   SELECT count(*) FROM playgrounds x WHERE ST_Intersects(x.geom, c.geom)
+               ) ELSE COALESCE(h.playgrounds, 0) END AS playgrounds,
+               CASE WHEN c.issues THEN (
+                   SELECT count(*) FROM access_issues x WHERE ST_Intersects(x.geom, c.geom)
+               ) ELSE COALESCE(h.open_issues, 0) END AS open_issues
+        FROM cells c
+        LEFT JOIN hex_cells h ON h.size = c.size AND h.i = c.i AND h.j = c.j
+    ), emptied AS (
+        DELETE FROM hex_cells h USING measured m
+        WHERE h.size = m.size AND h.i = m.i AND h.j = m.j
+          AND m.park_area_m2 = 0 AND m.route_length_m = 0
+          AND m.playgrounds = 0 AND m.open_issues = 0
+    ), upserted AS (
+        INSERT INTO hex_cells AS h
+            (size, i, j, park_area_m2, route_length_m, accessible_length_m, playgrounds, open_issues, geom)
+        SELECT size, i, j, park_area_m2, route_length_m, accessible_length_m, playgrounds, open_issues, geom
+        FROM measured
+        WHERE park_area_m2 > 0 OR route_length_m > 0 OR playgrounds > 0 OR open_issues > 0
+        ON CONFLICT (size, i, j) DO UPDATE
+            SET park_area_m2        = EXCLUDED.park_area_m2,
+                route_length_m      = EXCLUDED.route_length_m,
+                accessible_length_m = EXCLUDED.accessible_length_m,
+                playgrounds         = EXCLUDED.playgrounds,
+                open_issues         = EXCLUDED.open_issues
+    )
+    SELECT count(*) INTO refreshed FROM measured;
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_access_issue_partitioned_state'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
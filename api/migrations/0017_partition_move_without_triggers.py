@@ -0,0 +1,102 @@
+from django.db import migrations
+
+# access_issues_ensure_partition() from 0009 moved a month's rows out of the
+# default partition with a DELETE and an INSERT through access_issues. Both
+# fired the row and statement triggers, so an unchanged row went out on the
+# live stream as a delete and an insert, was taken out of and put back into
+# the cluster and route summary aggregates, queued its hexagon cells and
+# bumped the data version.
+#
+# This version moves the rows with the default partition detached and the
+# new month still a plain table, then attaches both. A month with nothing
+# in the default partition is created directly, as before.
+
+FORWARD_SQL = """
+CREATE OR REPLACE FUNCTION access_issues_ensure_partition(p_month TIMESTAMP) RETURNS BOOLEAN AS $$
+DECLARE
+    start_at TIMESTAMP := date_trunc('month', p_month);
+    end_at   TIMESTAMP := date_trunc('month', p_month) + interval '1 month';
+    part     TEXT      := access_issues_partition_name(p_month);
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM access_issues_default WHERE created_at >= start_at AND created_at < end_at
+    ) THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF access_issues FOR VALUES FROM (%L) TO (%L)',
+            part, start_at, end_at
+        );
+        RETURN TRUE;
+    END IF;
+
+    -- Rows for this month in the default partition would stop the new
+    -- partition from being attached. They are moved while neither table is
+    -- part of access_issues, so no trigger sees the move: the aggregates,
+    -- the hexagon cells and the data version already count these rows, and
+    -- the live stream has nothing to report.
+    ALTER TABLE access_issues DETACH PARTITION access_issues_default;
+    ALTER TABLE access_issues_default DISABLE TRIGGER USER;
+    EXECUTE format('CREATE TABLE %I (LIKE access_issues INCLUDING DEFAULTS)', part);
+    EXECUTE format(
+        'WITH moved AS ('
+        '    DELETE FROM access_issues_default WHERE created_at >= %L AND created_at < %L RETURNING *'
+        ') INSERT INTO %I SELECT * FROM moved',
+        start_at, end_at, part
+    );
+    ALTER TABLE access_issues_default ENABLE TRIGGER USER;
+
+    -- Attaching clones the parent's indexes and row triggers onto both.
+    EXECUTE format(
+        'ALTER TABLE access_issues ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        part, start_at, end_at
+    );
+    ALTER TABLE access_issues ATTACH PARTITION access_issues_default DEFAULT;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+REVERSE_SQL = """
+CREATE OR REPLACE FUNCTION access_issues_ensure_partition(p_month TIMESTAMP) RETURNS BOOLEAN AS $$
+DECLARE
+    start_at TIMESTAMP := date_trunc('month', p_month);
+    end_at   TIMESTAMP := date_trunc('month', p_month) + interval '1 month';
+    part     TEXT      := access_issues_partition_name(p_month);
+BEGIN
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+
+    -- Rows for this month in the default partition would stop the new
+    -- partition from being attached; move them over.
+    CREATE TEMP TABLE access_issues_moving ON COMMIT DROP AS
+        SELECT * FROM access_issues_default
+        WHERE created_at >= start_at AND created_at < end_at;
+    DELETE FROM access_issues_default
+        WHERE created_at >= start_at AND created_at < end_at;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF access_issues FOR VALUES FROM (%L) TO (%L)',
+        part, start_at, end_at
+    );
+
+    INSERT INTO access_issues SELECT * FROM access_issues_moving;
+    DROP TABLE access_issues_moving;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_hex_cells_refresh_locked'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,222 @@
+from django.db import migrations
+
+# hex_cells_refresh() from 0016 measured each cell against its hexagon
+# transformed to EPSG:4326, while hex_cells_of() queues the cells a feature
+# intersects in EPSG:3857, where the hexagons are laid out. Transformed, a
+# hexagon's edges no longer follow the EPSG:3857 ones, so a feature near an
+# edge could be queued for a cell and counted in its neighbour, or counted
+# in a cell that was never queued for it and so never recounted when it
+# changed. Area and length fractions were taken in EPSG:4326 too.
+#
+# This version measures every layer against the EPSG:3857 hexagon, with
+# the features transformed to EPSG:3857, so membership and measures agree
+# with hex_cells_of(). It is otherwise 0016's.
+
+FORWARD_SQL = """
+CREATE OR REPLACE FUNCTION hex_cells_refresh() RETURNS INTEGER AS $$
+DECLARE
+    c_size        INTEGER[];
+    c_i           INTEGER[];
+    c_j           INTEGER[];
+    c_parks       BOOLEAN[];
+    c_routes      BOOLEAN[];
+    c_playgrounds BOOLEAN[];
+    c_issues      BOOLEAN[];
+    refreshed     INTEGER;
+BEGIN
+    -- The queue is taken in one statement, so rows other transactions
+    -- commit meanwhile stay queued for their own refresh.
+    WITH taken AS (
+        DELETE FROM hex_cells_dirty RETURNING size, i, j, layer
+    ), cells AS (
+        SELECT size, i, j,
+               bool_or(layer = 'parks')          AS parks,
+               bool_or(layer = 'walking_routes') AS routes,
+               bool_or(layer = 'playgrounds')    AS playgrounds,
+               bool_or(layer = 'access_issues')  AS issues
+        FROM taken
+        GROUP BY size, i, j
+    )
+    SELECT array_agg(size), array_agg(i), array_agg(j),
+           array_agg(parks), array_agg(routes), array_agg(playgrounds), array_agg(issues)
+    INTO c_size, c_i, c_j, c_parks, c_routes, c_playgrounds, c_issues
+    FROM cells;
+
+    IF c_size IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- Every queued cell gets a row, and every row is locked, in key order,
+    -- before anything is measured: a concurrent refresh of the same cells
+    -- waits here for this one to commit, and the statements below then
+    -- start from what it wrote rather than from an older copy.
+    INSERT INTO hex_cells (size, i, j, geom)
+    SELECT q.size, q.i, q.j,
+           ST_Transform(ST_Hexagon(q.size, q.i, q.j, ST_SetSRID(ST_MakePoint(0, 0), 3857)), 4326)
+    FROM unnest(c_size, c_i, c_j) AS q(size, i, j)
+    ORDER BY q.size, q.i, q.j
+    ON CONFLICT (size, i, j) DO NOTHING;
+
+    PERFORM 1
+    FROM hex_cells h, unnest(c_size, c_i, c_j) AS q(size, i, j)
+    WHERE h.size = q.size AND h.i = q.i AND h.j = q.j
+    ORDER BY h.size, h.i, h.j
+    FOR UPDATE OF h;
+
+    -- Only the measures of the layers queued for a cell are recomputed, so
+    -- a new playground doesn't re-measure every footway in its cell; the
+    -- rest keep the values now in the row. Everything is measured against
+    -- the EPSG:3857 hexagon, as hex_cells_of() assigns cells, so a feature
+    -- is counted in exactly the cells it was queued for. The bounding box
+    -- test against the stored EPSG:4326 hexagon is exact, and uses the
+    -- layers' spatial indexes.
+    UPDATE hex_cells h
+    SET park_area_m2 = CASE WHEN c.parks THEN COALESCE((
+            SELECT SUM(COALESCE(x.area_m2, ST_Area(geography(x.geom)))
+                       * ST_Area(ST_Intersection(m, c.hex)) / NULLIF(ST_Area(m), 0))
+            FROM parks x, ST_Transform(x.geom, 3857) AS t(m)
+            WHERE x.geom && h.geom AND ST_Intersects(m, c.hex)
+        ), 0) ELSE h.park_area_m2 END,
+        route_length_m = CASE WHEN c.routes THEN COALESCE((
+            SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                       * ST_Length(ST_Intersection(m, c.hex)) / NULLIF(ST_Length(m), 0))
+            FROM walking_routes x, ST_Transform(x.geom, 3857) AS t(m)
+            WHERE x.geom && h.geom AND ST_Intersects(m, c.hex)
+        ), 0) ELSE h.route_length_m END,
+        accessible_length_m = CASE WHEN c.routes THEN COALESCE((
+            SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                       * ST_Length(ST_Intersection(m, c.hex)) / NULLIF(ST_Length(m), 0))
+            FROM walking_routes x, ST_Transform(x.geom, 3857) AS t(m)
+            WHERE x.geom && h.geom AND ST_Intersects(m, c.hex) AND x.is_accessible
+        ), 0) ELSE h.accessible_length_m END,
+        playgrounds = CASE WHEN c.playgrounds THEN (
+            SELECT count(*) FROM playgrounds x
+            WHERE x.geom && h.geom AND ST_Intersects(ST_Transform(x.geom, 3857), c.hex)
+        ) ELSE h.playgrounds END,
+        open_issues = CASE WHEN c.issues THEN (
+            SELECT count(*) FROM access_issues x
+            WHERE x.geom && h.geom AND ST_Intersects(ST_Transform(x.geom, 3857), c.hex)
+        ) ELSE h.open_issues END
+    FROM (
+        SELECT q.*, ST_Hexagon(q.size, q.i, q.j, ST_SetSRID(ST_MakePoint(0, 0), 3857)) AS hex
+        FROM unnest(c_size, c_i, c_j, c_parks, c_routes, c_playgrounds, c_issues)
+             AS q(size, i, j, parks, routes, playgrounds, issues)
+    ) c
+    WHERE h.size = c.size AND h.i = c.i AND h.j = c.j;
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+
+    -- Decided on the updated rows, which hold every layer's current value.
+    DELETE FROM hex_cells h
+    USING unnest(c_size, c_i, c_j) AS q(size, i, j)
+    WHERE h.size = q.size AND h.i = q.i AND h.j = q.j
+      AND h.park_area_m2 = 0 AND h.route_length_m = 0
+      AND h.playgrounds = 0 AND h.open_issues = 0;
+
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+REVERSE_SQL = """
+CREATE OR REPLACE FUNCTION hex_cells_refresh() RETURNS INTEGER AS $$
+DECLARE
+    c_size        INTEGER[];
+    c_i           INTEGER[];
+    c_j           INTEGER[];
+    c_parks       BOOLEAN[];
+    c_routes      BOOLEAN[];
+    c_playgrounds BOOLEAN[];
+    c_issues      BOOLEAN[];
+    refreshed     INTEGER;
+BEGIN
+    -- The queue is taken in one statement, so rows other transactions
+    -- commit meanwhile stay queued for their own refresh.
+    WITH taken AS (
+        DELETE FROM hex_cells_dirty RETURNING size, i, j, layer
+    ), cells AS (
+        SELECT size, i, j,
+               bool_or(layer = 'parks')          AS parks,
+               bool_or(layer = 'walking_routes') AS routes,
+               bool_or(layer = 'playgrounds')    AS playgrounds,
+               bool_or(layer = 'access_issues')  AS issues
+        FROM taken
+        GROUP BY size, i, j
+    )
+    SELECT array_agg(size), array_agg(i), array_agg(j),
+           array_agg(parks), array_agg(routes), array_agg(playgrounds), array_agg(issues)
+    INTO c_size, c_i, c_j, c_parks, c_routes, c_playgrounds, c_issues
+    FROM cells;
+
+    IF c_size IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- Every queued cell gets a row, and every row is locked, in key order,
+    -- before anything is measured: a concurrent refresh of the same cells
+    -- waits here for this one to commit, and the statements below then
+    -- start from what it wrote rather than from an older copy.
+    INSERT INTO hex_cells (size, i, j, geom)
+    SELECT q.size, q.i, q.j,
+           ST_Transform(ST_Hexagon(q.size, q.i, q.j, ST_SetSRID(ST_MakePoint(0, 0), 3857)), 4326)
+    FROM unnest(c_size, c_i, c_j) AS q(size, i, j)
+    ORDER BY q.size, q.i, q.j
+    ON CONFLICT (size, i, j) DO NOTHING;
+
+    PERFORM 1
+    FROM hex_cells h, unnest(c_size, c_i, c_j) AS q(size, i, j)
+    WHERE h.size = q.size AND h.i = q.i AND h.j = q.j
+    ORDER BY h.size, h.i, h.j
+    FOR UPDATE OF h;
+
+    -- Only the measures of the layers queued for a cell are recomputed, so
+    -- a new playground doesn't re-measure every footway in its cell; the
+    -- rest keep the values now in the row.
+    UPDATE hex_cells h
+    SET park_area_m2 = CASE WHEN c.parks THEN COALESCE((
+            SELECT SUM(COALESCE(x.area_m2, ST_Area(geography(x.geom)))
+                       * ST_Area(ST_Intersection(x.geom, h.geom)) / NULLIF(ST_Area(x.geom), 0))
+            FROM parks x WHERE ST_Intersects(x.geom, h.geom)
+        ), 0) ELSE h.park_area_m2 END,
+        route_length_m = CASE WHEN c.routes THEN COALESCE((
+            SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                       * ST_Length(ST_Intersection(x.geom, h.geom)) / NULLIF(ST_Length(x.geom), 0))
+            FROM walking_routes x WHERE ST_Intersects(x.geom, h.geom)
+        ), 0) ELSE h.route_length_m END,
+        accessible_length_m = CASE WHEN c.routes THEN COALESCE((
+            SELECT SUM(COALESCE(x.length_m, ST_Length(geography(x.geom)))
+                       * ST_Length(ST_Intersection(x.geom, h.geom)) / NULLIF(ST_Length(x.geom), 0))
+            FROM walking_routes x WHERE ST_Intersects(x.geom, h.geom) AND x.is_accessible
+        ), 0) ELSE h.accessible_length_m END,
+        playgrounds = CASE WHEN c.playgrounds THEN (
+            SELECT count(*) FROM playgrounds x WHERE ST_Intersects(x.geom, h.geom)
+        ) ELSE h.playgrounds END,
+        open_issues = CASE WHEN c.issues THEN (
+            SELECT count(*) FROM access_issues x WHERE ST_Intersects(x.geom, h.geom)
+        ) ELSE h.open_issues END
+    FROM unnest(c_size, c_i, c_j, c_parks, c_routes, c_playgrounds, c_issues)
+         AS c(size, i, j, parks, routes, playgrounds, issues)
+    WHERE h.size = c.size AND h.i = c.i AND h.j = c.j;
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+
+    -- Decided on the updated rows, which hold every layer's current value.
+    DELETE FROM hex_cells h
+    USING unnest(c_size, c_i, c_j) AS q(size, i, j)
+    WHERE h.size = q.size AND h.i = q.i AND h.j = q.j
+      AND h.park_area_m2 = 0 AND h.route_length_m = 0
+      AND h.playgrounds = 0 AND h.open_issues = 0;
+
+    RETURN refreshed;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_partition_move_without_triggers'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -1,4 +1,7 @@
+import datetime
+
 from django.db import models
+from django.utils import timezone
 
 
 class WalkingRoute(models.Model):
@@ -22,11 +25,36 @@ class WalkingRoute(models.Model):
         return self.name or f"Route {self.id}"
 
 
+class NaiveUTCDateTimeField(models.DateTimeField):
+    """
+    DateTimeField for a TIMESTAMP (without time zone) column holding UTC.
+    Values come back aware and go in as naive UTC, so USE_TZ code sees the
+    same datetimes it would from a timestamptz column.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        if value is not None and timezone.is_naive(value):
+            value = timezone.make_aware(value, datetime.timezone.utc)
+        return value
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+            value = timezone.make_naive(value, datetime.timezone.utc)
+        return value
+
+
 class AccessIssue(models.Model):
     """
     User-reported accessibility issues linked to a walking route.
-    This is a normal Django-managed table for CA2.
+
+    The table belongs to migration 0009: it is partitioned by month on
+    created_at, so its primary key is (id, created_at). Django 5.1 has no
+    composite keys; id alone stands in for it, which holds because every id
+    comes from access_issues_id_seq. The location is the PostGIS geom
+    column, which stays with the raw SQL like the route geometries.
     """
+    id = models.AutoField(primary_key=True)
     route = models.ForeignKey(
         WalkingRoute,
         on_delete=models.CASCADE,
@@ -41,19 +69,14 @@ class AccessIssue(models.Model):
         blank=True,
         help_text="Optional free-text description of the issue"
     )
-    lat = models.FloatField(
-        help_text="Latitude (WGS84)"
-    )
-    lng = models.FloatField(
-        help_text="Longitude (WGS84)"
-    )
-    created_at = models.DateTimeField(
+    created_at = NaiveUTCDateTimeField(
         auto_now_add=True
     )
 
     class Meta:
-        db_table = 'access_issues'    # nice clean table name
+        managed = False               # partitioned table, see migration 0009
+        db_table = 'access_issues'
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"{self.issue_type} on route {self.route_id} @ ({self.lat:.5f}, {self.lng:.5f})"
+        return f"{self.issue_type} on route {self.route_id}"
@@ -0,0 +1,148 @@
+"""
+Batch nearest-playground lookups ("nearest playground for each of these
+20,000 addresses").
+
+Origins come in as CSV (header with lat,lng and an optional id column) or as
+GeoJSONSeq (one Point feature per line, RFC 8142 record separators allowed).
+Each chunk of origins is resolved with a single LATERAL KNN join against the
+playgrounds GiST index, instead of one HTTP request and one query per origin.
+"""
+from collections import namedtuple
+import csv
+import json
+
+from django.db import connection
+
+from .batch import DEFAULT_CHUNK_SIZE, chunked, parallel_map
+
+MAX_K = 10
+
+Origin = namedtuple("Origin", "line ref lng lat error")
+
+NEAREST_SQL = """
+  SELECT o.ord, p.id, p.name, p.meters
+  FROM unnest(%s::int[], %s::float8[], %s::float8[]) AS o(ord, lng, lat)
+  CROSS JOIN LATERAL (
+    SELECT pg.id, pg.name,
+           ST_Distance(
+             pg.geom::geography,
+             ST_SetSRID(ST_MakePoint(o.lng, o.lat),4326)::geography
+           ) AS meters
+    FROM playgrounds pg
+    ORDER BY pg.geom <-> ST_SetSRID(ST_MakePoint(o.lng, o.lat),4326)
+    LIMIT %s
+  ) p
+  ORDER BY o.ord, p.meters;
+"""
+
+
+def _parse_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        line = reader.line_num
+        try:
+            lat = float(row["lat"])
+            lng = float(row["lng"])
+        except Exception as e:
+            yield Origin(line, row.get("id"), None, None, f"lat,lng required: {e}")
+            continue
+        yield Origin(line, row.get("id") or str(line - 1), lng, lat, None)
+
+
+def _parse_geojsonseq(lines):
+    for line, text in enumerate(lines, start=1):
+        text = text.strip().lstrip("\x1e")
+        if not text:
+            continue
+        try:
+            feat = json.loads(text)
+            geom = feat.get("geometry") or feat
+            lng, lat = (float(v) for v in geom["coordinates"][:2])
+            props = feat.get("properties") or {}
+            if not isinstance(props, dict):
+                raise ValueError("properties must be an object")
+            ref = feat.get("id", props.get("id", line))
+        except Exception as e:
+            yield Origin(line, None, None, None, f"Point feature required: {e}")
+            continue
+        yield Origin(line, ref, lng, lat, None)
+
+
+def parse_origins(lines, fmt=None):
+    """
+    Yield an Origin for every input record. Records that can't be parsed
+    have `error` set instead of failing the whole batch.
+    fmt is "csv", "geojsonseq", or None to guess from the first line.
+    """
+    lines = iter(lines)
+    first = next(lines, "")
+    if fmt is None:
+        fmt = "geojsonseq" if first.lstrip().startswith(("{", "\x1e")) else "csv"
+
+    def replay():
+        yield first
+        yield from lines
+
+    if fmt == "geojsonseq":
+        return _parse_geojsonseq(replay())
+    if fmt == "csv":
+        return _parse_csv(replay())
+    raise ValueError(f"unknown origin format: {fmt}")
+
+
+def _resolve_chunk(chunk, k):
+    valid = [(i, o) for i, o in enumerate(chunk) if o.error is None]
+    nearest = {i: [] for i, _ in valid}
+    if valid:
+        with connection.cursor() as cur:
+            cur.execute(NEAREST_SQL, [
+                [i for i, _ in valid],
+                [o.lng for _, o in valid],
+                [o.lat for _, o in valid],
+                k,
+            ])
+            for ord_, pid, name, meters in cur.fetchall():
+                nearest[ord_].append({"id": pid, "name": name, "meters": meters})
+
+    out = []
+    for i, o in enumerate(chunk):
+        if o.error is not None:
+            out.append({"line": o.line, "ref": o.ref, "error": o.error})
+        else:
+            out.append({"ref": o.ref, "lat": o.lat, "lng": o.lng, "nearest": nearest[i]})
+    return out
+
+
+def nearest_playgrounds(origins, k=1, chunk_size=DEFAULT_CHUNK_SIZE, workers=None):
+    """
+    Yield one result dict per origin, in input order:
+      {"ref", "lat", "lng", "nearest": [{"id", "name", "meters"}, ...]}
+    or {"line", "ref", "error"} for origins that failed to parse.
+    """
+    k = max(1, min(int(k), MAX_K))
+    results = parallel_map(
+        lambda chunk: _resolve_chunk(chunk, k),
+        chunked(origins, chunk_size),
+        workers=workers,
+    )
+    for chunk_results in results:
+        yield from chunk_results
+
+
+CSV_HEADER = ["ref", "lat", "lng", "rank", "playground_id", "playground_name", "meters", "error"]
+
+
+def csv_rows(results):
+    """
+    Flatten nearest_playgrounds() output into one CSV row per (origin, rank).
+    An origin with no playground still gets a row, with the playground
+    columns empty, so every input ref appears in the output.
+    """
+    for r in results:
+        if "error" in r:
+            yield [r["ref"], "", "", "", "", "", "", r["error"]]
+            continue
+        if not r["nearest"]:
+            yield [r["ref"], r["lat"], r["lng"], "", "", "", "", ""]
+        for rank, p in enumerate(r["nearest"], start=1):
+            yield [r["ref"], r["lat"], r["lng"], rank, p["id"], p["name"], p["meters"], ""]
@@ -0,0 +1,253 @@
+"""
+Live change feed over Server-Sent Events.
+
+GET /api/stream/changes?bbox=minLng,minLat,maxLng,maxLat[&layers=playgrounds,access_issues]
+
+Each process keeps one Postgres connection LISTENing on the channel that the
+notify_change() trigger (migration 0005) writes to. Its socket is registered
+with the event loop, so no thread sits waiting on it. Every notification is
+matched against the subscribers' bounding boxes and queued only for those it
+falls inside. An idle subscriber costs one coroutine and an empty queue, so a
+process can hold thousands of open streams.
+
+This is a raw ASGI app mounted in server/asgi.py; it does not go through
+Django's request handling.
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+import psycopg2
+import psycopg2.extensions
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "greenspace_changes"
+LAYERS = ("playgrounds", "access_issues")
+HEARTBEAT_SECONDS = 25
+RECONNECT_SECONDS = 5
+QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, bbox, layers):
+        self.bbox = bbox
+        self.layers = layers
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def _inside(self, lng, lat):
+        if lng is None or lat is None:
+            return False
+        min_lng, min_lat, max_lng, max_lat = self.bbox
+        return min_lng <= lng <= max_lng and min_lat <= lat <= max_lat
+
+    def wants(self, event):
+        if event.get("layer") not in self.layers:
+            return False
+        return (
+            self._inside(event.get("lng"), event.get("lat"))
+            or self._inside(event.get("old_lng"), event.get("old_lat"))
+        )
+
+    def offer(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client that can't keep up is cut off and told to resync,
+            # rather than letting its queue grow without bound.
+            self.overflowed = True
+
+
+class ChangeBroker:
+    """One LISTEN connection per process, fanned out to many subscribers."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self._conn = None
+        self._loop = None
+        self._connecting = None
+
+    def _connect(self):
+        db = settings.DATABASES["default"]
+        conn = psycopg2.connect(
+            dbname=db["NAME"],
+            user=db["USER"],
+            password=db["PASSWORD"],
+            host=db["HOST"],
+            port=db["PORT"],
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL};")
+        return conn
+
+    async def _ensure_listening(self):
+        if self._conn is not None:
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._start())
+        await asyncio.shield(self._connecting)
+
+    async def _start(self):
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._conn = await self._loop.run_in_executor(None, self._connect)
+            self._loop.add_reader(self._conn.fileno(), self._on_readable)
+        finally:
+            self._connecting = None
+
+    def _drop_connection(self):
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+        except Exception:
+            pass
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    async def _reconnect_later(self):
+        await asyncio.sleep(RECONNECT_SECONDS)
+        if self._conn is None:
+            try:
+                await self._ensure_listening()
+            except psycopg2.Error:
+                logger.exception("change feed reconnect failed")
+                asyncio.ensure_future(self._reconnect_later())
+                return
+            # Anything sent while we were away is lost; tell clients to refetch.
+            self.dispatch({"layer": None, "op": "resync"})
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except psycopg2.Error:
+            logger.exception("change feed connection lost")
+            self._drop_connection()
+            asyncio.ensure_future(self._reconnect_later())
+            return
+        while self._conn.notifies:
+            note = self._conn.notifies.pop(0)
+            try:
+                event = json.loads(note.payload)
+            except ValueError:
+                continue
+            self.dispatch(event)
+
+    def dispatch(self, event):
+        if event.get("op") == "resync":
+            for sub in self.subscribers:
+                sub.offer(event)
+            return
+        for sub in self.subscribers:
+            if sub.wants(event):
+                sub.offer(event)
+
+    async def subscribe(self, bbox, layers):
+        await self._ensure_listening()
+        sub = Subscription(bbox, layers)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+
+
+broker = ChangeBroker()
+
+
+def _parse_query(scope):
+    qs = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    min_lng, min_lat, max_lng, max_lat = [float(v) for v in qs["bbox"][0].split(",")]
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("bbox must be minLng,minLat,maxLng,maxLat")
+    layers = set(LAYERS)
+    if "layers" in qs:
+        layers = {l for l in qs["layers"][0].split(",") if l in LAYERS}
+    return (min_lng, min_lat, max_lng, max_lat), layers
+
+
+async def _send_json(send, status, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": json.dumps(body).encode("utf-8")})
+
+
+def _event_bytes(event, event_id):
+    name = event.get("layer") or event.get("op")
+    data = json.dumps(event, default=str)
+    return f"id: {event_id}\nevent: {name}\ndata: {data}\n\n".encode("utf-8")
+
+
+async def changes_app(scope, receive, send):
+    if scope["method"] != "GET":
+        await _send_json(send, 405, {"error": "GET only"})
+        return
+    try:
+        bbox, layers = _parse_query(scope)
+    except Exception:
+        await _send_json(send, 400, {"error": "bbox=minLng,minLat,maxLng,maxLat required"})
+        return
+
+    try:
+        sub = await broker.subscribe(bbox, layers)
+    except psycopg2.Error:
+        logger.exception("change feed unavailable")
+        await _send_json(send, 503, {"error": "change feed unavailable"})
+        return
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+                sub.offer(None)
+                return
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": f"retry: {RECONNECT_SECONDS * 1000}\n: subscribed\n\n".encode("utf-8"),
+            "more_body": True,
+        })
+
+        event_id = 0
+        while not disconnected.is_set():
+            if sub.overflowed:
+                event_id += 1
+                body = _event_bytes({"layer": None, "op": "resync"}, event_id)
+                await send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await send({"type": "http.response.body", "body": b": keepalive\n\n", "more_body": True})
+                continue
+            if event is None:
+                break
+            event_id += 1
+            await send({"type": "http.response.body", "body": _event_bytes(event, event_id), "more_body": True})
+    finally:
+        watcher.cancel()
+        broker.unsubscribe(sub)
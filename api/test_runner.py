@@ -0,0 +1,82 @@
+"""
+Test runner for a PostGIS test database.
+
+parks, playgrounds, walking_routes and access_issues are created by hand
+(README section 6.3) and the api migrations start from there: 0001_initial
+is faked, and the later migrations alter those tables and add the
+triggers. PostGISTestRunner sets a fresh test database up the same way.
+Just before the api migrations run, it creates the tables and applies
+0001_initial to the migration state only, as
+`migrate api 0001_initial --fake` does. Every migration after that runs
+for real, so the tests exercise the shipped triggers and functions.
+
+Test classes that use no database (plain unittest.TestCase) still run
+without Postgres; Django only creates the databases some test asks for.
+"""
+from django.db import connections, migrations
+from django.db.models.signals import pre_migrate
+from django.test.runner import DiscoverRunner
+
+# README section 6.3.
+BASE_SCHEMA_SQL = """
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+CREATE TABLE IF NOT EXISTS parks (
+    id        SERIAL PRIMARY KEY,
+    name      TEXT,
+    category  TEXT,
+    area_ha   DOUBLE PRECISION,
+    geom      geometry(MultiPolygon, 4326)
+);
+
+CREATE TABLE IF NOT EXISTS playgrounds (
+    id     SERIAL PRIMARY KEY,
+    name   TEXT,
+    source TEXT,
+    geom   geometry(Point, 4326)
+);
+
+CREATE TABLE IF NOT EXISTS walking_routes (
+    id            SERIAL PRIMARY KEY,
+    name          TEXT,
+    source        TEXT,
+    surface       TEXT,
+    smoothness    TEXT,
+    is_accessible BOOLEAN,
+    geom          geometry(LineString, 4326)
+);
+
+CREATE TABLE IF NOT EXISTS access_issues (
+    id          SERIAL PRIMARY KEY,
+    route_id    INTEGER REFERENCES walking_routes(id) ON DELETE CASCADE,
+    issue_type  TEXT,
+    description TEXT,
+    created_at  TIMESTAMP DEFAULT NOW(),
+    geom        geometry(Point, 4326)
+);
+"""
+
+
+def _create_base_schema(sender, using, plan, **kwargs):
+    if sender.label != "api":
+        return
+    for migration, backwards in plan:
+        if (migration.app_label, migration.name) == ("api", "0001_initial") and not backwards:
+            break
+    else:
+        return  # a kept database that already has them
+    with connections[using].cursor() as cur:
+        cur.execute(BASE_SCHEMA_SQL)
+    migration.operations = [
+        migrations.SeparateDatabaseAndState(state_operations=migration.operations),
+    ]
+
+
+class PostGISTestRunner(DiscoverRunner):
+
+    def setup_databases(self, **kwargs):
+        pre_migrate.connect(_create_base_schema)
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            pre_migrate.disconnect(_create_base_schema)
@@ -0,0 +1,15 @@
+"""
+Tests for the api app, one module per module under test.
+
+The database tests are ordinary Django TestCases on the test database,
+which needs PostGIS (README section 6). api/test_runner.py creates the
+hand-made spatial tables in it before the migrations run, so the
+migrations' triggers and functions are the ones under test. The rest are
+plain unittest.TestCases that need no database and run without Postgres.
+
+    python manage.py test api
+
+test_plans.py EXPLAINs the read statements of api/views.py and the admin
+changelists against a scaled copy of the bundled data. The other modules
+check behaviour: what a write leaves in the tables, what a view returns.
+"""
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone as dt_timezone
+import unittest
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.db.models import Q
+
+from ..admin_scale import KeysetChangeList
+from ..models import AccessIssue
+
+
+class KeysetCursorTests(unittest.TestCase):
+
+    def setUp(self):
+        opts = AccessIssue._meta
+        self.changelist = KeysetChangeList.__new__(KeysetChangeList)
+        self.changelist.keyset = [(opts.get_field("created_at"), True), (opts.pk, True)]
+        self.created = datetime(2026, 3, 4, 5, 6, 7, tzinfo=dt_timezone.utc)
+
+    def test_round_trip(self):
+        cursor = self.changelist._cursor(AccessIssue(id=12, created_at=self.created))
+        self.assertEqual(self.changelist._parse_cursor(cursor), [self.created, 12])
+
+    def test_bad_cursor(self):
+        for cursor in ("12", "2026-03-04 05:06:07+00:00~x", "yesterday~12", "a~b~c"):
+            with self.subTest(cursor=cursor), self.assertRaises(IncorrectLookupParameters):
+                self.changelist._parse_cursor(cursor)
+
+    def test_after(self):
+        q = self.changelist._after([self.created, 12])
+        self.assertEqual(q, Q(created_at__lte=self.created) & (
+            Q(created_at__lt=self.created) | (Q(created_at=self.created) & Q(id__lt=12))
+        ))
@@ -0,0 +1,136 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, override_settings
+
+from .. import admission
+from ..db_routing import STICKY_COOKIE
+
+
+class AdmissionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_slots(self):
+        cls = admission._EndpointClass("test", slots=2, per_client=1)
+        self.assertIsNone(cls.try_acquire("a"))
+        self.assertEqual(cls.try_acquire("a"), 429)
+        self.assertIsNone(cls.try_acquire("b"))
+        self.assertEqual(cls.try_acquire("c"), 503)
+        cls.release("a")
+        self.assertIsNone(cls.try_acquire("c"))
+        self.assertEqual(cls.try_acquire("a"), 503)
+        cls.release("b")
+        self.assertIsNone(cls.try_acquire("a"))
+
+    def test_classifiers(self):
+        by_radius = admission.by_radius(default=1000, max_radius=5000, heavy_above=1500)
+        self.assertEqual(by_radius(self.factory.get("/")), "light")
+        self.assertEqual(by_radius(self.factory.get("/", {"radius_m": "2000"})), "heavy")
+        self.assertEqual(by_radius(self.factory.get("/", {"radius_m": "far"})), "light")
+        for radius in ("nan", "inf", "-inf", "6000"):
+            with self.subTest(radius=radius), self.assertRaises(ValueError):
+                by_radius(self.factory.get("/", {"radius_m": radius}))
+        by_limit = admission.by_limit("limit", default=1, max_limit=50, heavy_above=10)
+        self.assertEqual(by_limit(self.factory.get("/", {"limit": "20"})), "heavy")
+        self.assertEqual(by_limit(self.factory.get("/", {"limit": "nan"})), "light")
+        with self.assertRaises(ValueError):
+            by_limit(self.factory.get("/", {"limit": "51"}))
+
+    def test_client_key(self):
+        meta = {"REMOTE_ADDR": "10.0.0.2", "HTTP_X_FORWARDED_FOR": "1.1.1.1, 203.0.113.9"}
+        with override_settings(ADMISSION_TRUSTED_PROXIES=["10.0.0.0/24"]):
+            self.assertEqual(admission._client_key(self.factory.get("/", **meta)), "203.0.113.9")
+            meta["HTTP_X_REAL_IP"] = "198.51.100.4"
+            self.assertEqual(admission._client_key(self.factory.get("/", **meta)), "198.51.100.4")
+            self.assertEqual(admission._client_key(self.factory.get("/", REMOTE_ADDR="10.0.0.2")), "10.0.0.2")
+        # Straight from a client: its headers are ignored.
+        with override_settings(ADMISSION_TRUSTED_PROXIES=["127.0.0.1"]):
+            self.assertEqual(admission._client_key(self.factory.get("/", **meta)), "10.0.0.2")
+
+    def coalesced_view(self, streaming=False):
+        """A view whose first call blocks until released, and a way to know
+        when a second request is waiting for it."""
+        calls, entered, release, waiting = [], threading.Event(), threading.Event(), threading.Event()
+
+        def view(request):
+            calls.append(request)
+            if len(calls) == 1:
+                entered.set()
+                release.wait(5)
+            if streaming:
+                return StreamingHttpResponse(iter([f"call {len(calls)}"]))
+            response = HttpResponse(f"call {len(calls)}")
+            response["X-Call"] = str(len(calls))
+            response.set_cookie("leader", "1")
+            return response
+
+        class WatchedEvent(threading.Event):
+            def wait(self, timeout=None):
+                waiting.set()
+                return super().wait(timeout)
+
+        class Flight(admission._Flight):
+            def __init__(self):
+                super().__init__()
+                self.done = WatchedEvent()
+
+        patch = mock.patch.object(admission, "_Flight", Flight)
+        patch.start()
+        self.addCleanup(patch.stop)
+        return admission.admit(admission.fixed("light"))(view), calls, entered, release, waiting
+
+    def test_identical_requests_share_one_run(self):
+        view, calls, entered, release, waiting = self.coalesced_view()
+        results = {}
+        leader = threading.Thread(target=lambda: results.setdefault("leader", view(self.factory.get("/x", {"q": "1"}))))
+        leader.start()
+        self.assertTrue(entered.wait(5))
+        follower = threading.Thread(target=lambda: results.setdefault("follower", view(self.factory.get("/x", {"q": "1"}))))
+        follower.start()
+        self.assertTrue(waiting.wait(5))
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(len(calls), 1)
+        copy = results["follower"]
+        self.assertEqual(copy.content, b"call 1")
+        self.assertEqual(copy["X-Call"], "1")
+        self.assertNotIn("leader", copy.cookies)
+
+    def test_streamed_response_is_not_shared(self):
+        view, calls, entered, release, waiting = self.coalesced_view(streaming=True)
+        results = {}
+        leader = threading.Thread(target=lambda: results.setdefault("leader", view(self.factory.get("/x"))))
+        leader.start()
+        self.assertTrue(entered.wait(5))
+        follower = threading.Thread(target=lambda: results.setdefault("follower", view(self.factory.get("/x"))))
+        follower.start()
+        self.assertTrue(waiting.wait(5))
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results["follower"].status_code, 200)
+        self.assertEqual(b"".join(results["follower"].streaming_content), b"call 2")
+
+    def test_writers_and_other_requests_run_their_own(self):
+        view, calls, entered, release, _ = self.coalesced_view()
+        leader = threading.Thread(target=lambda: view(self.factory.get("/x", {"q": "1"})))
+        leader.start()
+        self.assertTrue(entered.wait(5))
+        try:
+            sticky = self.factory.get("/x", {"q": "1"})
+            sticky.COOKIES[STICKY_COOKIE] = str(time.time() + 60)
+            self.assertEqual(view(sticky).content, b"call 2")
+            self.assertEqual(view(self.factory.get("/x", {"q": "2"})).content, b"call 3")
+            self.assertEqual(view(self.factory.post("/x", {"q": "1"})).content, b"call 4")
+        finally:
+            release.set()
+            leader.join(5)
@@ -0,0 +1,126 @@
+from array import array
+import json
+import time
+import unittest
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase
+
+from .. import amenities, views, warm
+from .utils import LAT, LNG, insert_park
+
+
+class AmenityIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.first, self.second = list(amenities.AMENITIES)[:2]
+        ids = array("q", [3, 5, 8, 13, 21, 34, 55, 89, 144, 233])
+        bits = {name: 0 for name in amenities.AMENITIES}
+        bits[self.first] = amenities._bitset([0, 3, 8, 9], len(ids))
+        bits[self.second] = amenities._bitset([3, 4, 9], len(ids))
+        self.index = amenities.AmenityIndex()
+        self.index.state = (1, ids, {pk: p for p, pk in enumerate(ids)}, bits)
+        self.index.checked_at = time.monotonic()
+
+    def test_match(self):
+        state, matched = self.index.match([self.first, self.second])
+        self.assertEqual(self.index.ids(state, matched), [13, 233])
+        state, matched = self.index.match([])
+        self.assertEqual(len(self.index.ids(state, matched)), 10)
+
+    def test_counts(self):
+        counts = self.index.counts(self.index.state, [3, 13, 21, 999])
+        self.assertEqual(counts, {self.first: 2, self.second: 2})
+
+    def test_facets_without_bitsets(self):
+        with mock.patch.object(amenities.index, "snapshot", return_value=None):
+            counts = amenities.facet_counts([{"id": 1, "amenities": [self.first]}, {"id": 2, "amenities": None}])
+            self.assertEqual(counts, {self.first: 1})
+            with mock.patch.object(amenities, "connection") as conn:
+                cur = conn.cursor.return_value.__enter__.return_value
+                cur.fetchall.return_value = [(self.second, 2), ("retired", 1)]
+                counts = amenities.facet_counts([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+        self.assertEqual(counts, {self.second: 2})
+        self.assertEqual(cur.execute.call_args.args, (amenities.FACETS_SQL, [[1, 2]]))
+
+    def test_loads_on_first_use(self):
+        index = amenities.AmenityIndex()
+
+        def load():
+            index.state, index.checked_at = self.index.state, time.monotonic()
+        with mock.patch.object(index, "load", side_effect=load) as loaded:
+            state, matched = index.match([self.first])
+            index.match([self.first])
+        self.assertEqual(loaded.call_count, 1)
+        self.assertEqual(index.ids(state, matched), [3, 13, 144, 233])
+
+    def test_unloadable(self):
+        index = amenities.AmenityIndex()
+        with mock.patch.object(index, "load", side_effect=DatabaseError) as loaded:
+            self.assertIsNone(index.match([self.first]))
+            self.assertIsNone(index.match([self.first]))
+        self.assertEqual(loaded.call_count, 1)
+
+
+
+
+class AmenitySearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.both = insert_park(LNG, LAT, "Test park A", ("playground", "toilets"))
+        cls.playground = insert_park(LNG + 0.003, LAT, "Test park B", ("playground",))
+        cls.neither = insert_park(LNG + 0.006, LAT, "Test park C")
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        # The in-memory indexes would outlive the rolled-back rows.
+        amenities.index.state = None
+        warm.name_indexes["parks"].version = None
+        warm.name_indexes["parks"].rows = []
+
+    def get(self, view, **params):
+        response = view(self.factory.get("/", params))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_load(self):
+        self.assertEqual(amenities.index.load(), 3)
+        state, matched = amenities.index.match(["playground"])
+        self.assertEqual(amenities.index.ids(state, matched), [self.both, self.playground])
+        state, matched = amenities.index.match(["playground", "toilets"])
+        self.assertEqual(amenities.index.ids(state, matched), [self.both])
+
+    def test_parks_within(self):
+        expected = {"playground": 2, "toilets": 1}
+        params = {"lat": LAT, "lng": LNG, "radius_m": 2000, "amenities": "playground", "facets": "true"}
+        with self.subTest(index="bitsets"):
+            body = self.get(views.parks_within, **params)
+            self.assertEqual([f["id"] for f in body["features"]], [self.both, self.playground])
+            self.assertEqual(body["facets"], expected)
+        with self.subTest(index="gin"), mock.patch.object(amenities.index, "snapshot", return_value=None):
+            body = self.get(views.parks_within, **params)
+            self.assertEqual([f["id"] for f in body["features"]], [self.both, self.playground])
+            self.assertEqual(body["facets"], expected)
+
+    def test_parks_search(self):
+        warm.name_indexes["parks"].load()
+        expected = {"playground": 2, "toilets": 1}
+        with self.subTest(index="bitsets"):
+            body = self.get(views.parks_search, q="test park", facets="true")
+            self.assertEqual(len(body["features"]), 3)
+            self.assertEqual(body["facets"], expected)
+        # The preloaded name search rows carry no amenities.
+        with self.subTest(index=None), mock.patch.object(amenities.index, "snapshot", return_value=None):
+            body = self.get(views.parks_search, q="test park", facets="true")
+            self.assertEqual(body["facets"], expected)
+        with self.subTest(filtered=True):
+            body = self.get(views.parks_search, q="test park", amenities="toilets")
+            self.assertEqual([f["id"] for f in body["features"]], [self.both])
+
+    def test_unknown_amenity(self):
+        response = views.parks_within(self.factory.get("/", {"lat": LAT, "lng": LNG, "amenities": "moat"}))
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,101 @@
+import csv
+from datetime import date, datetime, timedelta
+import gzip
+import os
+import tempfile
+
+from django.db import connection
+from django.test import TestCase
+
+from .. import archive
+from ..hexcells import HEX_SIZES
+from .utils import (
+    cluster_sums, fetchone, hex_sums, insert_issue, insert_route, issue_aggregates, version,
+)
+
+
+class MaintainTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.route_id = insert_route()
+
+    def partition_of(self, pk):
+        return fetchone("SELECT tableoid::regclass::text FROM access_issues WHERE id = %s;", [pk])[0]
+
+    def test_moves_rows_without_firing_triggers(self):
+        later = datetime.now() + timedelta(days=800)
+        pk = insert_issue(self.route_id, "flooding", later)
+        self.assertEqual(self.partition_of(pk), "access_issues_default")
+        before = issue_aggregates(self.route_id)
+
+        self.assertGreaterEqual(archive.maintain(), 1)
+
+        self.assertEqual(self.partition_of(pk), f"access_issues_{later:%Y_%m}")
+        self.assertEqual(fetchone("SELECT count(*) FROM access_issues_default;")[0], 0)
+        self.assertEqual(issue_aggregates(self.route_id), before)
+        self.assertEqual(fetchone("SELECT count(*) FROM hex_cells_dirty;")[0], 0)
+        # The moved month is a partition like the others: new rows reach it
+        # through access_issues and fire the triggers.
+        insert_issue(self.route_id, "flooding", later)
+        self.assertEqual(cluster_sums()[18], 2)
+
+    def test_creates_the_coming_months(self):
+        archive.maintain(months_ahead=6)
+        months = {month for _, month in archive.partitions()}
+        this_month = date.today().replace(day=1)
+        for ahead in range(7):
+            index = this_month.year * 12 + this_month.month - 1 + ahead
+            self.assertIn(date(index // 12, index % 12 + 1, 1), months)
+        self.assertEqual(archive.maintain(months_ahead=6), 0)
+
+
+class ArchiveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.route_id = insert_route()
+
+    def test_takes_old_months_out(self):
+        this_month = date.today().replace(day=1)
+        old = date(this_month.year - 3, this_month.month, 1)
+        name = f"access_issues_{old:%Y_%m}"
+        with connection.cursor() as cur:
+            cur.execute("SELECT access_issues_ensure_partition(%s);", [old])
+        insert_issue(self.route_id, "blocked_ramp", datetime(old.year, old.month, 15, 12))
+        insert_issue(self.route_id, "flooding")
+        before = version("access_issues")
+
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, f"{name}.csv.gz")
+            self.assertEqual(archive.archive(root=root, dry_run=True), [(name, path, None)])
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(archive.archive(root=root), [(name, path, 1)])
+            with gzip.open(path, "rt", newline="") as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(os.listdir(root), [f"{name}.csv.gz"])
+        self.assertEqual([r["issue_type"] for r in rows], ["blocked_ramp"])
+
+        self.assertIsNone(fetchone("SELECT to_regclass(%s);", [name])[0])
+        self.assertEqual(
+            fetchone("SELECT open_issues, by_type FROM route_issue_summary WHERE route_id = %s;", [self.route_id]),
+            (1, {"flooding": 1}),
+        )
+        self.assertEqual(cluster_sums(), dict.fromkeys(range(19), 1))
+        self.assertEqual(hex_sums("open_issues"), dict.fromkeys(HEX_SIZES, 1))
+        self.assertEqual(version("access_issues"), before + 1)
+
+    def test_keep_tables(self):
+        this_month = date.today().replace(day=1)
+        old = date(this_month.year - 3, this_month.month, 1)
+        name = f"access_issues_{old:%Y_%m}"
+        with connection.cursor() as cur:
+            cur.execute("SELECT access_issues_ensure_partition(%s);", [old])
+        insert_issue(self.route_id, "blocked_ramp", datetime(old.year, old.month, 15, 12))
+
+        with tempfile.TemporaryDirectory() as root:
+            archive.archive(root=root, keep_tables=True)
+        # Still there, but no longer part of access_issues.
+        self.assertEqual(fetchone(f"SELECT count(*) FROM {name};")[0], 1)
+        self.assertEqual(fetchone("SELECT count(*) FROM access_issues;")[0], 0)
+        self.assertNotIn(name, [n for n, _ in archive.partitions()])
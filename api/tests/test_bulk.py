@@ -0,0 +1,116 @@
+import json
+from unittest import mock
+import unittest
+
+from django.test import RequestFactory, TestCase
+
+from .. import views
+from ..bulk import MAX_ID, apply_operations, parse_operations
+from ..hexcells import HEX_SIZES
+from .utils import LAT, LNG, fetchall, hex_sums, insert_playgrounds, version
+
+
+class ParseOperationsTests(unittest.TestCase):
+
+    def test_json(self):
+        ops = parse_operations(json.dumps({"operations": [
+            {"op": "create", "name": "Mount Street", "lat": 53.337, "lng": -6.244},
+            {"id": "12", "name": "Merrion Square"},
+            {"op": "delete", "id": 13},
+        ]}))
+        self.assertEqual([(o.op, o.id, o.error) for o in ops],
+                         [("create", None, None), ("update", 12, None), ("delete", 13, None)])
+        self.assertEqual((ops[0].lng, ops[0].lat, ops[0].source), (-6.244, 53.337, "Manual"))
+
+    def test_invalid_items(self):
+        ops = parse_operations(json.dumps([
+            {"id": 1.7, "name": "a"},
+            {"id": True, "name": "a"},
+            {"id": 0, "name": "a"},
+            {"op": "create", "lat": True, "lng": 1},
+            {"op": "create", "lat": 95, "lng": 1},
+            {"op": "update", "id": 4},
+            {"op": "move", "id": 5},
+            {"id": 6, "name": "a"},
+            {"op": "delete", "id": 6},
+            "x",
+        ]))
+        errors = [o.error for o in ops]
+        self.assertEqual(errors[:3], ["integer id required", "integer id required", "id out of range"])
+        self.assertTrue(errors[3].startswith("lat,lng must both be numbers"))
+        self.assertEqual(errors[4:], [
+            "lng/lat out of range",
+            "nothing to update: give name, source or lat/lng",
+            "op must be one of create, update, delete",
+            None,
+            "id appears more than once in the batch",
+            "operation must be an object",
+        ])
+
+    def test_geojsonseq(self):
+        body = "\n".join([
+            '\x1e{"type": "Feature", "properties": {"name": "A"}, "geometry": {"type": "Point", "coordinates": [-6.2, 53.3]}}',
+            '{"type": "Feature", "id": 9, "properties": {"op": "delete"}, "geometry": null}',
+            '{"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [-6.2]}}',
+            '{"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": []}}',
+        ])
+        ops = parse_operations(body)
+        self.assertEqual(ops[0][:7], (0, "create", None, "A", "Manual", -6.2, 53.3))
+        self.assertEqual((ops[1].op, ops[1].id, ops[1].error), ("delete", 9, None))
+        self.assertTrue(ops[2].error.startswith("feature required"))
+        self.assertTrue(ops[3].error.startswith("feature required"))
+
+    def test_not_a_batch(self):
+        for body, fmt in (("[]", None), ('{"name": "x"}', "json"), ("x", "csv")):
+            with self.subTest(body=body, fmt=fmt), self.assertRaises(ValueError):
+                parse_operations(body, fmt)
+        with mock.patch("api.bulk.MAX_OPERATIONS", 2), self.assertRaises(ValueError):
+            parse_operations(json.dumps([{"op": "delete", "id": i} for i in (1, 2, 3)]))
+
+
+class ApplyOperationsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kept, cls.gone = insert_playgrounds((LNG, LAT), (LNG + 0.001, LAT))
+
+    def test_apply(self):
+        before = version("playgrounds")
+        ops = parse_operations(json.dumps({"operations": [
+            {"op": "update", "id": self.kept, "name": "Renamed"},
+            {"op": "delete", "id": self.gone},
+            {"op": "create", "name": "New", "lat": LAT + 0.002, "lng": LNG + 0.002},
+            {"op": "delete", "id": MAX_ID},
+        ]}))
+        results = apply_operations(ops)
+
+        self.assertEqual(
+            [(r["index"], r["op"], r["status"]) for r in results],
+            [(0, "update", "updated"), (1, "delete", "deleted"), (2, "create", "created"), (3, "delete", "not_found")],
+        )
+        created = results[2]["id"]
+        rows = fetchall("SELECT id, name, source FROM playgrounds ORDER BY id;")
+        self.assertEqual(rows, [(self.kept, "Renamed", "test"), (created, "New", "Manual")])
+        # Three statements, one bump.
+        self.assertEqual(version("playgrounds"), before + 1)
+        self.assertEqual(hex_sums("playgrounds"), dict.fromkeys(HEX_SIZES, 2))
+
+    def test_move(self):
+        ops = parse_operations(json.dumps([{"id": self.kept, "lat": LAT, "lng": LNG + 0.75}]))
+        self.assertEqual(apply_operations(ops)[0]["status"], "updated")
+        moved = fetchall("SELECT ST_X(geom), name FROM playgrounds WHERE id = %s;", [self.kept])
+        self.assertEqual(moved, [(LNG + 0.75, "Test 1")])
+        self.assertEqual(hex_sums("playgrounds"), dict.fromkeys(HEX_SIZES, 2))
+
+    def test_nothing_applied(self):
+        before = version("playgrounds")
+        results = apply_operations(parse_operations(json.dumps([{"op": "delete", "id": MAX_ID}])))
+        self.assertEqual(results[0]["status"], "not_found")
+        self.assertEqual(version("playgrounds"), before)
+
+    def test_invalid_batch_applies_nothing(self):
+        body = json.dumps([{"id": self.kept, "name": "Renamed"}, {"op": "create", "name": "No position"}])
+        response = views.playgrounds_bulk(RequestFactory().post("/", body, content_type="application/json"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r["index"] for r in json.loads(response.content)["results"]], [1])
+        self.assertEqual(fetchall("SELECT name FROM playgrounds ORDER BY id;"), [("Test 1",), ("Test 2",)])
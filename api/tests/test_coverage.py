@@ -0,0 +1,52 @@
+import json
+
+from django.test import RequestFactory, TestCase
+
+from .. import coverage, views
+from .utils import LAT, LNG, insert_park, insert_playgrounds
+
+
+class CoverageGapsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # 3 km apart: the cells at either end are far from one or the other.
+        insert_park(LNG, LAT)
+        insert_playgrounds((LNG + 0.045, LAT))
+
+    def get(self, **params):
+        return views.coverage_gap_cells(RequestFactory().get("/", {"cell_m": 250, "max_m": 800, **params}))
+
+    def test_compute(self):
+        result = coverage.compute_gaps(250, 800, workers=1)
+        grid = result["grid"]
+        self.assertEqual(len(result["features"]), grid["cells"])
+        self.assertEqual(grid["cells"], grid["nx"] * grid["ny"])
+        properties = [f["properties"] for f in result["features"]]
+        self.assertTrue(any(p["no_park"] and not p["no_playground"] for p in properties))
+        self.assertTrue(any(p["no_playground"] and not p["no_park"] for p in properties))
+
+    def test_cached(self):
+        _, version, from_cache = coverage.coverage_gaps(250, 800, workers=1)
+        self.assertFalse(from_cache)
+        self.assertEqual(coverage.coverage_gaps(250, 800, workers=1)[1:], (version, True))
+        self.assertFalse(coverage.coverage_gaps(250, 800, workers=1, refresh=True)[2])
+
+    def test_view_serves_only_the_cache(self):
+        self.assertEqual(self.get().status_code, 202)
+
+        _, version, _ = coverage.coverage_gaps(250, 800, workers=1)
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertEqual((body["data_version"], body["cached"], body["stale"]), (version, True, False))
+
+        # Served as it was, marked stale, until the command runs again.
+        insert_playgrounds((LNG, LAT))
+        body = json.loads(self.get().content)
+        self.assertEqual((body["data_version"], body["stale"]), (version, True))
+        self.assertNotEqual(body["current_version"], version)
+
+    def test_unsupported_grid(self):
+        self.assertEqual(self.get(cell_m=100).status_code, 400)
+        self.assertEqual(self.get(max_m="x").status_code, 400)
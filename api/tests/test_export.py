@@ -0,0 +1,42 @@
+import unittest
+
+from ..export import _changed_boxes, _tile_range, _tiles_touching
+
+OLD_BOX = (-6.27, 53.34, -6.26, 53.35)
+NEW_BOX = (-6.25, 53.34, -6.24, 53.35)
+
+
+class ChangedBoxesTests(unittest.TestCase):
+
+    def fingerprints(self, **tables):
+        return {"parks": {}, "walking_routes": {}, "playgrounds": {}, **tables}
+
+    def test_unchanged(self):
+        features = self.fingerprints(parks={1: ("a", *OLD_BOX)})
+        self.assertEqual(list(_changed_boxes(features, features)), [])
+
+    def test_changed_added_and_removed(self):
+        before = self.fingerprints(parks={1: ("a", *OLD_BOX), 2: ("b", *OLD_BOX)})
+        after = self.fingerprints(parks={1: ("c", *NEW_BOX)}, playgrounds={3: ("d", *NEW_BOX)})
+        # A moved feature dirties the tiles it left as well as the ones it reached.
+        self.assertCountEqual(list(_changed_boxes(before, after)), [OLD_BOX, NEW_BOX, OLD_BOX, NEW_BOX])
+
+    def test_table_new_to_the_index(self):
+        before = {"parks": {}}
+        after = self.fingerprints(walking_routes={1: ("a", *NEW_BOX)})
+        self.assertEqual(list(_changed_boxes(before, after)), [NEW_BOX])
+
+
+class TilesTouchingTests(unittest.TestCase):
+
+    def test_zoom_range(self):
+        tiles = _tiles_touching([OLD_BOX], 10, 12)
+        self.assertEqual({z for z, _, _ in tiles}, {10, 11, 12})
+        self.assertEqual(tiles, sorted(tiles))
+        for z in (10, 11, 12):
+            with self.subTest(z=z):
+                self.assertTrue(set(_tile_range(*OLD_BOX, z)) <= set(tiles))
+
+    def test_point_on_a_tile_edge(self):
+        # lng 0 is the edge between x 0 and 1 at zoom 1; both tiles draw it.
+        self.assertEqual(_tiles_touching([(0.0, 10.0, 0.0, 10.0)], 1, 1), [(1, 0, 0), (1, 1, 0)])
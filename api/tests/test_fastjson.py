@@ -0,0 +1,43 @@
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+import json
+import unittest
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .. import fastjson
+from ..fastjson import FastJsonResponse
+
+VALUES = {
+    "utc": datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+    "offset": datetime(2024, 5, 1, 12, 30, 15, 999999, tzinfo=timezone(timedelta(hours=1))),
+    "naive": datetime(2024, 5, 1, 12, 30, 15, 120000),
+    "whole_second": datetime(2024, 5, 1, 12, 30, 15, tzinfo=timezone.utc),
+    "date": date(2024, 5, 1),
+    "time": time(12, 30, 15, 123456),
+    "decimal": Decimal("1.50"),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "jsonb": {"flooding": 1},
+}
+
+
+class DumpsTests(unittest.TestCase):
+
+    def expected(self):
+        return json.loads(DjangoJSONEncoder().encode(VALUES))
+
+    def test_matches_django_encoder(self):
+        self.assertIsNotNone(fastjson.orjson)
+        self.assertEqual(json.loads(fastjson.dumps(VALUES)), self.expected())
+
+    def test_stdlib_fallback(self):
+        # What dumps() does without orjson.
+        self.assertEqual(json.loads(json.dumps(VALUES, default=fastjson._default)), self.expected())
+
+    def test_format(self):
+        body = json.loads(FastJsonResponse({"at": VALUES["utc"]}).content)
+        self.assertEqual(body, {"at": "2024-05-01T12:30:15.123Z"})
+
+    def test_bytes(self):
+        self.assertEqual(json.loads(fastjson.dumps({"b": memoryview(b"abc")})), {"b": "abc"})
@@ -0,0 +1,66 @@
+from django.test import TestCase
+
+from .. import geoprep
+from ..hexcells import HEX_SIZES
+from .utils import LAT, LNG, fetchall, fetchone, hex_sums, version
+
+RING = [[LNG, LAT], [LNG + 0.002, LAT], [LNG + 0.002, LAT + 0.001], [LNG, LAT + 0.001], [LNG, LAT]]
+BOWTIE = [[LNG, LAT], [LNG + 0.002, LAT + 0.001], [LNG + 0.002, LAT], [LNG, LAT + 0.001], [LNG, LAT]]
+
+
+class LoadTests(TestCase):
+
+    def test_parks(self):
+        features = [
+            (("Square", "Park", None, ["playground"]), {"type": "Polygon", "coordinates": [RING]}),
+            (("Bowtie", "Park", None, []), {"type": "Polygon", "coordinates": [BOWTIE]}),
+            (("Path", "Park", None, []), {"type": "LineString", "coordinates": RING[:2]}),
+            (("Nothing", "Park", None, []), None),
+            (("Broken", "Park", None, []), "{not geojson"),
+        ]
+        before = version("parks")
+        report = geoprep.load("parks", features, batch_size=2)
+
+        counts = report.as_dict()["parks"]
+        self.assertEqual((counts["read"], counts["written"], counts["repaired"]), (5, 2, 1))
+        self.assertEqual(counts["dropped"], {"wrong geometry type": 1, "no geometry": 1, "unparseable": 1})
+        rows = fetchall("""
+          SELECT name, amenities, GeometryType(geom), area_m2 > 0, abs(area_ha * 10000 - area_m2) < 1e-6
+          FROM parks ORDER BY id;
+        """)
+        self.assertEqual(rows, [
+            ("Square", ["playground"], "MULTIPOLYGON", True, True),
+            ("Bowtie", [], "MULTIPOLYGON", True, True),
+        ])
+        self.assertGreater(version("parks"), before)
+
+        # Each park's area is shared out over the cells it covers, in full.
+        total = fetchone("SELECT sum(area_m2) FROM parks;")[0]
+        areas = hex_sums("park_area_m2")
+        self.assertEqual(set(areas), set(HEX_SIZES))
+        for size, area in areas.items():
+            with self.subTest(size=size):
+                self.assertAlmostEqual(area, total, delta=1)
+        self.assertEqual(fetchone("SELECT count(*) FROM hex_cells_dirty;")[0], 0)
+
+    def test_routes(self):
+        duplicated = [[LNG, LAT], [LNG, LAT], [LNG + 0.001, LAT], [LNG + 0.001, LAT + 0.001]]
+        features = [
+            (("Footway", "test", "paved", "good", True), {"type": "LineString", "coordinates": duplicated}),
+            # A polygon for a line layer is kept as its outline.
+            (("Loop", "test", None, None, None), {"type": "Polygon", "coordinates": [RING]}),
+            (("Dot", "test", None, None, None), {"type": "Point", "coordinates": [LNG, LAT]}),
+        ]
+        report = geoprep.load("walking_routes", features)
+
+        counts = report.as_dict()["walking_routes"]
+        self.assertEqual((counts["written"], counts["coerced"], counts["vertices_removed"]), (2, 1, 1))
+        self.assertEqual(counts["dropped"], {"wrong geometry type": 1})
+        rows = fetchall("SELECT name, GeometryType(geom), length_m > 0 FROM walking_routes ORDER BY id;")
+        self.assertEqual(rows, [("Footway", "MULTILINESTRING", True), ("Loop", "MULTILINESTRING", True)])
+
+    def test_replace(self):
+        geoprep.load("playgrounds", [(("Old", "test"), {"type": "Point", "coordinates": [LNG, LAT]})])
+        geoprep.load("playgrounds", [(("New", "test"), {"type": "Point", "coordinates": [LNG, LAT]})], replace=True)
+        self.assertEqual(fetchall("SELECT name FROM playgrounds;"), [("New",)])
+        self.assertEqual(hex_sums("playgrounds"), dict.fromkeys(HEX_SIZES, 1))
@@ -0,0 +1,71 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+
+from .. import hexcells
+from ..hexcells import HEX_SIZES, size_for_zoom
+from .utils import LAT, LNG, fetchall, fetchone, hex_sums, insert_issue, insert_park, insert_playgrounds, insert_route
+
+CELLS_SQL = """
+  SELECT size, i, j, round(park_area_m2), round(route_length_m), round(accessible_length_m), playgrounds, open_issues
+  FROM hex_cells ORDER BY size, i, j;
+"""
+
+
+class SizeForZoomTests(unittest.TestCase):
+
+    def test_sizes(self):
+        for zoom, size in ((0, 8000), (10, 8000), (11, 2000), (12, 2000), (13, 500), (19, 500)):
+            with self.subTest(zoom=zoom):
+                self.assertEqual(size_for_zoom(zoom), size)
+
+
+class HexCellsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        insert_park(LNG, LAT)
+        insert_issue(insert_route(), "flooding")
+        insert_playgrounds((LNG, LAT), (LNG + 0.01, LAT))
+
+    def test_rebuild_matches_the_triggers(self):
+        cells = fetchall(CELLS_SQL)
+        hexcells.rebuild()
+        self.assertEqual(fetchall(CELLS_SQL), cells)
+
+    def test_deferred_refresh(self):
+        with connection.cursor() as cur, hexcells.deferred_refresh(cur):
+            insert_playgrounds((LNG + 0.02, LAT))
+            self.assertEqual(hex_sums("playgrounds"), dict.fromkeys(HEX_SIZES, 2))
+            self.assertGreater(fetchone("SELECT count(*) FROM hex_cells_dirty;")[0], 0)
+        self.assertEqual(hex_sums("playgrounds"), dict.fromkeys(HEX_SIZES, 3))
+        self.assertEqual(fetchone("SELECT count(*) FROM hex_cells_dirty;")[0], 0)
+
+
+class HexEdgeTests(TestCase):
+
+    def test_counted_in_the_cells_they_were_queued_for(self):
+        # Half a unit inside the middle of each edge of a large hexagon,
+        # where its slanted edges transformed to EPSG:4326 are a few units
+        # from the EPSG:3857 ones.
+        fetchall("""
+          WITH hex AS (
+            SELECT ST_ExteriorRing(ST_Hexagon(8000, g.i, g.j, ST_SetSRID(ST_MakePoint(0, 0), 3857))) AS ring
+            FROM ST_HexagonGrid(8000, ST_Transform(ST_SetSRID(ST_MakePoint(%s, %s), 4326), 3857)) g
+            LIMIT 1
+          ), edges AS (
+            SELECT ST_LineInterpolatePoint(ST_MakeLine(ST_PointN(ring, n), ST_PointN(ring, n + 1)), 0.5) AS mid,
+                   ST_Centroid(ST_MakePolygon(ring)) AS centre
+            FROM hex, generate_series(1, 6) AS n
+          )
+          INSERT INTO playgrounds (name, source, geom)
+          SELECT 'Test edge', 'test',
+                 ST_Transform(ST_LineInterpolatePoint(ST_MakeLine(mid, centre), 0.5 / ST_Distance(mid, centre)), 4326)
+          FROM edges
+          RETURNING id;
+        """, [LNG, LAT])
+        queued = fetchall("SELECT DISTINCT c.size, c.i, c.j FROM playgrounds p, hex_cells_of(p.geom) c ORDER BY 1, 2, 3;")
+        counted = fetchall("SELECT size, i, j FROM hex_cells WHERE playgrounds > 0 ORDER BY 1, 2, 3;")
+        self.assertEqual(counted, queued)
+        self.assertEqual(hex_sums("playgrounds"), dict.fromkeys(HEX_SIZES, 6))
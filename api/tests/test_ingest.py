@@ -0,0 +1,139 @@
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import unittest
+
+from django.test import TestCase
+
+from .. import amenities
+from ..geoprep import WKB
+from ..ingest import detect_format, gpkg_geometry, ingest, map_features, read_features, route_accessibility
+from .utils import LAT, LNG, fetchall
+
+POINT = {"type": "Point", "coordinates": [LNG, LAT]}
+
+
+class GpkgGeometryTests(unittest.TestCase):
+    WKB_POINT = struct.pack("<BIdd", 1, 1, -6.26, 53.35)
+
+    def blob(self, flags, srid, envelope=b"", order="<"):
+        return b"GP\x00" + bytes([flags]) + struct.pack(order + "i", srid) + envelope + self.WKB_POINT
+
+    def test_little_endian_with_envelope(self):
+        blob = self.blob(0x01 | 1 << 1, 2157, envelope=bytes(32))
+        self.assertEqual(gpkg_geometry(blob, 4326), WKB(self.WKB_POINT, 2157))
+
+    def test_big_endian_header(self):
+        self.assertEqual(gpkg_geometry(self.blob(0x00, 29902, order=">"), 4326), WKB(self.WKB_POINT, 29902))
+
+    def test_empty_geometry(self):
+        self.assertIsNone(gpkg_geometry(self.blob(0x01 | 0x10, 4326), 4326))
+
+    def test_unknown_envelope_is_left_to_geoprep(self):
+        self.assertEqual(gpkg_geometry(self.blob(0x01 | 5 << 1, 4326), 2157), WKB(b"", 2157))
+
+    def test_plain_wkb_and_non_binary(self):
+        self.assertEqual(gpkg_geometry(memoryview(self.WKB_POINT), 2157), WKB(self.WKB_POINT, 2157))
+        self.assertEqual(gpkg_geometry('{"type": "Point"}', 4326), '{"type": "Point"}')
+        self.assertIsNone(gpkg_geometry(None, 4326))
+
+
+class SourceTests(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def path(self, name, text=None):
+        path = os.path.join(self.dir, name)
+        if text is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return path
+
+    def test_geojson(self):
+        path = self.path("parks.geojson", json.dumps({"type": "FeatureCollection", "features": [
+            {"type": "Feature", "properties": {"name": "A", "area": 1.5}, "geometry": POINT},
+            {"type": "Feature", "properties": None, "geometry": None},
+        ]}))
+        self.assertEqual(list(read_features(path)), [({"name": "A", "area": 1.5}, POINT), ({}, None)])
+
+    def test_geojsonseq(self):
+        path = self.path("parks.geojsonl", "\n".join([
+            "\x1e" + json.dumps({"type": "Feature", "properties": {"name": "A"}, "geometry": POINT}),
+            "",
+            json.dumps(POINT),
+            "{not json",
+        ]))
+        self.assertEqual(list(read_features(path)), [({"name": "A"}, POINT), ({}, POINT), ({}, "{not json")])
+
+    def test_sqlite_table(self):
+        path = self.path("routes.sqlite")
+        wkb = struct.pack("<BIdd", 1, 1, LNG, LAT)
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE ways (name TEXT, geometry BLOB);")
+            conn.execute("INSERT INTO ways VALUES ('A', ?);", [wkb])
+        conn.close()
+        self.assertEqual(list(read_features(path, table="ways")), [({"name": "A"}, WKB(wkb, 4326))])
+        with self.assertRaises(ValueError):
+            list(read_features(path))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            detect_format("parks.shp")
+
+
+class MappingTests(unittest.TestCase):
+
+    def test_parks(self):
+        features = [({"Name": "A", "Typology": "Park", "Area_Ha": "2.5", "Playground": "Yes", "Toilets": "No"}, POINT)]
+        self.assertEqual(list(map_features("parks", features)), [(("A", "Park", 2.5, ["playground"]), POINT)])
+
+    def test_overrides(self):
+        features = [({"name": "A"}, POINT)]
+        self.assertEqual(
+            list(map_features("playgrounds", features, {"source": "council"})),
+            [(("A", "council"), POINT)],
+        )
+
+    def test_route_accessibility(self):
+        for props, expected in (
+            ({"is_accessible": "yes", "surface": "gravel"}, True),
+            ({"surface": "asphalt", "smoothness": "good"}, True),
+            ({"surface": "asphalt", "smoothness": "bad"}, False),
+            ({}, None),
+        ):
+            with self.subTest(props=props):
+                self.assertEqual(route_accessibility(props), expected)
+
+
+class IngestTests(TestCase):
+
+    def tearDown(self):
+        amenities.index.state = None
+
+    def test_parks(self):
+        square = {"type": "Polygon", "coordinates": [[
+            [LNG, LAT], [LNG + 0.002, LAT], [LNG + 0.002, LAT + 0.001], [LNG, LAT + 0.001], [LNG, LAT],
+        ]]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "parks.geojsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                for name, playground in (("A", "Yes"), ("B", "No")):
+                    f.write(json.dumps({"type": "Feature", "properties": {"Name": name, "Playground": playground},
+                                        "geometry": square}) + "\n")
+            report = ingest("parks", path)
+
+        self.assertEqual(report.as_dict()["parks"]["written"], 2)
+        rows = fetchall("SELECT id, name, amenities FROM parks ORDER BY id;")
+        self.assertEqual([r[1:] for r in rows], [("A", ["playground"]), ("B", [])])
+        # The bitsets are rebuilt from the new rows straight away.
+        state, matched = amenities.index.match(["playground"])
+        self.assertEqual(amenities.index.ids(state, matched), [rows[0][0]])
+
+    def test_unknown_layer(self):
+        with self.assertRaises(ValueError):
+            ingest("benches", "benches.geojson")
@@ -0,0 +1,82 @@
+import unittest
+
+from django.test import TestCase
+
+from ..nearest import Origin, csv_rows, nearest_playgrounds, parse_origins
+from .utils import LAT, LNG, insert_playgrounds
+
+
+class ParseOriginsTests(unittest.TestCase):
+
+    def test_csv(self):
+        origins = list(parse_origins(["id,lat,lng", "a,53.35,-6.26", "b,north,-6.2", ",53.3,-6.1"]))
+        self.assertEqual(origins[0], Origin(2, "a", -6.26, 53.35, None))
+        self.assertIsNone(origins[1].lng)
+        self.assertTrue(origins[1].error.startswith("lat,lng required"))
+        self.assertEqual(origins[2].ref, "3")  # no id: numbered by data row
+
+    def test_geojsonseq_is_guessed(self):
+        lines = [
+            '\x1e{"type": "Feature", "id": 7, "geometry": {"type": "Point", "coordinates": [-6.2, 53.3]}}',
+            "",
+            '{"type": "Point", "coordinates": [-6.1, 53.4]}',
+            '{"type": "Feature", "geometry": {"type": "Point", "coordinates": []}}',
+        ]
+        origins = list(parse_origins(lines))
+        self.assertEqual(origins[0], Origin(1, 7, -6.2, 53.3, None))
+        self.assertEqual(origins[1], Origin(3, 3, -6.1, 53.4, None))
+        self.assertEqual(origins[2].line, 4)
+        self.assertIsNotNone(origins[2].error)
+
+    def test_bad_properties(self):
+        lines = [
+            '{"type": "Feature", "properties": "x", "geometry": {"type": "Point", "coordinates": [-6.2, 53.3]}}',
+            '{"type": "Feature", "properties": [1], "geometry": {"type": "Point", "coordinates": [-6.2, 53.3]}}',
+            '[1, 2]',
+        ]
+        origins = list(parse_origins(lines, fmt="geojsonseq"))
+        self.assertEqual([o.line for o in origins], [1, 2, 3])
+        self.assertTrue(all(o.error for o in origins))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            parse_origins(["lat,lng"], fmt="kml")
+
+    def test_csv_rows_keep_every_origin(self):
+        rows = list(csv_rows([
+            {"ref": "a", "lat": 53.3, "lng": -6.2, "nearest": [{"id": 1, "name": "P", "meters": 12.5}]},
+            {"ref": "b", "lat": 53.4, "lng": -6.1, "nearest": []},
+            {"line": 4, "ref": "c", "error": "lat,lng required"},
+        ]))
+        self.assertEqual(rows, [
+            ["a", 53.3, -6.2, 1, 1, "P", 12.5, ""],
+            ["b", 53.4, -6.1, "", "", "", "", ""],
+            ["c", "", "", "", "", "", "", "lat,lng required"],
+        ])
+
+
+class NearestPlaygroundsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # About 70 m and 200 m east of LNG, LAT.
+        cls.near, cls.far = insert_playgrounds((LNG + 0.001, LAT), (LNG + 0.003, LAT))
+
+    def test_ranked_per_origin(self):
+        origins = list(parse_origins([
+            "id,lat,lng",
+            f"west,{LAT},{LNG - 0.01}",
+            "broken,north,-6.2",
+            f"east,{LAT},{LNG + 0.004}",
+        ]))
+        results = list(nearest_playgrounds(origins, k=2, chunk_size=2, workers=1))
+
+        self.assertEqual([r["ref"] for r in results], ["west", "broken", "east"])
+        self.assertEqual([p["id"] for p in results[0]["nearest"]], [self.near, self.far])
+        self.assertEqual([p["id"] for p in results[2]["nearest"]], [self.far, self.near])
+        self.assertAlmostEqual(results[2]["nearest"][0]["meters"], 66, delta=2)
+        self.assertTrue(results[1]["error"].startswith("lat,lng required"))
+
+    def test_fewer_playgrounds_than_k(self):
+        origins = [Origin(1, "a", LNG, LAT, None)]
+        self.assertEqual(len(next(nearest_playgrounds(origins, k=50, workers=1))["nearest"]), 2)
@@ -0,0 +1,380 @@
+"""
+Query-plan regression tests for the read statements in api/views.py and for
+the admin changelists (api/admin_scale.py).
+
+The bundled data/*.geojson is loaded together with translated copies of it,
+synthetic footways and synthetic access issues, so every table is big enough
+that a sequential scan loses to an index. Each view is then called with
+views._fetchall swapped for a recorder. That captures exactly the statement
+and parameters the view would run, and each one is EXPLAINed. A test fails
+when a statement stops using its index, scans a large table sequentially, or
+expects to read far more rows than it returns.
+"""
+from datetime import date, timedelta
+import json
+import os
+import re
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import amenities, fastpath, views
+from ..admin_scale import DISTINCT_SQL, FACET_LIMIT, HAS_NULL_SQL
+from ..archive import PARTITION_RE
+from ..bulk import DELETE_SQL, UPDATE_SQL
+from ..models import AccessIssue, WalkingRoute
+from ..nearest import NEAREST_SQL
+from .utils import LAT, LNG
+
+PARK_COPIES = 20
+PLAYGROUND_COPIES = 50
+SYNTHETIC_ROUTES = 20000
+SYNTHETIC_ISSUES = 3000
+
+# Copies are shifted by whole multiples of the bundled data's extent, so the
+# test point still sees the original density.
+COPY_DX, COPY_DY, COPIES_PER_ROW = 0.35, 0.25, 5
+
+# A sequential scan over any of these fails the test. Partitions count as
+# their parent table.
+LARGE_TABLES = ("parks", "playgrounds", "walking_routes", "access_issues", "access_issue_clusters", "hex_cells")
+
+INDEX_NODES = ("Index Scan", "Index Only Scan", "Bitmap Heap Scan")
+
+# Views that run no SQL of their own through _fetchall.
+NOT_PLANNED = {"health", "ready"}
+
+
+# Columns the admin lists filter values for (CachedValuesFilter).
+FACET_COLUMNS = (
+    ("walking_routes", "source"),
+    ("walking_routes", "surface"),
+    ("walking_routes", "smoothness"),
+    ("access_issues", "issue_type"),
+)
+
+
+class _AdminUser:
+    is_active = is_staff = is_superuser = True
+
+    def has_perm(self, perm, obj=None):
+        return True
+
+
+def _load_features(path):
+    with open(os.path.join(settings.BASE_DIR, "data", path), encoding="utf-8") as f:
+        return json.dumps(json.load(f)["features"])
+
+
+def _geometry_type(table):
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT upper(type) FROM geometry_columns WHERE f_table_name = %s AND f_geometry_column = 'geom';",
+            [table],
+        )
+        row = cur.fetchone()
+    return row[0] if row else "GEOMETRY"
+
+
+def _load_fixtures():
+    routes_geom = "ST_SetSRID(ST_MakeLine(ST_MakePoint(x, y), ST_MakePoint(x + 0.0012, y + 0.0007)), 4326)"
+    if _geometry_type("walking_routes").startswith("MULTI"):
+        routes_geom = f"ST_Multi({routes_geom})"
+
+    with connection.cursor() as cur:
+        cur.execute("SELECT setseed(0.42);")
+        cur.execute("""
+          INSERT INTO parks (name, category, area_ha, amenities, geom)
+          SELECT f->'properties'->>'Name',
+                 f->'properties'->>'Typology',
+                 (f->'properties'->>'Area_mSq')::float8 / 10000,
+                 ARRAY(
+                   SELECT a.key FROM jsonb_each_text(%s::jsonb) a
+                   WHERE lower(trim(f->'properties'->>a.value)) <> ALL(%s)
+                   ORDER BY a.key
+                 ),
+                 ST_Multi(ST_SetSRID(ST_GeomFromGeoJSON(f->>'geometry'), 4326))
+          FROM jsonb_array_elements(%s::jsonb) f
+          WHERE f->'geometry' IS NOT NULL AND f->'geometry' <> 'null'::jsonb;
+        """, [json.dumps(amenities.AMENITIES), list(amenities.ABSENT), _load_features("dcc_parks.geojson")])
+        cur.execute("""
+          INSERT INTO playgrounds (name, source, geom)
+          SELECT COALESCE(f->'properties'->>'name', 'Playground'), 'plan-test',
+                 ST_SetSRID(ST_GeomFromGeoJSON(f->>'geometry'), 4326)
+          FROM jsonb_array_elements(%s::jsonb) f
+          WHERE f->'geometry'->>'type' = 'Point';
+        """, [_load_features("osm_playgrounds.geojson")])
+
+        for table, columns, copies in (
+            ("parks", "name, category, area_ha, amenities", PARK_COPIES),
+            ("playgrounds", "name, source", PLAYGROUND_COPIES),
+        ):
+            cur.execute(f"""
+              INSERT INTO {table} ({columns}, geom)
+              SELECT {columns},
+                     ST_Translate(geom, (c %% %s) * %s, (c / %s) * %s)
+              FROM {table}, generate_series(1, %s) c;
+            """, [COPIES_PER_ROW, COPY_DX, COPIES_PER_ROW, COPY_DY, copies - 1])
+
+        cur.execute(f"""
+          INSERT INTO walking_routes (name, source, surface, smoothness, is_accessible, geom)
+          SELECT 'Footway ' || g, 'plan-test',
+                 (ARRAY['asphalt', 'paved', 'gravel', 'grass'])[1 + g %% 4],
+                 (ARRAY['good', 'excellent', 'bad'])[1 + g %% 3],
+                 g %% 4 < 2 AND g %% 3 < 2,
+                 {routes_geom}
+          FROM (
+            SELECT g, -6.45 + random() * %s AS x, 53.25 + random() * %s AS y
+            FROM generate_series(1, %s) g
+          ) s;
+        """, [COPY_DX * COPIES_PER_ROW, COPY_DY * 4, SYNTHETIC_ROUTES])
+
+        # Monthly partitions for the synthetic issues, as archive_access_issues keeps them.
+        cur.execute("""
+          SELECT access_issues_ensure_partitions(
+            (now() - interval '730 days')::timestamp, now()::timestamp + interval '1 month'
+          );
+        """)
+        cur.execute("""
+          INSERT INTO access_issues (route_id, issue_type, description, created_at, geom)
+          SELECT r.id,
+                 (ARRAY['blocked_ramp', 'broken_surface', 'no_dropped_kerb', 'flooding'])[1 + r.id %% 4],
+                 'plan test',
+                 now() - random() * interval '730 days',
+                 ST_Centroid(r.geom)
+          FROM walking_routes r
+          WHERE r.source = 'plan-test'
+          ORDER BY random()
+          LIMIT %s;
+        """, [SYNTHETIC_ISSUES])
+
+        for table in LARGE_TABLES + ("route_issue_summary",):
+            cur.execute(f"ANALYZE {table};")
+
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _base_table(relation):
+    for table in LARGE_TABLES:
+        if relation == table or relation.startswith(table + "_"):
+            return table
+    return relation
+
+
+def explain(sql, params):
+    with connection.cursor() as cur:
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql.strip().rstrip(";"), params)
+        plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        _load_fixtures()
+        with connection.cursor() as cur:
+            cur.execute("""
+              SELECT id FROM parks
+              ORDER BY geom <-> ST_SetSRID(ST_MakePoint(%s, %s), 4326) LIMIT 1;
+            """, [LNG, LAT])
+            cls.park_id = cur.fetchone()[0]
+            cur.execute("SELECT id FROM playgrounds ORDER BY id DESC LIMIT 1;")
+            cls.playground_id = cur.fetchone()[0]
+        cls.factory = RequestFactory()
+
+    def tearDown(self):
+        # The bitsets would outlive the rows they were built from.
+        amenities.index.state = None
+
+    def capture(self, view, params=None, *args):
+        """The (sql, params) statements view runs for a GET with params."""
+        captured = []
+
+        def record(sql, sql_params, using=None):
+            captured.append((sql, list(sql_params)))
+            return []
+
+        with mock.patch.object(views, "_fetchall", record), \
+                mock.patch.object(views.warm, "search", return_value=None):
+            response = view(self.factory.get("/", params or {}), *args)
+        self.assertLess(response.status_code, 500)
+        self.assertTrue(captured, f"{view.__name__} ran no statement")
+        return captured
+
+    def assertPlan(self, sql, params, indexed, max_rows):
+        """
+        The plan reaches every table in `indexed` through an index, never
+        scans a large table sequentially, and no scan of a large table
+        expects more than max_rows rows.
+        """
+        plan = explain(sql, params)
+        nodes = list(_nodes(plan))
+        by_index = {
+            _base_table(n["Relation Name"])
+            for n in nodes if n["Node Type"] in INDEX_NODES and "Relation Name" in n
+        }
+        for table in indexed:
+            self.assertIn(table, by_index, f"{table} not read through an index:\n{json.dumps(plan, indent=1)}")
+        for n in nodes:
+            relation = n.get("Relation Name")
+            if relation is None or _base_table(relation) not in LARGE_TABLES:
+                continue
+            self.assertNotEqual(
+                n["Node Type"], "Seq Scan",
+                f"sequential scan on {relation}:\n{json.dumps(plan, indent=1)}",
+            )
+            self.assertLessEqual(
+                n["Plan Rows"], max_rows,
+                f"{n['Node Type']} on {relation} expects {n['Plan Rows']} rows (limit {max_rows})",
+            )
+
+    def assertViewPlans(self, view, params, indexed, max_rows, *args):
+        for sql, sql_params in self.capture(view, params, *args):
+            with self.subTest(view=view.__name__):
+                self.assertPlan(sql, sql_params, indexed, max_rows)
+
+    def point(self, **extra):
+        return {"lat": str(LAT), "lng": str(LNG), **extra}
+
+    def test_every_read_view_is_covered(self):
+        covered = {name[len("test_"):] for name in dir(self) if name.startswith("test_")}
+        for view in fastpath.PUBLIC_READ_VIEWS:
+            if view.__name__ not in NOT_PLANNED:
+                self.assertIn(view.__name__, covered, f"no plan test for {view.__name__}")
+
+    def test_parks_within(self):
+        self.assertViewPlans(views.parks_within, self.point(radius_m="2000"), {"parks"}, 1000)
+
+    def test_parks_within_amenities(self):
+        params = self.point(radius_m="2000", amenities="playground,leisure_walks", facets="true")
+        with self.subTest(index="gin"), mock.patch.object(amenities.index, "snapshot", return_value=None):
+            self.assertViewPlans(views.parks_within, params, {"parks"}, 1000)
+        amenities.index.load()
+        with self.subTest(index="bitsets"):
+            self.assertViewPlans(views.parks_within, params, {"parks"}, 1000)
+
+    def test_playgrounds_nearest(self):
+        self.assertViewPlans(views.playgrounds_nearest, self.point(limit="10"), {"playgrounds"}, 1000)
+
+    def test_routes_intersecting_park(self):
+        self.assertViewPlans(
+            views.routes_intersecting_park, {"park_id": str(self.park_id)},
+            {"parks", "walking_routes"}, 2000,
+        )
+
+    def test_routes_within(self):
+        self.assertViewPlans(views.routes_within, self.point(radius_m="1000"), {"walking_routes"}, 2000)
+
+    def test_park_containing_point(self):
+        self.assertViewPlans(views.park_containing_point, self.point(), {"parks"}, 1000)
+
+    def test_parks_search(self):
+        # Trigram indexes need at least three characters.
+        self.assertViewPlans(views.parks_search, {"q": "Stephen"}, {"parks"}, 1000)
+
+    def test_parks_search_amenities(self):
+        self.assertViewPlans(views.parks_search, {"q": "Stephen", "amenities": "leisure_walks"}, {"parks"}, 1000)
+
+    def test_playgrounds_search(self):
+        self.assertViewPlans(views.playgrounds_search, {"q": "Markievicz"}, {"playgrounds"}, 1000)
+
+    def test_playground_get(self):
+        self.assertViewPlans(views.playground_get, None, {"playgrounds"}, 1, self.playground_id)
+
+    def test_accessible_routes_within(self):
+        self.assertViewPlans(
+            views.accessible_routes_within, self.point(radius_m="1000", accessible_only="true"),
+            {"walking_routes"}, 2000,
+        )
+
+    def test_worst_routes(self):
+        self.assertViewPlans(views.worst_routes, {"limit": "50"}, {"walking_routes"}, 500)
+
+    def test_access_issues_near(self):
+        self.assertViewPlans(views.access_issues_near, self.point(radius_m="500"), {"access_issues"}, 1000)
+
+    def test_access_issues_near_recent(self):
+        params = self.point(radius_m="500", since_days="30")
+        window_start = (date.today() - timedelta(days=30)).replace(day=1)
+        for sql, sql_params in self.capture(views.access_issues_near, params):
+            self.assertPlan(sql, sql_params, {"access_issues"}, 1000)
+            for node in _nodes(explain(sql, sql_params)):
+                m = PARTITION_RE.match(node.get("Relation Name", ""))
+                if m:
+                    month = date(int(m.group(1)), int(m.group(2)), 1)
+                    self.assertGreaterEqual(month, window_start, f"{m.group(0)} not pruned")
+
+    def test_access_issue_clusters(self):
+        bbox = f"{LNG - 0.05},{LAT - 0.03},{LNG + 0.05},{LAT + 0.03}"
+        self.assertViewPlans(
+            views.access_issue_clusters, {"zoom": "14", "bbox": bbox},
+            {"access_issue_clusters"}, 5000,
+        )
+
+    def test_hex_cells(self):
+        bbox = f"{LNG - 0.2},{LAT - 0.1},{LNG + 0.2},{LAT + 0.1}"
+        for zoom in ("9", "12", "14"):
+            with self.subTest(zoom=zoom):
+                self.assertViewPlans(views.hex_cells, {"zoom": zoom, "bbox": bbox}, {"hex_cells"}, views.HEX_MAX_CELLS)
+
+    def test_nearest_batch(self):
+        origins = [(i, LNG + i * 0.01, LAT + (i % 7) * 0.005) for i in range(200)]
+        self.assertPlan(
+            NEAREST_SQL,
+            [[o[0] for o in origins], [o[1] for o in origins], [o[2] for o in origins], 3],
+            {"playgrounds"}, 1000,
+        )
+
+    def test_bulk_update_delete(self):
+        # EXPLAIN without ANALYZE plans the writes without running them.
+        ids = list(range(1, 2001, 10))
+        ords = list(range(len(ids)))
+        nulls = [None] * len(ids)
+        self.assertPlan(UPDATE_SQL, [ords, ids, ["Renamed"] * len(ids), nulls, nulls, nulls], {"playgrounds"}, 1000)
+        self.assertPlan(DELETE_SQL, [ords, ids], {"playgrounds"}, 1000)
+
+    def assertChangelistPlans(self, model, params, indexed, max_rows):
+        """Every statement the admin changelist for model runs with params."""
+        request = self.factory.get("/admin/", params)
+        request.user = _AdminUser()
+        with CaptureQueriesContext(connection) as queries:
+            admin.site._registry[model].get_changelist_instance(request)
+        statements = [
+            q["sql"] for q in queries.captured_queries
+            if q["sql"].lstrip().upper().startswith(("SELECT", "WITH"))
+            and re.search(rf'FROM "?{model._meta.db_table}"?\b', q["sql"])
+        ]
+        self.assertTrue(statements, f"{model.__name__} changelist ran no statement")
+        for sql in statements:
+            with self.subTest(sql=sql):
+                self.assertPlan(sql, None, indexed, max_rows)
+
+    def test_admin_route_keyset_page(self):
+        # A deep page reads from the cursor on, not through every earlier page.
+        self.assertChangelistPlans(
+            WalkingRoute, {"after": str(SYNTHETIC_ROUTES // 2)},
+            {"walking_routes"}, SYNTHETIC_ROUTES * 10,
+        )
+
+    def test_admin_route_search(self):
+        self.assertChangelistPlans(WalkingRoute, {"q": "1234"}, {"walking_routes"}, 1000)
+
+    def test_admin_issue_search(self):
+        self.assertChangelistPlans(AccessIssue, {"q": "1234"}, {"access_issues"}, 1000)
+
+    def test_admin_facet_values(self):
+        for table, column in FACET_COLUMNS:
+            with self.subTest(column=f"{table}.{column}"):
+                self.assertPlan(DISTINCT_SQL.format(table=table, col=column), [FACET_LIMIT], {table}, 1000)
+                self.assertPlan(HAS_NULL_SQL.format(table=table, col=column), None, {table}, SYNTHETIC_ROUTES * 10)
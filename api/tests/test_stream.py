@@ -0,0 +1,27 @@
+import unittest
+
+from ..stream import QUEUE_SIZE, Subscription
+
+
+class SubscriptionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sub = Subscription((-6.3, 53.3, -6.2, 53.4), ("playgrounds",))
+
+    def test_wants(self):
+        inside = {"layer": "playgrounds", "lng": -6.25, "lat": 53.35}
+        self.assertTrue(self.sub.wants(inside))
+        self.assertTrue(self.sub.wants({"layer": "playgrounds", "lng": -6.25, "lat": 53.35, "old_lng": 0, "old_lat": 0}))
+        # Moved out of the box: the old position still concerns the client.
+        self.assertTrue(self.sub.wants({"layer": "playgrounds", "lng": 0, "lat": 0, "old_lng": -6.3, "old_lat": 53.4}))
+        self.assertFalse(self.sub.wants({"layer": "playgrounds", "lng": 0, "lat": 0}))
+        self.assertFalse(self.sub.wants({**inside, "layer": "access_issues"}))
+        self.assertFalse(self.sub.wants({"layer": "playgrounds", "lng": None, "lat": 53.35}))
+
+    def test_overflow(self):
+        for n in range(QUEUE_SIZE):
+            self.sub.offer({"n": n})
+        self.assertFalse(self.sub.overflowed)
+        self.sub.offer({"n": QUEUE_SIZE})
+        self.assertTrue(self.sub.overflowed)
+        self.assertEqual(self.sub.queue.qsize(), QUEUE_SIZE)
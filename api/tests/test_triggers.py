@@ -0,0 +1,93 @@
+"""
+What the triggers on the spatial tables keep up to date: the access issue
+clusters (migration 0002), the route issue summaries (0003), the data
+versions (0004), the monthly partitions (0009) and the hexagon cells
+(0012, 0016, 0018).
+"""
+from django.db import connection
+from django.test import TestCase
+
+from ..hexcells import HEX_SIZES
+from .utils import (
+    LAT, LNG, cluster_sums, fetchone, hex_sums, insert_issue, insert_playgrounds, insert_route, version,
+)
+
+ZOOMS = range(19)
+
+
+class IssueTriggerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.route_id = insert_route()
+
+    def summary(self):
+        return fetchone(
+            "SELECT open_issues, by_type, accessibility_score FROM route_issue_summary WHERE route_id = %s;",
+            [self.route_id],
+        )
+
+    def test_aggregates_follow_inserts_and_deletes(self):
+        first = insert_issue(self.route_id, "blocked_ramp")
+        insert_issue(self.route_id, "flooding")
+        # An accessible route starts at 100; each open issue divides by 1 + 0.25 n.
+        self.assertEqual(self.summary(), (2, {"blocked_ramp": 1, "flooding": 1}, 66.7))
+        self.assertEqual(cluster_sums(), dict.fromkeys(ZOOMS, 2))
+        self.assertEqual(hex_sums("open_issues"), dict.fromkeys(HEX_SIZES, 2))
+
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM access_issues WHERE id = %s;", [first])
+        self.assertEqual(self.summary(), (1, {"flooding": 1}, 80.0))
+        self.assertEqual(cluster_sums(), dict.fromkeys(ZOOMS, 1))
+        self.assertEqual(hex_sums("open_issues"), dict.fromkeys(HEX_SIZES, 1))
+
+    def test_retyped_issue_moves_between_types(self):
+        pk = insert_issue(self.route_id, "blocked_ramp")
+        with connection.cursor() as cur:
+            cur.execute("UPDATE access_issues SET issue_type = 'flooding' WHERE id = %s;", [pk])
+        self.assertEqual(self.summary(), (1, {"flooding": 1}, 80.0))
+        self.assertEqual(
+            fetchone("SELECT array_agg(DISTINCT issue_type) FROM access_issue_clusters;")[0],
+            ["flooding"],
+        )
+
+    def test_rescored_when_the_route_changes(self):
+        insert_issue(self.route_id, "flooding")
+        with connection.cursor() as cur:
+            cur.execute("UPDATE walking_routes SET is_accessible = FALSE WHERE id = %s;", [self.route_id])
+        self.assertEqual(self.summary()[2], 32.0)
+
+    def test_issue_lands_in_its_month(self):
+        pk = insert_issue(self.route_id, "flooding")
+        partition, expected = fetchone("""
+          SELECT tableoid::regclass::text, access_issues_partition_name(created_at)
+          FROM access_issues WHERE id = %s;
+        """, [pk])
+        self.assertEqual(partition, expected)
+
+
+class PlaygroundTriggerTests(TestCase):
+
+    def test_one_version_bump_per_statement(self):
+        before = version("playgrounds")
+        insert_playgrounds(*((LNG + n * 0.001, LAT) for n in range(3)))
+        self.assertEqual(version("playgrounds"), before + 1)
+
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM playgrounds WHERE source = 'test';")
+        self.assertEqual(version("playgrounds"), before + 2)
+
+    def test_hex_cells_follow_writes(self):
+        ids = insert_playgrounds((LNG, LAT), (LNG + 0.001, LAT))
+        self.assertEqual(hex_sums("playgrounds"), dict.fromkeys(HEX_SIZES, 2))
+
+        # Moved 50 km east: counted in other cells, and the old ones emptied.
+        with connection.cursor() as cur:
+            cur.execute("UPDATE playgrounds SET geom = ST_Translate(geom, 0.75, 0) WHERE id = %s;", [ids[0]])
+        self.assertEqual(hex_sums("playgrounds"), dict.fromkeys(HEX_SIZES, 2))
+        self.assertEqual(fetchone("SELECT count(*) FROM hex_cells WHERE size = 8000;")[0], 2)
+
+        with connection.cursor() as cur:
+            cur.execute("DELETE FROM playgrounds WHERE id = ANY(%s);", [ids])
+        self.assertEqual(fetchone("SELECT count(*) FROM hex_cells;")[0], 0)
+        self.assertEqual(fetchone("SELECT count(*) FROM hex_cells_dirty;")[0], 0)
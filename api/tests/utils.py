@@ -0,0 +1,83 @@
+"""Shared data and queries for the database tests."""
+from django.db import connection
+
+# Central Dublin, where the bundled data is.
+LNG, LAT = -6.2603, 53.3498
+
+
+def fetchone(sql, params=None):
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchone()
+
+
+def fetchall(sql, params=None):
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+def version(table):
+    return fetchone("SELECT version FROM data_versions WHERE table_name = %s;", [table])[0]
+
+
+def hex_sums(column):
+    """{cell size: sum of column over its cells}, for the sizes where it isn't 0."""
+    return dict(fetchall(f"SELECT size, sum({column}) FROM hex_cells GROUP BY size HAVING sum({column}) > 0;"))
+
+
+def cluster_sums():
+    """{zoom: issues counted in access_issue_clusters}."""
+    return dict(fetchall("SELECT zoom, sum(n) FROM access_issue_clusters GROUP BY zoom;"))
+
+
+def insert_route():
+    """A short accessible footway starting at LNG, LAT; returns its id."""
+    return fetchone("""
+      INSERT INTO walking_routes (name, source, is_accessible, geom)
+      VALUES ('Test footway', 'test', TRUE,
+              ST_Multi(ST_SetSRID(ST_MakeLine(ST_MakePoint(%s, %s), ST_MakePoint(%s, %s)), 4326)))
+      RETURNING id;
+    """, [LNG, LAT, LNG + 0.001, LAT + 0.0005])[0]
+
+
+def insert_playgrounds(*points):
+    """Playgrounds at (lng, lat) points; returns their ids in order."""
+    return [pk for (pk,) in fetchall("""
+      INSERT INTO playgrounds (name, source, geom)
+      SELECT 'Test ' || p.ord, 'test', ST_SetSRID(ST_MakePoint(p.lng, p.lat), 4326)
+      FROM unnest(%s::float8[], %s::float8[]) WITH ORDINALITY AS p(lng, lat, ord)
+      ORDER BY p.ord
+      RETURNING id;
+    """, [[p[0] for p in points], [p[1] for p in points]])]
+
+
+def insert_park(lng, lat, name="Test park", amenities=()):
+    """A park about 130 m by 110 m with its south-west corner at lng, lat."""
+    return fetchone("""
+      INSERT INTO parks (name, category, amenities, geom)
+      VALUES (%s, 'test', %s::text[], ST_Multi(ST_MakeEnvelope(%s, %s, %s, %s, 4326)))
+      RETURNING id;
+    """, [name, list(amenities), lng, lat, lng + 0.002, lat + 0.001])[0]
+
+
+def insert_issue(route_id, issue_type, created_at=None):
+    """An access issue on the insert_route() footway; returns its id."""
+    return fetchone("""
+      INSERT INTO access_issues (route_id, issue_type, description, created_at, geom)
+      VALUES (%s, %s, 'test', COALESCE(%s, now()::timestamp), ST_SetSRID(ST_MakePoint(%s, %s), 4326))
+      RETURNING id;
+    """, [route_id, issue_type, created_at, LNG + 0.0005, LAT + 0.00025])[0]
+
+
+def issue_aggregates(route_id):
+    """Everything the access_issues triggers maintain, for comparison."""
+    return {
+        "clusters": fetchall("SELECT zoom, cell_x, cell_y, issue_type, n FROM access_issue_clusters ORDER BY 1, 2, 3, 4;"),
+        "summary": fetchall(
+            "SELECT open_issues, by_type, last_reported_at FROM route_issue_summary WHERE route_id = %s;",
+            [route_id],
+        ),
+        "hex_cells": fetchall("SELECT size, i, j, open_issues FROM hex_cells ORDER BY 1, 2, 3;"),
+        "version": version("access_issues"),
+    }
@@ -3,18 +3,25 @@ from . import views
 
 urlpatterns = [
     path("health", views.health),
+    path("ready", views.ready),
     path("parks/within", views.parks_within),
     path("playgrounds/nearest", views.playgrounds_nearest),
+    path("playgrounds/nearest/batch", views.playgrounds_nearest_batch),
     path("routes/intersecting_park", views.routes_intersecting_park),
     path("routes/within", views.routes_within),
     path("parks/containing", views.park_containing_point),
     path("parks/search", views.parks_search),
     path("playgrounds/search", views.playgrounds_search),
     path("playgrounds", views.playground_create),
+    path("playgrounds/bulk", views.playgrounds_bulk, name="playgrounds_bulk"),
     path("playgrounds/<int:pk>", views.playground_update),
     path("playgrounds/<int:pk>/delete", views.playground_delete),
     path("playgrounds/<int:pk>/get", views.playground_get),
+    path("coverage/gaps", views.coverage_gap_cells, name="coverage_gaps"),
     path("access/routes/within", views.accessible_routes_within, name="accessible_routes_within"),
+    path("access/routes/worst", views.worst_routes, name="worst_routes"),
     path("access/issues/near", views.access_issues_near, name="access_issues_near"),
+    path("access/issues/clusters", views.access_issue_clusters, name="access_issue_clusters"),
     path("access/issues", views.access_issue_create, name="access_issue_create"),
+    path("hexagons", views.hex_cells, name="hex_cells"),
 ]
@@ -0,0 +1,18 @@
+"""
+Data versions of the spatial tables (see migration 0004).
+
+A version string such as "parks:3;playgrounds:17" identifies the state of the
+tables a derived result was built from. Compare it with the current string to
+decide whether that result can still be served.
+"""
+from django.db import connection
+
+
+def data_version(*tables):
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT table_name, version FROM data_versions "
+            "WHERE table_name = ANY(%s) ORDER BY table_name;",
+            [list(tables)],
+        )
+        return ";".join(f"{name}:{version}" for name, version in cur.fetchall())
@@ -1,10 +1,38 @@
-from django.db import connection
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
 from django.views.decorators.http import require_GET
 
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+import csv
+import io
 import json
+import math
+from itertools import chain, islice
+
+from . import amenities
+from .bulk import apply_operations, parse_operations
+from .coverage import API_GRIDS, cached_gaps
+from .db_routing import read_alias
+from . import warm
+from .admission import admit, by_limit, by_radius, fixed, statement_timeout_ms
+from .fastjson import FastJsonResponse
+from .hexcells import size_for_zoom
+from .nearest import CSV_HEADER, csv_rows, nearest_playgrounds, parse_origins
+
+# Zoom range covered by the access_issue_clusters table (migration 0002).
+CLUSTER_MIN_ZOOM = 0
+CLUSTER_MAX_ZOOM = 18
+MERCATOR_HALF = 20037508.342789244
+
+# Upper bound for access_issues_near's since_days.
+MAX_SINCE_DAYS = 3650
+HEX_MAX_CELLS = 5000
+
+# Streamed rows handed from the request thread to the event loop per hop.
+STREAM_BATCH = 256
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -18,7 +46,7 @@ def playground_create(request):
         lat = float(body["lat"])
         lng = float(body["lng"])
     except Exception as e:
-        return JsonResponse({"error": f"Invalid body: {e}"}, status=400)
+        return FastJsonResponse({"error": f"Invalid body: {e}"}, status=400)
 
     sql = """
       INSERT INTO playgrounds(name, source, geom)
@@ -26,7 +54,47 @@ def playground_create(request):
       RETURNING id, name, ST_AsGeoJSON(geom) AS geom;
     """
     rows = _fetchall(sql, [name, lng, lat])
-    return JsonResponse({"created": rows[0]}, status=201)
+    return FastJsonResponse({"created": rows[0]}, status=201)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@admit(fixed("batch"))
+def playgrounds_bulk(request):
+    """
+    POST /api/playgrounds/bulk
+    Body: JSON {"operations": [{"op": "create"|"update"|"delete", ...}]} or
+    GeoJSONSeq features (see api/bulk.py). Applies the whole batch in one
+    transaction and returns a result per operation, in input order. If any
+    operation is invalid nothing is applied and the response is a 400 with
+    the errors.
+    """
+    content_type = request.content_type or ""
+    if "geo+json-seq" in content_type or "geojsonseq" in content_type:
+        in_format = "geojsonseq"
+    elif "json" in content_type:
+        in_format = "json"
+    else:
+        in_format = None
+    try:
+        ops = parse_operations(request.body.decode("utf-8"), in_format)
+    except Exception as e:
+        return FastJsonResponse({"error": f"Invalid body: {e}"}, status=400)
+
+    errors = [
+        {"index": o.index, "op": o.op, "id": o.id, "status": "invalid", "error": o.error}
+        for o in ops if o.error is not None
+    ]
+    if errors:
+        return FastJsonResponse(
+            {"error": f"{len(errors)} invalid operations; nothing was applied", "results": errors},
+            status=400,
+        )
+
+    results = apply_operations(ops)
+    counts = {status: 0 for status in ("created", "updated", "deleted", "not_found")}
+    for r in results:
+        counts[r["status"]] += 1
+    return FastJsonResponse({**counts, "results": results})
 
 @csrf_exempt
 @require_http_methods(["PATCH"])
@@ -38,15 +106,15 @@ def playground_update(request, pk):
         body = json.loads(request.body.decode("utf-8"))
         name = body.get("name")
         if not name:
-            return JsonResponse({"error": "name required"}, status=400)
+            return FastJsonResponse({"error": "name required"}, status=400)
     except Exception as e:
-        return JsonResponse({"error": f"Invalid body: {e}"}, status=400)
+        return FastJsonResponse({"error": f"Invalid body: {e}"}, status=400)
 
     sql = "UPDATE playgrounds SET name=%s WHERE id=%s RETURNING id, name;"
     rows = _fetchall(sql, [name, pk])
     if not rows:
-        return JsonResponse({"error": "not found"}, status=404)
-    return JsonResponse({"updated": rows[0]})
+        return FastJsonResponse({"error": "not found"}, status=404)
+    return FastJsonResponse({"updated": rows[0]})
 
 @csrf_exempt
 @require_http_methods(["DELETE"])
@@ -54,31 +122,89 @@ def playground_delete(request, pk):
     sql = "DELETE FROM playgrounds WHERE id=%s RETURNING id;"
     rows = _fetchall(sql, [pk])
     if not rows:
-        return JsonResponse({"error": "not found"}, status=404)
-    return JsonResponse({"deleted": rows[0]["id"]})
+        return FastJsonResponse({"error": "not found"}, status=404)
+    return FastJsonResponse({"deleted": rows[0]["id"]})
 
 
 @require_GET
 def health(request):
-    return JsonResponse({"status": "ok"})
+    return FastJsonResponse({"status": "ok"})
 
-def _fetchall(sql, params):
-    with connection.cursor() as cur:
+@require_GET
+def ready(request):
+    """
+    Readiness: 200 once warm-up (api.warm) has completed, 503 before that.
+    Reports how long each warm-up step took.
+    """
+    is_ready, state = warm.readiness()
+    return FastJsonResponse(
+        {"status": "ready" if is_ready else "warming", "warm": state},
+        status=200 if is_ready else 503,
+    )
+
+def _fetchall(sql, params, using=None):
+    """
+    Run sql and return rows as dicts. Without `using`, read-only requests may
+    be served by a replica (api.db_routing); writes always hit the primary.
+    """
+    alias = using or read_alias()
+    timeout_ms = statement_timeout_ms.get()
+    if timeout_ms is None:
+        return _execute(alias, sql, params)
+    # SET LOCAL only lasts until the end of the transaction, so open one.
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cur:
+            cur.execute("SELECT set_config('statement_timeout', %s, true);", [str(timeout_ms)])
+        return _execute(alias, sql, params)
+
+def _execute(alias, sql, params):
+    with connections[alias].cursor() as cur:
         cur.execute(sql, params)
         cols = [c[0] for c in cur.description]
         return [dict(zip(cols, row)) for row in cur.fetchall()]
 
+def _amenity_filter(request):
+    """
+    (sql, params, ids) restricting parks to those with every amenity in
+    ?amenities=. ids is the set of matching park ids when the bitsets in
+    api/amenities.py are loaded; otherwise the GIN index on parks.amenities
+    does the work. Raises ValueError for unknown amenity names.
+    """
+    names = amenities.parse_amenities(request.GET.get("amenities"))
+    if not names:
+        return "", [], None
+    matched = amenities.index.match(names)
+    if matched is None:
+        return "AND amenities @> %s::text[]", [names], None
+    ids = amenities.index.ids(*matched)
+    return "AND id = ANY(%s)", [ids], set(ids)
+
+def _with_facets(request, payload, rows):
+    if request.GET.get("facets", "false").lower() == "true":
+        payload["facets"] = amenities.facet_counts(rows)
+    return payload
+
 @require_GET
+@admit(by_radius(default=2000, max_radius=10000, heavy_above=3000))
 def parks_within(request):
+    """
+    Parks within radius_m of lat,lng, nearest first. amenities=skateboard,muga
+    keeps parks that have all of them; facets=true adds how many of the
+    returned parks have each amenity.
+    """
     try:
         lat = float(request.GET.get('lat'))
         lng = float(request.GET.get('lng'))
         radius_m = float(request.GET.get('radius_m', '2000'))
     except Exception as e:
-        return JsonResponse({"error": f"lat,lng required: {e}"}, status=400)
+        return FastJsonResponse({"error": f"lat,lng required: {e}"}, status=400)
+    try:
+        amenity_sql, amenity_params, _ = _amenity_filter(request)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
 
-    sql = """
-      SELECT id, name, category, area_ha,
+    sql = f"""
+      SELECT id, name, category, area_ha, amenities,
              ST_AsGeoJSON(ST_SimplifyPreserveTopology(geom, 0.0003)) AS geom
       FROM parks
       WHERE ST_DWithin(
@@ -86,23 +212,25 @@ def parks_within(request):
       ST_SetSRID(ST_MakePoint(%s,%s),4326)::geography,
       %s
     )
+    {amenity_sql}
     ORDER BY ST_Distance(
       geography(geom),
       ST_SetSRID(ST_MakePoint(%s,%s),4326)::geography
     )
     LIMIT 500;
     """
-    rows = _fetchall(sql, [lng, lat, radius_m, lng, lat])
-    return JsonResponse({"features": rows})
+    rows = _fetchall(sql, [lng, lat, radius_m, *amenity_params, lng, lat])
+    return FastJsonResponse(_with_facets(request, {"features": rows}, rows))
 
 @require_GET
+@admit(by_limit("limit", default=1, max_limit=50, heavy_above=10))
 def playgrounds_nearest(request):
     try:
         lat = float(request.GET.get('lat'))
         lng = float(request.GET.get('lng'))
         limit = int(request.GET.get('limit', '1'))
     except Exception as e:
-        return JsonResponse({"error": f"lat,lng required: {e}"}, status=400)
+        return FastJsonResponse({"error": f"lat,lng required: {e}"}, status=400)
 
     sql = """
       SELECT id, name, source,
@@ -116,14 +244,118 @@ def playgrounds_nearest(request):
       LIMIT %s;
     """
     rows = _fetchall(sql, [lng, lat, lng, lat, limit])
-    return JsonResponse({"features": rows})
+    return FastJsonResponse({"features": rows})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@admit(fixed("batch"), coalesce=False)
+def playgrounds_nearest_batch(request):
+    """
+    POST /api/playgrounds/nearest/batch?k=1&format=ndjson|csv
+    Body: CSV with a lat,lng header (optional id column), or GeoJSONSeq of
+    Point features. Streams one result per origin back in input order.
+    """
+    try:
+        k = int(request.GET.get("k", "1"))
+    except Exception:
+        return FastJsonResponse({"error": "k must be an integer"}, status=400)
+    out_format = request.GET.get("format", "ndjson")
+    if out_format not in ("ndjson", "csv"):
+        return FastJsonResponse({"error": "format must be ndjson or csv"}, status=400)
+
+    content_type = request.content_type or ""
+    if "geo+json-seq" in content_type or "geojsonseq" in content_type:
+        in_format = "geojsonseq"
+    elif "csv" in content_type:
+        in_format = "csv"
+    else:
+        in_format = None
+
+    lines = (raw.decode("utf-8") for raw in request)
+    results = nearest_playgrounds(parse_origins(lines, in_format), k=k)
+
+    if out_format == "csv":
+        def stream():
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for row in chain([CSV_HEADER], csv_rows(results)):
+                writer.writerow(row)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        return _streaming(request, stream(), "text/csv")
+
+    return _streaming(
+        request,
+        (json.dumps(r, default=str) + "\n" for r in results),
+        "application/x-ndjson",
+    )
+
+async def _aiter(iterable):
+    """
+    Async iterator over a sync iterator of str, STREAM_BATCH items per hop
+    to the request's thread, where its DB connection lives.
+    """
+    it = iter(iterable)
+    take = sync_to_async(lambda: list(islice(it, STREAM_BATCH)), thread_sensitive=True)
+    try:
+        while part := await take():
+            yield "".join(part)
+    finally:
+        close = getattr(it, "close", None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+def _streaming(request, content, content_type):
+    """
+    StreamingHttpResponse that streams under both handlers. Under ASGI,
+    Django reads a sync iterator to the end before sending a byte, so there
+    the content is handed over as an async iterator instead.
+    """
+    if isinstance(request, ASGIRequest):
+        content = _aiter(content)
+    return StreamingHttpResponse(content, content_type=content_type)
 
 @require_GET
+@admit(fixed("light"))
+def coverage_gap_cells(request):
+    """
+    GET /api/coverage/gaps?cell_m=250&max_m=800
+
+    Grid cells with no playground or no park within max_m metres, from
+    coverage_gap_cache. Only `python manage.py coverage_gaps` computes them;
+    after the data changes this serves the previous result, marked stale,
+    until it has run again, and 202 for a grid it has never computed. Only
+    the grids in coverage.API_GRIDS are served.
+    """
+    try:
+        cell_m = float(request.GET.get("cell_m", "250"))
+        max_m = float(request.GET.get("max_m", "800"))
+    except Exception:
+        return FastJsonResponse({"error": "cell_m,max_m must be numbers"}, status=400)
+    if (cell_m, max_m) not in API_GRIDS:
+        allowed = ", ".join(f"cell_m={c}&max_m={m}" for c, m in API_GRIDS)
+        return FastJsonResponse({"error": f"unsupported grid; use one of {allowed}"}, status=400)
+
+    cached = cached_gaps(cell_m, max_m)
+    if cached is None:
+        return FastJsonResponse({
+            "status": "pending",
+            "detail": f"not computed yet; run python manage.py coverage_gaps --cell-m {cell_m:g} --max-m {max_m:g}",
+        }, status=202)
+    result, version, current = cached
+    return FastJsonResponse({
+        **result, "data_version": version, "current_version": current,
+        "cached": True, "stale": version != current,
+    })
+
+@require_GET
+@admit(fixed("heavy"))
 def routes_intersecting_park(request):
     try:
         park_id = int(request.GET.get('park_id'))
     except Exception:
-        return JsonResponse({"error": "park_id required"}, status=400)
+        return FastJsonResponse({"error": "park_id required"}, status=400)
 
     sql = """
       SELECT r.id, r.name, r.source,
@@ -134,16 +366,17 @@ def routes_intersecting_park(request):
       LIMIT 1000;
     """
     rows = _fetchall(sql, [park_id])
-    return JsonResponse({"features": rows})
+    return FastJsonResponse({"features": rows})
 
 @require_GET
+@admit(by_radius(default=1000, max_radius=5000, heavy_above=1500))
 def routes_within(request):
     try:
         lat = float(request.GET.get('lat'))
         lng = float(request.GET.get('lng'))
         radius_m = float(request.GET.get('radius_m', '1000'))
     except Exception as e:
-        return JsonResponse({"error": f"lat,lng required: {e}"}, status=400)
+        return FastJsonResponse({"error": f"lat,lng required: {e}"}, status=400)
 
     sql = """
       SELECT id, name, source,
@@ -161,15 +394,16 @@ def routes_within(request):
       LIMIT 2000;
     """
     rows = _fetchall(sql, [lng, lat, radius_m, lng, lat])
-    return JsonResponse({"features": rows})
+    return FastJsonResponse({"features": rows})
 
 @require_GET
+@admit(fixed("light"))
 def park_containing_point(request):
     try:
         lat = float(request.GET.get('lat'))
         lng = float(request.GET.get('lng'))
     except Exception:
-        return JsonResponse({"error":"lat,lng required"}, status=400)
+        return FastJsonResponse({"error":"lat,lng required"}, status=400)
 
     sql = """
       SELECT id, name, category, area_ha,
@@ -179,29 +413,46 @@ def park_containing_point(request):
       LIMIT 1;
     """
     rows = _fetchall(sql, [lng, lat])
-    return JsonResponse({"features": rows})
+    return FastJsonResponse({"features": rows})
 
 @require_GET
+@admit(fixed("light"))
 def parks_search(request):
+    """Parks by name; takes amenities= and facets=true like parks_within."""
     q = (request.GET.get("q") or "").strip()
     if len(q) < 2:
-        return JsonResponse({"features": []})
-    sql = """
-      SELECT id, name,
+        return FastJsonResponse({"features": []})
+    try:
+        amenity_sql, amenity_params, ids = _amenity_filter(request)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+    # Without the bitsets, a filtered search can't use the name index.
+    if ids is not None or not amenity_sql:
+        preloaded = warm.search("parks", q, ids)
+        if preloaded is not None:
+            return FastJsonResponse(_with_facets(request, {"features": preloaded}, preloaded))
+    sql = f"""
+      SELECT id, name, amenities,
              ST_AsGeoJSON(ST_SimplifyPreserveTopology(geom, 0.0003)) AS geom
       FROM parks
       WHERE name ILIKE %s
+      {amenity_sql}
       ORDER BY name
       LIMIT 25;
     """
-    rows = _fetchall(sql, [f"%{q}%"])
-    return JsonResponse({"features": [{"id": r["id"], "name": r["name"], "geom": r["geom"]} for r in rows]})
+    rows = _fetchall(sql, [f"%{q}%", *amenity_params])
+    features = [{"id": r["id"], "name": r["name"], "geom": r["geom"]} for r in rows]
+    return FastJsonResponse(_with_facets(request, {"features": features}, rows))
 
 @require_GET
+@admit(fixed("light"))
 def playgrounds_search(request):
     q = (request.GET.get("q") or "").strip()
     if len(q) < 2:
-        return JsonResponse({"features": []})
+        return FastJsonResponse({"features": []})
+    preloaded = warm.search("playgrounds", q)
+    if preloaded is not None:
+        return FastJsonResponse({"features": preloaded})
     sql = """
       SELECT id, name,
              ST_AsGeoJSON(geom) AS geom
@@ -211,9 +462,10 @@ def playgrounds_search(request):
       LIMIT 25;
     """
     rows = _fetchall(sql, [f"%{q}%"])
-    return JsonResponse({"features": [{"id": r["id"], "name": r["name"], "geom": r["geom"]} for r in rows]})
+    return FastJsonResponse({"features": [{"id": r["id"], "name": r["name"], "geom": r["geom"]} for r in rows]})
 
 @require_GET
+@admit(fixed("light"))
 def playground_get(request, pk):
     sql = """
       SELECT id, name, source, ST_AsGeoJSON(geom) AS geom
@@ -221,58 +473,108 @@ def playground_get(request, pk):
     """
     rows = _fetchall(sql, [pk])
     if not rows:
-        return JsonResponse({"error":"not found"}, status=404)
-    return JsonResponse(rows[0])
+        return FastJsonResponse({"error":"not found"}, status=404)
+    return FastJsonResponse(rows[0])
 
 @require_GET
+@admit(by_radius(default=1000, max_radius=5000, heavy_above=1500))
 def accessible_routes_within(request):
     try:
         lat = float(request.GET.get("lat"))
         lng = float(request.GET.get("lng"))
         radius_m = float(request.GET.get("radius_m", "1000"))
     except Exception as e:
-        return JsonResponse({"error": f"lat,lng required: {e}"}, status=400)
+        return FastJsonResponse({"error": f"lat,lng required: {e}"}, status=400)
 
     accessible_only = request.GET.get("accessible_only", "false").lower() == "true"
 
     sql = """
       SELECT
-        id,
-        name,
-        surface,
-        smoothness,
-        is_accessible,
-        ST_AsGeoJSON(ST_Simplify(geom, 0.0002)) AS geom
-      FROM walking_routes
+        r.id,
+        r.name,
+        r.surface,
+        r.smoothness,
+        r.is_accessible,
+        COALESCE(s.open_issues, 0) AS open_issues,
+        COALESCE(s.accessibility_score,
+                 route_accessibility_score(r.is_accessible, 0)) AS accessibility_score,
+        ST_AsGeoJSON(ST_Simplify(r.geom, 0.0002)) AS geom
+      FROM walking_routes r
+      LEFT JOIN route_issue_summary s ON s.route_id = r.id
       WHERE ST_DWithin(
-              geom::geography,
+              r.geom::geography,
               ST_SetSRID(ST_MakePoint(%s,%s),4326)::geography,
               %s
             )
-        AND (%s = FALSE OR is_accessible = TRUE)
+        AND (%s = FALSE OR r.is_accessible = TRUE)
       ORDER BY
-        is_accessible DESC,
+        r.is_accessible DESC,
         ST_Distance(
-          geom::geography,
+          r.geom::geography,
           ST_SetSRID(ST_MakePoint(%s,%s),4326)::geography
         )
       LIMIT 5000;
     """
 
     rows = _fetchall(sql, [lng, lat, radius_m, accessible_only, lng, lat])
-    return JsonResponse({"features": rows})
+    return FastJsonResponse({"features": rows})
+
+@require_GET
+@admit(fixed("light"))
+def worst_routes(request):
+    """
+    GET /api/access/routes/worst?limit=
+
+    Routes with reported issues, lowest accessibility_score first. Reads the
+    route_issue_summary table that triggers maintain (migration 0003).
+    """
+    try:
+        limit = max(1, min(int(request.GET.get("limit", "50")), 500))
+    except Exception:
+        return FastJsonResponse({"error": "limit must be an integer"}, status=400)
+
+    sql = """
+      SELECT r.id,
+             r.name,
+             r.surface,
+             r.smoothness,
+             r.is_accessible,
+             s.open_issues,
+             s.by_type AS issues_by_type,
+             s.last_reported_at,
+             s.accessibility_score,
+             ST_AsGeoJSON(ST_Simplify(r.geom, 0.0002)) AS geom
+      FROM route_issue_summary s
+      JOIN walking_routes r ON r.id = s.route_id
+      ORDER BY s.accessibility_score, s.open_issues DESC
+      LIMIT %s;
+    """
+    rows = _fetchall(sql, [limit])
+    return FastJsonResponse({"features": rows})
 
 @require_GET
+@admit(by_radius(default=500, max_radius=5000, heavy_above=2000))
 def access_issues_near(request):
     """
-    GET /api/access/issues/near?lat=&lng=&radius_m=
+    GET /api/access/issues/near?lat=&lng=&radius_m=[&since_days=]
+
+    since_days limits the result to recent issues. access_issues is
+    partitioned by month (migration 0009), so only the partitions covering
+    that window are scanned.
     """
     try:
         lat = float(request.GET.get("lat"))
         lng = float(request.GET.get("lng"))
         radius_m = float(request.GET.get("radius_m", "500"))
     except Exception:
-        return JsonResponse({"error": "lat,lng required"}, status=400)
+        return FastJsonResponse({"error": "lat,lng required"}, status=400)
+    try:
+        since_days = request.GET.get("since_days")
+        since_days = None if since_days is None else int(since_days)
+        if since_days is not None and not 1 <= since_days <= MAX_SINCE_DAYS:
+            raise ValueError
+    except ValueError:
+        return FastJsonResponse({"error": f"since_days must be 1-{MAX_SINCE_DAYS}"}, status=400)
 
     sql = """
       SELECT i.id,
@@ -288,11 +590,105 @@ def access_issues_near(request):
               ST_SetSRID(ST_MakePoint(%s,%s),4326)::geography,
               %s
             )
+        AND (%s::int IS NULL OR i.created_at >= (now() - make_interval(days => %s::int))::timestamp)
       ORDER BY i.created_at DESC
       LIMIT 200;
     """
-    rows = _fetchall(sql, [lng, lat, radius_m])
-    return JsonResponse({"features": rows})
+    rows = _fetchall(sql, [lng, lat, radius_m, since_days, since_days])
+    return FastJsonResponse({"features": rows})
+
+
+def _cluster_cell(lng, lat, zoom):
+    """
+    Grid cell (x, y) of a WGS84 point at a zoom, matching
+    access_issue_clusters_bump() in migration 0002.
+    """
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = math.radians(lng) * 6378137.0
+    y = math.log(math.tan(math.pi / 4 + math.radians(lat) / 2)) * 6378137.0
+    cell = 2 * MERCATOR_HALF / (2 ** zoom) / 4
+    return (
+        math.floor((x + MERCATOR_HALF) / cell),
+        math.floor((MERCATOR_HALF - y) / cell),
+    )
+
+@require_GET
+@admit(fixed("light"))
+def access_issue_clusters(request):
+    """
+    GET /api/access/issues/clusters?zoom=&bbox=minLng,minLat,maxLng,maxLat
+
+    Reads the precomputed per-zoom grid, so the cost depends on the number of
+    occupied cells in view, not on the number of issues.
+    """
+    try:
+        zoom = int(request.GET.get("zoom", "12"))
+        min_lng, min_lat, max_lng, max_lat = [
+            float(v) for v in request.GET.get("bbox", "").split(",")
+        ]
+    except Exception:
+        return FastJsonResponse({"error": "zoom,bbox=minLng,minLat,maxLng,maxLat required"}, status=400)
+
+    zoom = max(CLUSTER_MIN_ZOOM, min(CLUSTER_MAX_ZOOM, zoom))
+    x0, y0 = _cluster_cell(min_lng, max_lat, zoom)
+    x1, y1 = _cluster_cell(max_lng, min_lat, zoom)
+
+    sql = """
+      SELECT cell_x,
+             cell_y,
+             SUM(n) AS count,
+             SUM(sum_lng) / SUM(n) AS lng,
+             SUM(sum_lat) / SUM(n) AS lat,
+             (ARRAY_AGG(issue_type ORDER BY n DESC, issue_type))[1] AS dominant_issue_type,
+             JSON_OBJECT_AGG(issue_type, n) AS by_type
+      FROM access_issue_clusters
+      WHERE zoom = %s
+        AND cell_x BETWEEN %s AND %s
+        AND cell_y BETWEEN %s AND %s
+      GROUP BY cell_x, cell_y
+      HAVING SUM(n) > 0;
+    """
+    rows = _fetchall(sql, [zoom, x0, x1, y0, y1])
+    return FastJsonResponse({"zoom": zoom, "clusters": rows})
+
+
+@require_GET
+@admit(fixed("light"))
+def hex_cells(request):
+    """
+    GET /api/hexagons?zoom=&bbox=minLng,minLat,maxLng,maxLat
+
+    Green-space density per hexagon for overview maps: park area, footway
+    length and its accessible share, playgrounds and open issues. Reads the
+    precomputed cells of the size chosen for zoom (see api/hexcells.py).
+    """
+    try:
+        zoom = int(request.GET.get("zoom", "10"))
+        min_lng, min_lat, max_lng, max_lat = [
+            float(v) for v in request.GET.get("bbox", "").split(",")
+        ]
+    except Exception:
+        return FastJsonResponse({"error": "zoom,bbox=minLng,minLat,maxLng,maxLat required"}, status=400)
+
+    size = size_for_zoom(zoom)
+    # size is inlined, not a parameter, so the per-size partial index matches.
+    sql = f"""
+      SELECT i, j,
+             round(park_area_m2)::bigint AS park_area_m2,
+             round(route_length_m)::bigint AS route_length_m,
+             CASE WHEN route_length_m > 0
+                  THEN round((accessible_length_m / route_length_m)::numeric, 3)
+             END AS accessible_share,
+             playgrounds,
+             open_issues,
+             ST_AsGeoJSON(geom, 5) AS geom
+      FROM hex_cells
+      WHERE size = {size:d}
+        AND geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+      LIMIT {HEX_MAX_CELLS:d};
+    """
+    rows = _fetchall(sql, [min_lng, min_lat, max_lng, max_lat])
+    return FastJsonResponse({"zoom": zoom, "size": size, "cells": rows})
 
 
 @csrf_exempt
@@ -316,7 +712,7 @@ def access_issue_create(request):
         lat = float(body["lat"])
         lng = float(body["lng"])
     except Exception as e:
-        return JsonResponse({"error": f"Invalid body: {e}"}, status=400)
+        return FastJsonResponse({"error": f"Invalid body: {e}"}, status=400)
 
     sql = """
       INSERT INTO access_issues(route_id, issue_type, description, geom)
@@ -329,4 +725,4 @@ def access_issue_create(request):
       RETURNING id, created_at;
     """
     rows = _fetchall(sql, [route_id, issue_type, description, lng, lat])
-    return JsonResponse({"created": rows[0]}, status=201)
\ No newline at end of file
+    return FastJsonResponse({"created": rows[0]}, status=201)
\ No newline at end of file
@@ -1,3 +1,7 @@
+from django.conf import settings
 from django.shortcuts import render
 def home(request):
-    return render(request, "index.html")
+    return render(request, "index.html", {
+        "vectorgrid_url": settings.LEAFLET_VECTORGRID_URL,
+        "vectorgrid_integrity": settings.LEAFLET_VECTORGRID_INTEGRITY,
+    })
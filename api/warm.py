@@ -0,0 +1,225 @@
+"""
+Warm start.
+
+With WARM_START on (server/gunicorn.conf.py sets it), preload() runs once in
+the gunicorn master after the app is imported and before workers fork:
+
+  - resolves the URLconf and loads the template, so no worker pays for that
+    on its first request,
+  - builds the in-memory name search indexes for parks and playgrounds, and
+    the park amenity bitsets (api/amenities.py),
+  - runs every hot read endpoint once, which pulls their tables and indexes
+    into Postgres' buffer cache,
+  - closes its DB connections so forked workers don't share sockets.
+
+Workers inherit everything through copy-on-write, so a newly spawned worker
+serves at full speed immediately. /api/ready reports the state of each step.
+
+If a step failed (say the DB was down while the master started), each worker
+retries the failed steps on a background thread with exponential backoff.
+The readiness probe only reports; it never runs warm-up itself.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, connections
+
+logger = logging.getLogger(__name__)
+
+# Name indexes are checked against data_versions at most this often.
+INDEX_RECHECK_SECONDS = 5
+SEARCH_LIMIT = 25
+
+# Backoff between background retries of failed warm-up steps.
+RETRY_FIRST_SECONDS = 1
+RETRY_MAX_SECONDS = 60
+
+# Representative requests for the hot read endpoints (central Dublin).
+HOT_REQUESTS = [
+    ("/api/parks/within", {"lat": "53.3498", "lng": "-6.2603", "radius_m": "2000"}),
+    ("/api/playgrounds/nearest", {"lat": "53.3498", "lng": "-6.2603", "limit": "1"}),
+    ("/api/routes/within", {"lat": "53.3498", "lng": "-6.2603", "radius_m": "1000"}),
+    ("/api/access/routes/within", {"lat": "53.3498", "lng": "-6.2603", "radius_m": "1000"}),
+    ("/api/access/issues/near", {"lat": "53.3498", "lng": "-6.2603", "radius_m": "500"}),
+    ("/api/parks/containing", {"lat": "53.3498", "lng": "-6.2603"}),
+    ("/api/hexagons", {"zoom": "10", "bbox": "-6.45,53.25,-6.05,53.45"}),
+]
+
+INDEX_SQL = {
+    "parks": """
+      SELECT id, name,
+             ST_AsGeoJSON(ST_SimplifyPreserveTopology(geom, 0.0003)) AS geom
+      FROM parks WHERE name IS NOT NULL ORDER BY name;
+    """,
+    "playgrounds": """
+      SELECT id, name, ST_AsGeoJSON(geom) AS geom
+      FROM playgrounds WHERE name IS NOT NULL ORDER BY name;
+    """,
+}
+
+state = {"phase": "cold", "started_at": None, "finished_at": None, "steps": {}, "retry": None}
+_lock = threading.Lock()
+_retry_pid = None
+
+
+class NameIndex:
+    """
+    Names in database order, lower-cased once, for substring search without a
+    round trip. Stale indexes are rebuilt when data_versions moves.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.version = None
+        self.rows = []
+        self.checked_at = 0.0
+
+    def _current_version(self):
+        from .versions import data_version
+        return data_version(self.table)
+
+    def load(self):
+        with connection.cursor() as cur:
+            version = self._current_version()
+            cur.execute(INDEX_SQL[self.table])
+            rows = [
+                (name.lower(), {"id": pk, "name": name, "geom": geom})
+                for pk, name, geom in cur.fetchall()
+            ]
+        # Swap in one assignment so concurrent searches see old or new, never half.
+        self.rows, self.version, self.checked_at = rows, version, time.monotonic()
+        return len(rows)
+
+    def search(self, q, ids=None):
+        """Matches for q, only among ids if given, or None when the index isn't usable."""
+        if self.version is None:
+            return None
+        if time.monotonic() - self.checked_at > INDEX_RECHECK_SECONDS:
+            try:
+                if self._current_version() != self.version:
+                    self.load()
+                else:
+                    self.checked_at = time.monotonic()
+            except DatabaseError:
+                return None
+        needle = q.lower()
+        out = []
+        for lowered, row in self.rows:
+            if needle in lowered and (ids is None or row["id"] in ids):
+                out.append(row)
+                if len(out) == SEARCH_LIMIT:
+                    break
+        return out
+
+
+name_indexes = {table: NameIndex(table) for table in INDEX_SQL}
+
+
+def search(table, q, ids=None):
+    return name_indexes[table].search(q, ids)
+
+
+def _step(name, fn):
+    started = time.monotonic()
+    try:
+        detail = fn()
+        state["steps"][name] = {"ok": True, "ms": round((time.monotonic() - started) * 1000, 1), "detail": detail}
+    except Exception as e:
+        logger.warning("warm start step %s failed", name, exc_info=True)
+        state["steps"][name] = {"ok": False, "error": str(e)}
+
+
+def _resolve_urls():
+    from django.urls import get_resolver
+    resolver = get_resolver()
+    for path, _ in HOT_REQUESTS:
+        resolver.resolve(path)
+    return len(resolver.url_patterns)
+
+
+def _load_templates():
+    from django.template.loader import get_template
+    get_template("index.html")
+    return "index.html"
+
+
+def _load_indexes():
+    return {table: index.load() for table, index in name_indexes.items()}
+
+
+def _load_amenities():
+    from .amenities import index
+    return index.load()
+
+
+def _run_hot_requests():
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    factory = RequestFactory()
+    statuses = {}
+    for path, params in HOT_REQUESTS:
+        response = resolve(path).func(factory.get(path, params))
+        statuses[path] = response.status_code
+    return statuses
+
+
+STEPS = [
+    ("urls", _resolve_urls),
+    ("templates", _load_templates),
+    ("search_indexes", _load_indexes),
+    ("amenity_index", _load_amenities),
+    ("hot_statements", _run_hot_requests),
+]
+
+
+def preload():
+    """Run every warm-up step that hasn't succeeded yet."""
+    with _lock:
+        if state["phase"] == "ready":
+            return state
+        state["phase"] = "warming"
+        state["started_at"] = time.time()
+        for name, fn in STEPS:
+            if not state["steps"].get(name, {}).get("ok"):
+                _step(name, fn)
+        # Never hand open sockets to forked workers.
+        connections.close_all()
+        state["finished_at"] = time.time()
+        ok = all(step["ok"] for step in state["steps"].values())
+        state["phase"] = "ready" if ok else "degraded"
+        return state
+
+
+def _retry_until_ready():
+    delay = RETRY_FIRST_SECONDS
+    while True:
+        state["retry"] = {"in_seconds": delay, "at": time.time() + delay}
+        time.sleep(delay)
+        if preload()["phase"] == "ready":
+            state["retry"] = None
+            return
+        delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+
+def _start_retry():
+    """Start this process's retry thread, once. Threads don't survive fork,
+    so each worker starts its own."""
+    global _retry_pid
+    with _lock:
+        if _retry_pid == os.getpid():
+            return
+        _retry_pid = os.getpid()
+    threading.Thread(target=_retry_until_ready, name="warm-retry", daemon=True).start()
+
+
+def readiness():
+    """(ready, state) for /api/ready. Only reports; retries run in the background."""
+    if not settings.WARM_START:
+        return True, {**state, "phase": "disabled"}
+    if state["phase"] in ("cold", "degraded"):
+        _start_retry()
+    return state["phase"] == "ready", state
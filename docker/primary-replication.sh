@@ -0,0 +1,5 @@
+#!/bin/bash
+# Runs once, on a fresh primary data volume (docker-entrypoint-initdb.d).
+# Lets the db-replica service stream WAL from this server.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
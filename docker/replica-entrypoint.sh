@@ -0,0 +1,21 @@
+#!/bin/bash
+# Local streaming replica of the "db" service, for testing read routing:
+#   POSTGRES_REPLICA_HOSTS=db-replica docker compose --profile replica up
+# On first start the data directory is cloned from the primary with
+# pg_basebackup -R, which also writes the standby configuration.
+set -e
+PGDATA="${PGDATA:-/var/lib/postgresql/data}"
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+  until pg_isready -h "$PRIMARY_HOST" -U "$POSTGRES_USER"; do
+    echo "waiting for primary $PRIMARY_HOST..."
+    sleep 1
+  done
+  rm -rf "${PGDATA:?}"/*
+  PGPASSWORD="$POSTGRES_PASSWORD" pg_basebackup \
+    -h "$PRIMARY_HOST" -U "$POSTGRES_USER" -D "$PGDATA" -R -X stream -P
+  chown -R postgres:postgres "$PGDATA"
+  chmod 700 "$PGDATA"
+fi
+
+exec gosu postgres postgres -c hot_standby=on
@@ -13,4 +13,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up: these read settings and the URLconf.
+from api.fastpath import LeanASGIHandler, is_lean  # noqa: E402
+from api.stream import changes_app  # noqa: E402
+
+lean_application = LeanASGIHandler()
+
+STREAM_PATH = "/api/stream/changes"
+
+
+async def application(scope, receive, send):
+    # Long-lived SSE streams bypass Django; public read GETs take the lean
+    # stack (api.fastpath); everything else goes through full Django.
+    if scope["type"] == "http" and scope["path"] == STREAM_PATH:
+        await changes_app(scope, receive, send)
+        return
+    if is_lean(scope):
+        await lean_application(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
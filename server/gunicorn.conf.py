@@ -0,0 +1,27 @@
+"""
+gunicorn settings for the container (see dockerfile).
+
+The app is imported and warmed once in the master (api.warm), then workers
+fork from it and start serving immediately with everything already loaded.
+"""
+import os
+
+# Must be set before the app is imported by preload_app.
+os.environ.setdefault("WARM_START", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "3"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before the first fork.
+    from api import warm
+
+    state = warm.preload()
+    server.log.info(
+        "warm start %s: %s",
+        state["phase"],
+        {name: step.get("ms", step.get("error")) for name, step in state["steps"].items()},
+    )
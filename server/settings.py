@@ -55,6 +55,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.db_routing.ReadReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +65,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Middleware for the public read API when served by api.fastpath (ASGI only).
+# Sessions, CSRF, auth, messages and clickjacking have nothing to do there.
+API_LEAN_MIDDLEWARE = [
+    'api.fastpath.AllowedHostsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'api.db_routing.ReadReplicaMiddleware',
+]
+
 ROOT_URLCONF = 'server.urls'
 
 from pathlib import Path
@@ -100,6 +109,31 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma-separated host[:port] list, added as replica1, replica2, ...
+# GET requests read from them (api.db_routing); writes stay on "default".
+for i, hostport in enumerate(
+    h for h in os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",") if h.strip()
+):
+    host, _, port = hostport.strip().partition(":")
+    DATABASES[f"replica{i + 1}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["api.db_routing.ReplicaRouter"]
+
+# Creates the hand-made spatial tables in the test database before the api
+# migrations run (see api/test_runner.py).
+TEST_RUNNER = "api.test_runner.PostGISTestRunner"
+
+# After a write, the same client reads from the primary for this long.
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", "5"))
+
+# Replicas further behind than this are skipped until they catch up.
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "2"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -144,6 +178,39 @@ STATICFILES_DIRS = [
 
 STATICFILES_STORAGE = "whitenoise.storage.CompressedStaticFilesStorage"
 
+# Admission control (api.admission): concurrency slots per process, optional
+# per-client share, and statement timeout for each class of endpoint.
+ADMISSION_CLASSES = {
+    "light": {"slots": 32, "timeout_ms": 2000},
+    "heavy": {"slots": 4, "timeout_ms": 5000, "per_client": 2, "retry_after": 2},
+    "batch": {"slots": 2, "timeout_ms": 60000, "per_client": 1, "retry_after": 10},
+}
+
+# Addresses or networks of the proxies in front of the app (nginx). Only
+# requests from these have their X-Real-IP / X-Forwarded-For trusted as the
+# client address for the per-client shares; anyone else is keyed on the
+# address they connect from.
+ADMISSION_TRUSTED_PROXIES = [
+    p.strip() for p in os.environ.get("ADMISSION_TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if p.strip()
+]
+
+# Preload and warm the app before gunicorn forks workers (api.warm).
+WARM_START = os.environ.get("WARM_START", "0") == "1"
+
+# Prerendered data snapshots (python manage.py export_static), served by nginx.
+SNAPSHOT_URL = "/snapshots/"
+
+SNAPSHOT_ROOT = Path(os.environ.get("SNAPSHOT_ROOT", BASE_DIR / "snapshots"))
+
+# Leaflet.VectorGrid draws the snapshot tiles on the page. Like every other
+# script the page takes from a CDN, it is only loaded with its subresource
+# integrity hash; without one the page leaves the tiles overlay out.
+LEAFLET_VECTORGRID_URL = "https://unpkg.com/leaflet.vectorgrid@1.3.0/dist/Leaflet.VectorGrid.bundled.js"
+LEAFLET_VECTORGRID_INTEGRITY = os.environ.get("LEAFLET_VECTORGRID_INTEGRITY", "")
+
+# Archived access_issues months (python manage.py archive_access_issues).
+ACCESS_ISSUE_ARCHIVE_ROOT = Path(os.environ.get("ACCESS_ISSUE_ARCHIVE_ROOT", BASE_DIR / "archives"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -14,6 +14,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
@@ -22,3 +24,6 @@ urlpatterns = [
     path('api/', include('api.urls')),
     path('', include('api.urls_frontend')),
 ]
+
+# nginx serves snapshots in production; this only kicks in with DEBUG on.
+urlpatterns += static(settings.SNAPSHOT_URL, document_root=settings.SNAPSHOT_ROOT)